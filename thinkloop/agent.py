@@ -1,51 +1,29 @@
+import time
+_import_started = time.perf_counter()
+
 import asyncio
-import os
+import functools
 import uuid
 from datetime import datetime
-import json
 import traceback
-import threading
-import sys  # Import the sys module
 
-from livekit import agents
-from livekit.agents import AgentSession, Agent, RoomInputOptions
-from livekit.plugins import (
-    google,
-    noise_cancellation,
-)
+from startup import startup_report
+
+with startup_report.measure('import:livekit'):
+    from livekit import agents
+    from livekit.agents import Agent, function_tool
 
-from database import Database
-from translations import get_translation
-from calendar_manager import CalendarManager
-from email_manager import EmailManager
+with startup_report.measure('import:app_modules'):
+    from metrics import active_calls
+    import resilience
+    from resources import close_on_shutdown, get_resource_pool
 
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
-# Initialize database connection
-db = Database()
-
-# Load knowledge base
-def load_knowledge_base():
-    with open('knowledge_base.json', 'r') as f:
-        return json.load(f)
-
-KNOWLEDGE_BASE = load_knowledge_base()
-
-# Initialize school information in database
-school_info = {
-    'name': KNOWLEDGE_BASE['school_info']['name'],
-    'address': KNOWLEDGE_BASE['school_info']['address'],
-    'phone': KNOWLEDGE_BASE['school_info']['phone'],
-    'email': KNOWLEDGE_BASE['school_info']['email'],
-    'website': KNOWLEDGE_BASE['school_info']['website'],
-    'office_hours': KNOWLEDGE_BASE['hours']['office'],
-    'class_hours': KNOWLEDGE_BASE['hours']['classes'],
-    'summer_hours': KNOWLEDGE_BASE['hours']['summer']
-}
-db.initialize_school_info(school_info)
-
+# Nothing here touches the network or disk: the database, knowledge base and other
+# shared resources are initialized once per process in prewarm or on first use.
 def ordinal(n):
     # Helper to get ordinal suffix for a day
     if 10 <= n % 100 <= 20:
@@ -62,98 +40,42 @@ def format_datetime(dt):
     return f"{day}, {month} {day_num} at {time}"
 
 class Assistant(Agent):
-    def __init__(self) -> None:
-        # Get school info from database
-        school_info = db.get_school_info()
-        
-        system_prompt = f"""You are a professional school receptionist for {school_info['name']}. 
-        Your role is to:
-        1. Greet callers warmly and professionally
-        2. Handle inquiries about school hours, admissions, and general information
-        3. Take messages for staff members
-        4. Provide clear and concise information
-        5. Maintain a friendly and helpful tone
-        6. Transfer calls to appropriate departments when needed
-        7. Schedule appointments with teachers, ensuring to collect the parent's name, student's name, teacher's name, preferred date and time, purpose of the meeting, contact number, and email address.
-        8. Log the caller's name using the 'log_caller_information' tool when identified.
-        9. Support multiple languages (English and Hindi)
-        10. Track and analyze call patterns
-
-        You have access to the following information:
-        - School Name: {school_info['name']}
-        - School Address: {school_info['address']}
-        - School Hours: {school_info['office_hours']}
-        - Main Phone: {school_info['phone']}
-        - Email: {school_info['email']}
-        - Website: {school_info['website']}
-
-        Department Extensions:
-        {json.dumps(KNOWLEDGE_BASE['departments'], indent=2)}
-
-        Emergency Contacts:
-        {json.dumps(KNOWLEDGE_BASE['emergency_contacts'], indent=2)}
-
-        Frequently Asked Questions (FAQs):
-        {json.dumps(KNOWLEDGE_BASE['faq'], indent=2)}
-
-        School Holidays:
-        {json.dumps(KNOWLEDGE_BASE['holidays'], indent=2)}
-
-        Important Dates:
-        {json.dumps(KNOWLEDGE_BASE['important_dates'], indent=2)}
-
-        Courses Offered:
-        {json.dumps(KNOWLEDGE_BASE['courses_offered'], indent=2)}
-
-        Always be polite, patient, and professional in your responses.
-        Use the knowledge base to provide accurate information.
-        If you don't know something, offer to transfer the call to the appropriate department.
-        
-        IMPORTANT: Your initial greeting should always be: "Hello, this is Delhi Public School reception. How may I help you?" """
+    def __init__(self, resources=None) -> None:
+        # Shared worker resources: built once in prewarm, so call setup does no disk or auth I/O
+        resources = resources or get_resource_pool()
+        # Keep the knowledge base version this call started with, even if the file is reloaded mid-call
+        self.knowledge = resources.knowledge_snapshot()
 
-        super().__init__(instructions=system_prompt)
+        super().__init__(instructions=resources.system_prompt_for('en', self.knowledge))
         self.current_language = 'en'
         self.call_id = str(uuid.uuid4())
         self.call_start_time = datetime.now()
-        self.calendar = CalendarManager()
-        self.email_manager = EmailManager()
+        self.db = resources.db
+        self.calendar = resources.calendar
+        self.email_manager = resources.email_manager
+        self.phrases = resources.phrases
+        self.sessions = resources.sessions
+
+    def _abandon_booking(self, teacher_name, date_time, cal_result, write):
+        """Undo a booking the caller was told failed, once its appointment write has finished"""
+        late_id = None if write.cancelled() or write.exception() is not None else write.result()
+        print(f"[DEBUG] Booking abandoned, removing calendar event {cal_result['event_id']} and row {late_id}")
+        self.calendar.cancel_appointment_in_background(
+            teacher_name, cal_result['event_id'], date_time, hold=cal_result.get('hold'), appointment_id=late_id
+        )
 
     async def handle_incoming_call(self, participant):
         """Handle incoming call from a participant"""
         print(f"Received call from {participant.identity}")
         
         # Log call start
-        db.log_call(self.call_id, self.call_start_time, self.current_language)
-
-        # Debug: Print API key to verify loading
-        gemini_api_key = os.getenv('GOOGLE_API_KEY')
-        if gemini_api_key:
-            print(f"[DEBUG] GOOGLE_API_KEY loaded: {'*' * (len(gemini_api_key) - 5)}{gemini_api_key[-5:]}") # Only show last 5 chars for security
-        else:
-            print("[DEBUG] GOOGLE_API_KEY not loaded or is empty.")
-
-        # Create a new session with Gemini and Google TTS
-        session = AgentSession(
-            llm=google.beta.realtime.RealtimeModel(
-                model="gemini-2.0-flash-exp",
-                voice="Puck",
-                temperature=0.8,
-                api_key=os.getenv('GOOGLE_API_KEY') # Pass API key
-            ),
-            tts=google.TTS() # Removed voice and gender parameters
-        )
+        self.db.log_call(self.call_id, self.call_start_time, self.current_language)
 
-        await session.start(
-            room=self.room,
-            agent=self,
-            room_input_options=RoomInputOptions(
-                noise_cancellation=noise_cancellation.BVC(),
-            ),
-        )
+        # Create a new session with the worker's shared Gemini model and Google TTS
+        session = await self.sessions.start_session(self.room, self)
 
         # Send welcome message in current language
-        welcome_message = get_translation('greeting', self.current_language)
-        await session.tts.say(welcome_message)
+        await self.phrases.say(session, 'greeting', self.current_language)
 
     async def handle_track_subscribed(self, track, publication, participant):
         """Handle subscribed audio track"""
@@ -165,9 +87,21 @@ class Assistant(Agent):
         """Switch the conversation language"""
         if language in ['en', 'hi']:
             self.current_language = language
-            message = get_translation('language_switch', language, language=language)
-            await session.tts.say(message)
+            await self.phrases.say(session, 'language_switch', language, language=language)
+
+    @function_tool()
+    async def lookup_school_information(self, query: str) -> str:
+        """Searches the school knowledge base for departments and extensions, FAQs, fees, holidays, important dates and courses.
+        Args:
+            query (str): The caller's question or its key words, in English or Hindi.
+        """
+        print(f"\n[DEBUG] Knowledge base lookup: {query}")
+        results = self.knowledge.index.search(query, top_k=3)
+        if not results:
+            return "No matching information was found in the school knowledge base."
+        return "\n".join(document['text'] for _, document in results)
 
+    @resilience.with_deadline()
     async def log_caller_information(self, caller_name: str, session):
         """Logs the caller's name and updates the call record.
         This function should be called when the agent successfully identifies the caller's name.
@@ -177,14 +111,15 @@ class Assistant(Agent):
         print(f"\n[DEBUG] Logging caller information: {caller_name}")
         try:
             # Update the existing call log with the caller's name
-            db.update_call_details(self.call_id, caller_name=caller_name)
+            await resilience.run_in_thread(self.db.update_call_details, self.call_id, caller_name=caller_name)
             print(f"[DEBUG] Successfully updated call log with caller name: {caller_name}")
-            await session.tts.say(f"Thank you, {caller_name}. I have noted your name.")
+            await self.phrases.speak(session, f"Thank you, {caller_name}. I have noted your name.")
         except Exception as e:
             print(f"[DEBUG] Error logging caller information: {e}")
-            await session.tts.say("I apologize, I was unable to note your name at this time.")
+            await self.phrases.speak(session, "I apologize, I was unable to note your name at this time.")
             return False
 
+    @resilience.with_deadline()
     async def schedule_appointment(self, parent_name, student_name, teacher_name, date_time, purpose, contact_number, email, session):
         """Schedule an appointment with a teacher and add to Google Calendar and send confirmation email"""
         try:
@@ -197,27 +132,40 @@ class Assistant(Agent):
             print(f"Contact: {contact_number}")
             print(f"Email: {email}")
             
-            # Add to local DB
-            print("\n[DEBUG] Attempting to add to local database...")
-            appointment_id = db.add_appointment(
-                parent_name, student_name, teacher_name, date_time,
-                purpose, contact_number, email, self.current_language
-            )
-            print(f"[DEBUG] Local DB appointment_id: {appointment_id}")
-            
-            # Add to Google Calendar
+            # Add to Google Calendar first: it holds the slot, so a booking that loses a race
+            # for the same teacher and time never reaches the appointments table
             print("\n[DEBUG] Attempting to add to Google Calendar...")
             print(f"DateTime being sent to calendar: {date_time}")
-            cal_result = self.calendar.create_appointment(
+            cal_result = await self.calendar.create_appointment_async(
                 teacher_name, parent_name, student_name, date_time
             )
             print(f"[DEBUG] Google Calendar result: {cal_result}")
 
+            # Add to local DB
+            appointment_id = None
+            if cal_result['status'] == 'success':
+                teacher_name = cal_result.get('teacher_name', teacher_name)
+                print("\n[DEBUG] Attempting to add to local database...")
+                write = asyncio.ensure_future(asyncio.to_thread(
+                    self.db.add_appointment, parent_name, student_name, teacher_name, date_time,
+                    purpose, contact_number, email, self.current_language
+                ))
+                try:
+                    appointment_id = await asyncio.wait_for(asyncio.shield(write), resilience.remaining())
+                except asyncio.TimeoutError:
+                    print("[DEBUG] Local database did not respond in time")
+                finally:
+                    if not appointment_id:
+                        # The caller hears the booking failed, so it is abandoned whatever the write
+                        # still does: once it finishes, the event, hold and any late row are removed
+                        write.add_done_callback(functools.partial(self._abandon_booking, teacher_name, date_time, cal_result))
+                print(f"[DEBUG] Local DB appointment_id: {appointment_id}")
+
             formatted_time = format_datetime(date_time)
             if appointment_id and cal_result['status'] == 'success':
                 print("\n[DEBUG] Both local DB and Google Calendar operations successful")
                 message = f"Your appointment has been scheduled for {formatted_time}. It has also been added to the school calendar."
-                await session.tts.say(message)
+                await self.phrases.speak(session, message)
 
                 # Send confirmation email
                 if email:
@@ -225,7 +173,7 @@ class Assistant(Agent):
                     self.email_manager.send_appointment_confirmation_email(
                         email, parent_name, student_name, teacher_name, formatted_time, purpose
                     )
-                    print("[DEBUG] Email sent successfully")
+                    print("[DEBUG] Email queued for delivery")
                 else:
                     print("[DEBUG] No email address provided for confirmation email.")
 
@@ -235,78 +183,66 @@ class Assistant(Agent):
                 suggestions = cal_result['suggestions']
                 if suggestions:
                     suggestion_texts = [format_datetime(s) for s in suggestions]
-                    message = get_translation('appointment_conflict', self.current_language, suggestions=", ".join(suggestion_texts))
+                    await self.phrases.say(session, 'appointment_conflict', self.current_language, suggestions=", ".join(suggestion_texts))
                 else:
-                    message = get_translation('appointment_conflict_no_suggestions', self.current_language)
-                await session.tts.say(message)
+                    await self.phrases.say(session, 'appointment_conflict_no_suggestions', self.current_language)
                 return False
             elif cal_result['status'] == 'error':
                 print(f"\n[DEBUG] Calendar error: {cal_result['message']}")
                 message = f"I encountered an error while trying to add the appointment to Google Calendar: {cal_result['message']}. Please try again later."
-                await session.tts.say(message)
+                await self.phrases.speak(session, message)
                 return False
             else:
                 print("\n[DEBUG] Appointment scheduling failed")
-                message = get_translation('appointment_failed', self.current_language)
-                await session.tts.say(message)
+                await self.phrases.say(session, 'appointment_failed', self.current_language)
                 return False
         except Exception as e:
             print(f"\n[DEBUG] Exception in schedule_appointment: {str(e)}")
             print(f"Exception type: {type(e)}")
-            import traceback
             print(f"Traceback: {traceback.format_exc()}")
             return False
 
 
+def prewarm(proc: agents.JobProcess):
+    """Build the shared resource pool before the worker accepts jobs"""
+    proc.userdata['resources'] = get_resource_pool()
+
+
 async def entrypoint(ctx: agents.JobContext):
-    agent = Assistant()
-    session = AgentSession(
-        llm=google.beta.realtime.RealtimeModel(
-            model="gemini-2.0-flash-exp",
-            voice="Puck",
-            temperature=0.8,
-            api_key=os.getenv('GOOGLE_API_KEY') # Pass API key
-        ),
-        tts=google.TTS() # Removed voice and gender parameters
-    )
-
-    await session.start(
-        room=ctx.room,
-        agent=agent,
-        room_input_options=RoomInputOptions(
-            noise_cancellation=noise_cancellation.BVC(),
-        ),
-    )
+    resources = ctx.proc.userdata.get('resources') or get_resource_pool()
+    # Buffered analytics and rollups are written when the job ends, not only at interpreter exit
+    ctx.add_shutdown_callback(lambda: close_on_shutdown(ctx, resources))
+    agent = Assistant(resources)
+    session = await agent.sessions.start_session(ctx.room, agent)
 
     await ctx.connect()
 
-    # Log call start
-    db.log_call(agent.call_id, agent.call_start_time, agent.current_language)
-
-    # Debug: Print API key to verify loading
-    gemini_api_key = os.getenv('GOOGLE_API_KEY')
-    if gemini_api_key:
-        print(f"[DEBUG] GOOGLE_API_KEY loaded: {'*' * (len(gemini_api_key) - 5)}{gemini_api_key[-5:]}") # Only show last 5 chars for security
-    else:
-        print("[DEBUG] GOOGLE_API_KEY not loaded or is empty.")
+    # Log call start; database calls run in a thread so the session's audio is not held up
+    await resilience.run_in_thread(agent.db.log_call, agent.call_id, agent.call_start_time, agent.current_language)
 
     # Send welcome message
-    welcome_message = get_translation('greeting', agent.current_language)
-    await session.tts.say(welcome_message)
+    await agent.phrases.say(session, 'greeting', agent.current_language)
 
+    active_calls.inc()
+    status = 'completed'
     try:
         # Keep the agent running
         while True:
             await asyncio.sleep(1)
     except Exception as e:
+        status = 'failed'
         print(f"Error in main loop: {e}")
         raise
     finally:
         # Log call end
+        active_calls.dec()
         end_time = datetime.now()
         duration = (end_time - agent.call_start_time).seconds
-        db.update_call(agent.call_id, end_time, duration)
+        await resilience.run_in_thread(agent.db.update_call, agent.call_id, end_time, duration, status)
+
+
+startup_report.record('import:agent', time.perf_counter() - _import_started)
 
 
 if __name__ == "__main__":
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
\ No newline at end of file
+    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
\ No newline at end of file
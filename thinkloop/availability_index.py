@@ -0,0 +1,226 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+import threading
+import time
+
+from dateutil.parser import isoparse
+from googleapiclient.errors import HttpError
+import pytz
+
+
+def to_utc(dt):
+    """Return an aware UTC datetime; naive values are treated as UTC like the events we insert"""
+    if dt.tzinfo is None:
+        return pytz.utc.localize(dt)
+    return dt.astimezone(pytz.utc)
+
+
+def to_rfc3339(dt):
+    """Format a datetime the way the Calendar API expects for timeMin/timeMax"""
+    return to_utc(dt).isoformat()
+
+
+def merge_intervals(intervals):
+    """Sort (start, end) pairs and merge the ones that overlap or touch"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def event_bounds(event):
+    """Return the (start, end) of a Calendar event as aware UTC datetimes"""
+    bounds = []
+    for key in ('start', 'end'):
+        value = event.get(key, {})
+        if 'dateTime' in value:
+            bounds.append(to_utc(isoparse(value['dateTime'])))
+        else:
+            # All-day events only carry a date and block the whole day
+            bounds.append(pytz.utc.localize(datetime.combine(isoparse(value['date']).date(), datetime.min.time())))
+    return tuple(bounds)
+
+
+class CalendarIndex:
+    """Busy blocks and events for one calendar between window_start and window_end, kept in start-time order.
+    The derived lists are replaced, never modified, so a reader can keep using one it got under lock.
+    """
+
+    def __init__(self, window_start, window_end):
+        self.window_start = window_start
+        self.window_end = window_end
+        self.events = {}
+        self.sync_token = None
+        self.last_synced = 0.0
+        self.lock = threading.Lock()  # Guards events and the derived lists; never held across a request
+        self._by_start = None
+        self._busy = None
+
+    def upsert(self, event):
+        bounds = None if event.get('status') == 'cancelled' else event_bounds(event)
+        if bounds is None or bounds[0] >= self.window_end:
+            # Cancelled, or moved past the window (incremental syncs are not bounded by it)
+            self.events.pop(event['id'], None)
+        else:
+            self.events[event['id']] = (bounds, event)
+        self._by_start = None
+        self._busy = None
+
+    def by_start(self):
+        if self._by_start is None:
+            self._by_start = sorted(self.events.values(), key=lambda item: item[0])
+        return self._by_start
+
+    def busy(self):
+        if self._busy is None:
+            self._busy = merge_intervals(bounds for bounds, _ in self.events.values())
+        return self._busy
+
+
+class AvailabilityIndex:
+    """Per-worker in-memory view of calendar busy time.
+
+    Each calendar is seeded with one paged events().list call over lookback_days back to
+    horizon_days ahead, and then kept fresh with incremental syncToken requests once it is older
+    than max_staleness seconds. Queries outside the seeded window return None so callers can go
+    live. Requests run outside any lock that readers take: only refreshes of the same calendar
+    wait for each other, and the results are swapped in afterwards.
+    """
+
+    def __init__(self, service, max_staleness=30, lookback_days=1, horizon_days=60, execute=None):
+        self.service = service
+        self.execute = execute or (lambda request: request.execute())
+        self.max_staleness = max_staleness
+        self.lookback = timedelta(days=lookback_days)
+        self.horizon = timedelta(days=horizon_days)
+        self.calendars = {}
+        self._refreshing = {}
+        self._lock = threading.Lock()  # Guards the two dicts above
+
+    def _refresh_lock(self, calendar_id):
+        with self._lock:
+            lock = self._refreshing.get(calendar_id)
+            if lock is None:
+                lock = self._refreshing[calendar_id] = threading.Lock()
+            return lock
+
+    def _list_events(self, calendar_id, **params):
+        """Run a paged events().list request and return (items, next_sync_token)"""
+        items = []
+        page_token = None
+        while True:
+            result = self.execute(self.service.events().list(
+                calendarId=calendar_id,
+                singleEvents=True,
+                maxResults=2500,
+                pageToken=page_token,
+                **params
+            ))
+            items.extend(result.get('items', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return items, result.get('nextSyncToken')
+
+    def _seed(self, calendar_id):
+        now = datetime.now(pytz.utc)
+        # Bounded on both sides: recurring series are expanded into single events, and without
+        # timeMax an open-ended series would fill every page up to the API's limits
+        calendar = CalendarIndex(now - self.lookback, now + self.horizon)
+        items, sync_token = self._list_events(
+            calendar_id, timeMin=to_rfc3339(calendar.window_start), timeMax=to_rfc3339(calendar.window_end)
+        )
+        for event in items:
+            calendar.upsert(event)
+        calendar.sync_token = sync_token
+        calendar.last_synced = time.monotonic()
+        with self._lock:
+            self.calendars[calendar_id] = calendar
+        print(f"[AvailabilityIndex] Seeded {calendar_id} with {len(calendar.events)} events")
+        return calendar
+
+    def _sync(self, calendar_id, calendar):
+        try:
+            items, sync_token = self._list_events(calendar_id, syncToken=calendar.sync_token)
+        except HttpError as e:
+            if e.resp.status == 410:
+                # Sync token expired, the only way back is a full resync
+                print(f"[AvailabilityIndex] Sync token for {calendar_id} expired, reseeding")
+                return self._seed(calendar_id)
+            raise
+        with calendar.lock:
+            for event in items:
+                calendar.upsert(event)
+            calendar.sync_token = sync_token or calendar.sync_token
+            calendar.last_synced = time.monotonic()
+        return calendar
+
+    def _stale(self, calendar):
+        return time.monotonic() - calendar.last_synced > self.max_staleness
+
+    def _window_ending(self, calendar):
+        # Reseed once half the horizon has passed, so the window keeps reaching far enough ahead
+        return calendar.window_end - datetime.now(pytz.utc) < self.horizon / 2
+
+    def refresh(self, calendar_id, force=False):
+        """Return the index for a calendar, seeding or syncing it if it is stale"""
+        calendar = self.calendars.get(calendar_id)
+        if calendar is not None and not force and not self._stale(calendar):
+            return calendar
+        requested = time.monotonic()
+        with self._refresh_lock(calendar_id):
+            calendar = self.calendars.get(calendar_id)
+            if calendar is not None and calendar.last_synced >= requested:
+                # Another thread refreshed it while this one waited
+                return calendar
+            if calendar is None or not calendar.sync_token or self._window_ending(calendar):
+                return self._seed(calendar_id)
+            return self._sync(calendar_id, calendar)
+
+    def is_seeded(self, calendar_id):
+        return calendar_id in self.calendars
+
+    def _covering(self, calendar_id, start_time, end_time):
+        calendar = self.refresh(calendar_id)
+        if to_utc(start_time) < calendar.window_start or to_utc(end_time) > calendar.window_end:
+            return None
+        return calendar
+
+    def busy_intervals(self, calendar_id, start_time, end_time):
+        """Merged busy intervals overlapping the window, or None if it is not indexed"""
+        calendar = self._covering(calendar_id, start_time, end_time)
+        if calendar is None:
+            return None
+        with calendar.lock:
+            busy = calendar.busy()
+        start, end = to_utc(start_time), to_utc(end_time)
+        lo = bisect_right(busy, (start,)) - 1
+        hi = bisect_left(busy, (end,))
+        return [interval for interval in busy[max(lo, 0):hi] if interval[1] > start]
+
+    def is_available(self, calendar_id, start_time, end_time):
+        """True if nothing overlaps the slot, or None if the slot is not indexed"""
+        busy = self.busy_intervals(calendar_id, start_time, end_time)
+        if busy is None:
+            return None
+        return not busy
+
+    def events_between(self, calendar_id, start_time, end_time):
+        """Events overlapping the window in start-time order, or None if it is not indexed"""
+        calendar = self._covering(calendar_id, start_time, end_time)
+        if calendar is None:
+            return None
+        with calendar.lock:
+            events = calendar.by_start()
+        start, end = to_utc(start_time), to_utc(end_time)
+        return [event for (ev_start, ev_end), event in events if ev_start < end and ev_end > start]
+
+    def add_event(self, calendar_id, event):
+        """Record an event we just inserted or cancelled so the change is visible before the next sync"""
+        calendar = self.calendars.get(calendar_id)
+        if calendar is not None:
+            with calendar.lock:
+                calendar.upsert(event)
@@ -0,0 +1,243 @@
+"""End-to-end benchmark of the call and appointment flow against local stand-ins.
+
+Drives the real Assistant, Database, CalendarManager and EmailManager code with the fakes in
+fakes.py, reports p50/p95/p99 per operation and for whole calls, and saves the results as JSON:
+
+    python benchmark.py --calls 200 --supabase-latency 0.02 --calendar-latency 0.08 --output run.json
+    python benchmark.py --compare run.json   # exits 1 if any p95 regressed by more than --threshold
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from fakes import FakeCalendarService, FakeSession, FakeSupabase, SMTPSink, jittered
+import resilience
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-pct * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    values = sorted(samples)
+    summary = {'count': len(values)}
+    for pct in PERCENTILES:
+        summary[f'p{pct}_ms'] = round(percentile(values, pct) * 1000, 3)
+    summary['mean_ms'] = round(sum(values) / len(values) * 1000, 3)
+    summary['max_ms'] = round(values[-1] * 1000, 3)
+    return summary
+
+
+def _latency(seconds, jitter):
+    return jittered(seconds) if jitter and seconds else seconds
+
+
+def build_resources(args, workdir):
+    """A ResourcePool wired to fakes; imports happen here so EMAIL_* is set before EmailManager reads it"""
+    sink = SMTPSink(latency=_latency(args.smtp_latency, args.jitter)).start()
+    os.environ.update({
+        'EMAIL_USER': 'reception@example.com',
+        'EMAIL_PASS': 'unused',
+        'EMAIL_HOST': sink.host,
+        'EMAIL_PORT': str(sink.port),
+        'EMAIL_USE_TLS': 'false',
+        'EMAIL_OUTBOX_PATH': os.path.join(workdir, 'email_outbox.db'),
+    })
+
+    from calendar_manager import CalendarManager
+    from database import Database
+    from email_manager import EmailManager
+    from knowledge_base import KnowledgeStore, school_info_from_knowledge_base
+    from phrase_cache import PhraseAudioCache
+    from resources import ResourcePool
+    from slot_table import OpenSlotTable
+    from storage import SQLiteBackend
+
+    knowledge = KnowledgeStore(reload_interval=0)
+    if args.backend == 'sqlite':
+        db = Database(backend=SQLiteBackend(os.path.join(workdir, 'thinkloop.db')))
+    else:
+        db = Database(client=FakeSupabase(latency=_latency(args.supabase_latency, args.jitter)))
+    db.initialize_school_info(school_info_from_knowledge_base(knowledge.snapshot.data))
+    db.initialize_default_teachers()
+    calendar = CalendarManager(db=db, service=FakeCalendarService(latency=_latency(args.calendar_latency, args.jitter)))
+    if not args.no_slot_table:
+        calendar.slots = OpenSlotTable(calendar, db, knowledge)
+        calendar.slots.rebuild()
+    pool = ResourcePool(db, calendar, EmailManager(), knowledge,
+                        PhraseAudioCache(directory=os.path.join(workdir, 'phrases')), sessions=None)
+    # Failures start once the fixtures are in place, so setup itself is not what gets measured
+    calendar.service.failure_rate = args.failure_rate
+    if args.backend != 'sqlite':
+        db.backend.client.failure_rate = args.failure_rate
+    return pool, sink
+
+
+def booking_times(days=5):
+    """Candidate appointment times on the next weekdays, on the half hour"""
+    times, day = [], datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    while len(times) < days * 12:
+        if day.weekday() < 5:
+            times.extend(day.replace(hour=10) + timedelta(minutes=30 * i) for i in range(12))
+        day += timedelta(days=1)
+    return times
+
+
+async def simulate_call(pool, args, rng, times, samples, outcomes):
+    """One call: start, greeting, caller identification, a booking attempt and hang-up"""
+    from agent import Assistant
+
+    async def measure(name, coro_or_value):
+        started = time.perf_counter()
+        result = await coro_or_value if asyncio.iscoroutine(coro_or_value) else coro_or_value
+        samples.setdefault(name, []).append(time.perf_counter() - started)
+        return result
+
+    call_started = time.perf_counter()
+    session = FakeSession(latency=_latency(args.tts_latency, args.jitter))
+    agent = await measure('assistant_init', asyncio.to_thread(Assistant, pool))
+    await measure('log_call', asyncio.to_thread(agent.db.log_call, agent.call_id, agent.call_start_time, 'en'))
+    greeting = await measure('greeting', agent.phrases.say(session, 'greeting', 'en'))
+    await greeting
+
+    await measure('log_caller_information', agent.log_caller_information('Test Parent', session))
+
+    teacher = rng.choice(await asyncio.to_thread(agent.db.get_all_teachers))
+    booked = await measure('schedule_appointment', agent.schedule_appointment(
+        'Test Parent', 'Test Student', teacher['name'], rng.choice(times),
+        'Progress review', '555-0100', 'parent@example.com', session
+    ))
+    outcomes['booked' if booked else 'not_booked'] += 1
+
+    duration = int(time.perf_counter() - call_started)
+    await measure('update_call', asyncio.to_thread(agent.db.update_call, agent.call_id, datetime.now(), duration))
+    samples.setdefault('call', []).append(time.perf_counter() - call_started)
+
+
+async def run_benchmark(pool, args):
+    rng = random.Random(args.seed)
+    times = booking_times()
+    samples, outcomes = {}, {'booked': 0, 'not_booked': 0}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one_call():
+        async with semaphore:
+            await simulate_call(pool, args, rng, times, samples, outcomes)
+
+    await asyncio.gather(*(one_call() for _ in range(args.calls)))
+
+    # Deferred work the calls queued up: buffered analytics and the email outbox
+    started = time.perf_counter()
+    await asyncio.to_thread(pool.db.flush)
+    samples['analytics_flush'] = [time.perf_counter() - started]
+    if pool.email_manager.outbox is not None:
+        started = time.perf_counter()
+        await asyncio.to_thread(pool.email_manager.outbox.flush, 60)
+        samples['email_drain'] = [time.perf_counter() - started]
+    return samples, outcomes
+
+
+def compare(results, baseline, threshold):
+    """Print p95 changes against a baseline run; returns the operations that regressed"""
+    regressions = []
+    current = dict(results['operations'], call=results['overall'])
+    previous = dict(baseline.get('operations', {}), call=baseline.get('overall'))
+    for name, summary in current.items():
+        before = previous.get(name)
+        if not before or not before['p95_ms']:
+            continue
+        change = summary['p95_ms'] / before['p95_ms'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<24} p95 {before['p95_ms']:>9.2f} -> {summary['p95_ms']:>9.2f} ms ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=1, help='calls in flight at once')
+    parser.add_argument('--backend', choices=('supabase', 'sqlite'), default='supabase',
+                        help='fake Supabase with --supabase-latency, or a local SQLite file')
+    parser.add_argument('--supabase-latency', type=float, default=0.02, help='seconds per query')
+    parser.add_argument('--calendar-latency', type=float, default=0.08, help='seconds per Calendar API request')
+    parser.add_argument('--smtp-latency', type=float, default=0.05, help='seconds per delivered message')
+    parser.add_argument('--tts-latency', type=float, default=0.0, help='seconds per spoken phrase')
+    parser.add_argument('--jitter', action='store_true', help='draw latencies from a log-normal around the given values')
+    parser.add_argument('--no-slot-table', action='store_true', help='benchmark without the precomputed open-slot table')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='share of Supabase and Calendar requests that fail, to measure latency during an outage')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p95 increase counted as a regression')
+    parser.add_argument('--verbose', action='store_true', help="show the application's own log output")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        log = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with log:
+            pool, sink = build_resources(args, workdir)
+            started = time.perf_counter()
+            samples, outcomes = asyncio.run(run_benchmark(pool, args))
+            elapsed = time.perf_counter() - started
+            counters = {
+                'supabase_requests': getattr(getattr(pool.db.backend, 'client', None), 'requests', 0),
+                'calendar_requests': pool.calendar.service.requests,
+                'emails_delivered': len(sink.messages),
+                'smtp_connections': sink.connections,
+                **outcomes,
+            }
+            breakers = resilience.stats()
+            pool.close()
+            sink.stop()
+
+    results = {
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'verbose')},
+        'elapsed_s': round(elapsed, 3),
+        'calls_per_s': round(args.calls / elapsed, 2),
+        'operations': {name: summarize(values) for name, values in sorted(samples.items()) if name != 'call'},
+        'overall': summarize(samples['call']),
+        'counters': counters,
+        'circuit_breakers': breakers,
+    }
+
+    print(f"{'operation':<24} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, summary in list(results['operations'].items()) + [('call (overall)', results['overall'])]:
+        print(f"{name:<24} {summary['count']:>6} {summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} {summary['p99_ms']:>9.2f}")
+    print(f"{results['calls_per_s']} calls/s, counters: {counters}")
+    for dependency, state in breakers.items():
+        if state['trips'] or state['rejections']:
+            print(f"circuit {dependency}: {state}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
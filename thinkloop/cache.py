@@ -0,0 +1,52 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire ttl seconds after they were loaded.
+
+    get_or_load() is read-through: on a miss the loader is called and its result stored.
+    A loader result of None is cached too (for negative_ttl seconds) so repeated lookups
+    of something that does not exist stay local. Loader exceptions are never cached.
+    """
+
+    def __init__(self, ttl, maxsize=128, negative_ttl=None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = loader()
+        ttl = self.ttl if value is not None else self.negative_ttl
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
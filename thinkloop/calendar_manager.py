@@ -2,19 +2,76 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-import os.path
+from google_auth_httplib2 import AuthorizedHttp
+from dateutil.parser import isoparse
+from availability_index import AvailabilityIndex, merge_intervals, to_rfc3339, to_utc
+from database import normalize_teacher_name
+from metrics import timed
+import resilience
+import asyncio
+import contextvars
+import functools
+import httplib2
+import os
 import pickle
-from datetime import datetime, timedelta
-import pytz
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
+# Candidate meeting slots offered when the requested time is taken
+MORNING_HOURS = range(9, 12)
+AFTERNOON_HOURS = range(14, 17)
+SLOT_MINUTES = [0, 30]
+
+# Local availability index: set CALENDAR_INDEX_ENABLED=false to always query the API live
+CALENDAR_INDEX_ENABLED = os.getenv('CALENDAR_INDEX_ENABLED', 'true').lower() == 'true'
+CALENDAR_INDEX_MAX_STALENESS = float(os.getenv('CALENDAR_INDEX_MAX_STALENESS', 30))  # seconds
+CALENDAR_INDEX_HORIZON_DAYS = int(os.getenv('CALENDAR_INDEX_HORIZON_DAYS', 60))  # days ahead the index covers
+
+# Async API: blocking HTTP work runs on a bounded pool so the agent event loop stays free
+CALENDAR_MAX_WORKERS = int(os.getenv('CALENDAR_MAX_WORKERS', 8))
+CALENDAR_TIMEOUT = float(os.getenv('CALENDAR_TIMEOUT', 10))  # seconds
+
+# Calendar API methods that can be repeated safely after a transient failure
+IDEMPOTENT_METHODS = ('calendar.events.list', 'calendar.events.get', 'calendar.freebusy.query')
+
+# The Calendar API accepts at most this many calendars in one freebusy query
+FREEBUSY_MAX_CALENDARS = 50
+
+# Slot reservations: a booking first holds its teacher and start time in the database, so
+# concurrent bookings of the same slot resolve on one unique key instead of racing to the calendar
+SLOT_RESERVATIONS_ENABLED = os.getenv('SLOT_RESERVATIONS_ENABLED', 'true').lower() == 'true'
+SLOT_HOLD_TTL = float(os.getenv('SLOT_HOLD_TTL', 120))  # seconds a hold lasts if the booking never finishes
+
+# Refresh the OAuth access token this many seconds before it expires
+CALENDAR_TOKEN_REFRESH_MARGIN = float(os.getenv('CALENDAR_TOKEN_REFRESH_MARGIN', 300))
+
+
 class CalendarManager:
-    def __init__(self):
+    def __init__(self, db=None, service=None):
+        self.db = db  # Used to map teachers to their own calendars
         self.creds = None
-        self.service = None
-        self.calendar_id = 'primary'  # Default calendar ID
-        self.initialize_calendar()
+        self.service = service  # An already built Calendar service (e.g. a local fake) skips OAuth
+        self.calendar_id = 'primary'  # Shared calendar for teachers without their own
+        self.index = None
+        self.slots = None  # OpenSlotTable, attached once the teachers are known
+        self.reserve_slots = SLOT_RESERVATIONS_ENABLED  # Needs db for the slot_reservations table
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=CALENDAR_MAX_WORKERS, thread_name_prefix='calendar')
+        self._refresh_stop = threading.Event()
+        self._refresh_thread = None
+        if self.service is None:
+            self.initialize_calendar()
+        if CALENDAR_INDEX_ENABLED:
+            self.index = AvailabilityIndex(
+                self.service,
+                max_staleness=CALENDAR_INDEX_MAX_STALENESS,
+                horizon_days=CALENDAR_INDEX_HORIZON_DAYS,
+                execute=self._execute
+            )
 
     def initialize_calendar(self):
         """Initialize Google Calendar API connection"""
@@ -29,70 +86,303 @@ class CalendarManager:
                 flow = InstalledAppFlow.from_client_secrets_file(
                     'credentials.json', SCOPES)
                 self.creds = flow.run_local_server(port=0)
-            
-            with open('token.pickle', 'wb') as token:
-                pickle.dump(self.creds, token)
+
+            self._save_token()
 
         self.service = build('calendar', 'v3', credentials=self.creds)
 
-    def check_availability(self, start_time, end_time):
-        """Check if the time slot is available"""
-        events_result = self.service.events().list(
-            calendarId=self.calendar_id,
-            timeMin=start_time.isoformat(),
-            timeMax=end_time.isoformat(),
+    def _save_token(self):
+        with open('token.pickle', 'wb') as token:
+            pickle.dump(self.creds, token)
+
+    def _seconds_until_refresh(self):
+        if self.creds.expiry is None:
+            return None
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return (self.creds.expiry - now).total_seconds() - CALENDAR_TOKEN_REFRESH_MARGIN
+
+    def _refresh_credentials_loop(self):
+        while not self._refresh_stop.is_set():
+            wait = self._seconds_until_refresh()
+            if wait is None:
+                # Token without an expiry; check again later in case that changes
+                self._refresh_stop.wait(3600)
+                continue
+            if wait > 0:
+                self._refresh_stop.wait(wait)
+                continue
+            try:
+                self.creds.refresh(Request())
+                self._save_token()
+                print(f"[CalendarManager] Credentials refreshed, valid until {self.creds.expiry}")
+            except Exception as e:
+                print(f"[CalendarManager] Error refreshing credentials: {e}")
+                self._refresh_stop.wait(30)
+
+    def start_credential_refresher(self):
+        """Refresh the access token in the background before it expires, so calls never wait on OAuth"""
+        if self.creds is None or not self.creds.refresh_token:
+            return
+        if self._refresh_thread is None or not self._refresh_thread.is_alive():
+            self._refresh_thread = threading.Thread(
+                target=self._refresh_credentials_loop, name='calendar-token-refresh', daemon=True
+            )
+            self._refresh_thread.start()
+
+    def _execute(self, request):
+        """Execute an API request on a per-thread HTTP connection.
+        httplib2 connections are not thread-safe, so every pool thread gets its own.
+        """
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = AuthorizedHttp(self.creds, http=httplib2.Http(timeout=CALENDAR_TIMEOUT))
+            self._local.http = http
+        # methodId is e.g. 'calendar.events.list'
+        method = getattr(request, 'methodId', 'request')
+
+        def attempt():
+            with timed('calendar', method):
+                return request.execute(http=http)
+
+        return resilience.call('calendar', method, attempt, idempotent=method in IDEMPOTENT_METHODS)
+
+    async def _run(self, func, *args, timeout=None, on_abandon=None, **kwargs):
+        """Run a blocking method on the calendar pool and await it with a timeout, cut short by the
+        caller's deadline. Cancelling the awaiting task (or timing out) abandons the result without
+        blocking the loop. The deadline travels with the call so retries inside stop in time too.
+        A call already running when it is abandoned still finishes; on_abandon(result) is called once
+        it has, so work the caller was told failed can be undone.
+        """
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), resilience.timeout_for(timeout or CALENDAR_TIMEOUT))
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if on_abandon is not None:
+                def finished(future):
+                    if not future.cancelled() and future.exception() is None:
+                        on_abandon(future.result())
+                future.add_done_callback(finished)
+            raise
+
+    def close(self):
+        """Stop the calendar worker pool and the credential refresher"""
+        self._refresh_stop.set()
+        self._executor.shutdown(wait=False)
+
+    def calendar_for_teacher(self, teacher_name):
+        """Calendar ID for a teacher from the teachers table, falling back to the shared calendar"""
+        if teacher_name and self.db is not None:
+            teacher = self.db.get_teacher_by_name(teacher_name)
+            if teacher and teacher.get('calendar_id'):
+                return teacher['calendar_id']
+        return self.calendar_id
+
+    def reservation_key(self, teacher_name):
+        """What slot holds for a teacher are keyed on: their own calendar, else their teacher id, else
+        their normalised name, so every spelling of one teacher's name contends for the same holds
+        """
+        teacher = self.db.get_teacher_by_name(teacher_name) if teacher_name and self.db is not None else None
+        if teacher and teacher.get('calendar_id'):
+            return f"calendar:{teacher['calendar_id']}"
+        if teacher and teacher.get('id'):
+            return f"teacher:{teacher['id']}"
+        return f"name:{normalize_teacher_name(teacher_name)}"
+
+    def _from_index(self, lookup, calendar_id, *args):
+        """Answer a query from the local index, or None if it has to go to the API"""
+        if self.index is None:
+            return None
+        try:
+            return getattr(self.index, lookup)(calendar_id, *args)
+        except Exception as e:
+            print(f"[CalendarManager] Availability index unavailable, querying live: {e}")
+            return None
+
+    def check_availability(self, start_time, end_time, teacher_name=None):
+        """Check if the time slot is available on the teacher's calendar"""
+        calendar_id = self.calendar_for_teacher(teacher_name)
+        available = self._from_index('is_available', calendar_id, start_time, end_time)
+        if available is not None:
+            return available
+
+        events_result = self._execute(self.service.events().list(
+            calendarId=calendar_id,
+            timeMin=to_rfc3339(start_time),
+            timeMax=to_rfc3339(end_time),
             singleEvents=True,
             orderBy='startTime'
-        ).execute()
+        ))
         
         return len(events_result.get('items', [])) == 0
 
-    def suggest_alternative_times(self, desired_time, duration_minutes=30, days_to_check=7):
-        """Suggest alternative times when there's a conflict"""
-        suggested_times = []
+    def get_busy_by_calendar(self, calendar_ids, start_time, end_time):
+        """Busy intervals for several calendars, keyed by calendar ID.
+        Only calendars the local index has already seeded are answered from it: seeding one costs
+        an events().list of its own, so the rest are fetched together in one batched freebusy
+        request (split only above the API's limit of FREEBUSY_MAX_CALENDARS per request).
+        """
+        busy_by_calendar = {}
+        remaining = []
+        for calendar_id in dict.fromkeys(calendar_ids):
+            busy = None
+            if self.index is not None and self.index.is_seeded(calendar_id):
+                busy = self._from_index('busy_intervals', calendar_id, start_time, end_time)
+            if busy is None:
+                remaining.append(calendar_id)
+            else:
+                busy_by_calendar[calendar_id] = busy
+
+        for offset in range(0, len(remaining), FREEBUSY_MAX_CALENDARS):
+            batch = remaining[offset:offset + FREEBUSY_MAX_CALENDARS]
+            body = {
+                'timeMin': to_rfc3339(start_time),
+                'timeMax': to_rfc3339(end_time),
+                'items': [{'id': calendar_id} for calendar_id in batch],
+            }
+            result = self._execute(self.service.freebusy().query(body=body))
+            for calendar_id in batch:
+                calendar = result.get('calendars', {}).get(calendar_id, {})
+                if calendar.get('errors'):
+                    raise RuntimeError(f"Free/busy lookup failed for {calendar_id}: {calendar['errors']}")
+                busy_by_calendar[calendar_id] = merge_intervals(
+                    (isoparse(busy['start']), isoparse(busy['end']))
+                    for busy in calendar.get('busy', [])
+                )
+
+        return busy_by_calendar
+
+    def get_busy_intervals(self, start_time, end_time, teacher_name=None):
+        """Fetch busy intervals for the whole window in a single freebusy request.
+        Returns a sorted list of merged (start, end) pairs as aware UTC datetimes.
+        """
+        calendar_id = self.calendar_for_teacher(teacher_name)
+        return self.get_busy_by_calendar([calendar_id], start_time, end_time)[calendar_id]
+
+    def candidate_slots(self, desired_time, days_to_check=7):
+        """Yield the candidate meeting start times in chronological order"""
         current_time = desired_time
-        
-        # Check next 7 days
         for day in range(days_to_check):
-            # Check morning slots (9 AM to 12 PM)
-            for hour in range(9, 12):
-                for minute in [0, 30]:
-                    check_time = current_time.replace(hour=hour, minute=minute)
-                    end_time = check_time + timedelta(minutes=duration_minutes)
-                    
-                    if self.check_availability(check_time, end_time):
-                        suggested_times.append(check_time)
-                        if len(suggested_times) >= 3:  # Return top 3 suggestions
-                            return suggested_times
-            
-            # Check afternoon slots (2 PM to 5 PM)
-            for hour in range(14, 17):
-                for minute in [0, 30]:
-                    check_time = current_time.replace(hour=hour, minute=minute)
-                    end_time = check_time + timedelta(minutes=duration_minutes)
-                    
-                    if self.check_availability(check_time, end_time):
-                        suggested_times.append(check_time)
-                        if len(suggested_times) >= 3:
-                            return suggested_times
-            
+            for hour in list(MORNING_HOURS) + list(AFTERNOON_HOURS):
+                for minute in SLOT_MINUTES:
+                    yield current_time.replace(hour=hour, minute=minute, second=0, microsecond=0)
             current_time += timedelta(days=1)
-        
-        return suggested_times
+
+    @staticmethod
+    def open_slots(candidates, busy, duration, limit=None):
+        """Candidates that do not overlap the merged busy intervals, found with one forward sweep"""
+        open_times = []
+        i = 0
+        for check_time in candidates:
+            slot_start, slot_end = to_utc(check_time), to_utc(check_time + duration)
+            while i < len(busy) and busy[i][1] <= slot_start:
+                i += 1
+            if i == len(busy) or busy[i][0] >= slot_end:
+                open_times.append(check_time)
+                if limit is not None and len(open_times) >= limit:
+                    break
+        return open_times
+
+    def suggest_alternative_times(self, desired_time, duration_minutes=30, days_to_check=7, max_suggestions=3,
+                                  teacher_name=None):
+        """Suggest alternative times when there's a conflict.
+        Busy time for the whole search window is fetched in one round trip and the
+        candidate slots are matched against it in memory.
+        """
+        duration = timedelta(minutes=duration_minutes)
+        candidates = list(self.candidate_slots(desired_time, days_to_check))
+        if not candidates:
+            return []
+
+        busy = self.get_busy_intervals(candidates[0], candidates[-1] + duration, teacher_name)
+        return self.open_slots(candidates, busy, duration, max_suggestions)
+
+    def find_teacher_availability(self, desired_time, subject=None, teacher_names=None, duration_minutes=30,
+                                  days_to_check=7):
+        """Open slots per teacher, e.g. "when is any science teacher free this week".
+        Teachers are picked by name or by subject, and every teacher's busy time is fetched
+        in one batched freebusy request.
+        """
+        if teacher_names is None:
+            teachers = self.db.get_all_teachers() if self.db is not None else []
+            teacher_names = [
+                teacher['name'] for teacher in teachers
+                if not subject or subject.lower() in (teacher.get('subject') or '').lower()
+            ]
+        if not teacher_names:
+            return {}
+
+        duration = timedelta(minutes=duration_minutes)
+        candidates = list(self.candidate_slots(desired_time, days_to_check))
+        if not candidates:
+            return {name: [] for name in teacher_names}
+        calendars = {name: self.calendar_for_teacher(name) for name in teacher_names}
+        busy_by_calendar = self.get_busy_by_calendar(
+            calendars.values(), candidates[0], candidates[-1] + duration
+        )
+        return {
+            name: self.open_slots(candidates, busy_by_calendar[calendar_id], duration)
+            for name, calendar_id in calendars.items()
+        }
+
+    def _conflict(self, teacher_name, start_time, duration_minutes, slot_open=None):
+        """Conflict result with alternative times, from the slot table when it has them"""
+        print(f"[CalendarManager] Conflict detected for {start_time}")
+        suggestions = None
+        if self.slots is not None:
+            if slot_open:
+                # The table was stale; record what the calendar says
+                self.slots.book(teacher_name, start_time, duration_minutes)
+            suggestions = self.slots.suggest(teacher_name, start_time)
+        if suggestions is None:
+            suggestions = self.suggest_alternative_times(start_time, duration_minutes, teacher_name=teacher_name)
+        return {
+            'status': 'conflict',
+            'suggestions': suggestions
+        }
 
     def create_appointment(self, teacher_name, parent_name, student_name, start_time, duration_minutes=30):
-        """Create a new appointment in Google Calendar"""
+        """Create a new appointment in the teacher's Google Calendar.
+        The time is held in slot_reservations before the calendar is touched, so of several
+        concurrent bookings that overlap for the same teacher only one goes ahead.
+        """
         end_time = start_time + timedelta(minutes=duration_minutes)
+        # Book under the teachers table's spelling of the name, whatever the caller said
+        teacher = self.db.get_teacher_by_name(teacher_name) if teacher_name and self.db is not None else None
+        if teacher:
+            teacher_name = teacher['name']
+        calendar_id = self.calendar_for_teacher(teacher_name)
         print(f"[CalendarManager] Attempting to create event for {teacher_name} on {start_time} - {end_time}")
-        
-        # Check for conflicts
-        if not self.check_availability(start_time, end_time):
-            print(f"[CalendarManager] Conflict detected for {start_time}")
-            return {
-                'status': 'conflict',
-                'suggestions': self.suggest_alternative_times(start_time, duration_minutes)
-            }
-        
+
+        # A slot the precomputed table already knows is taken needs no further calls
+        slot_open = self.slots.is_open(teacher_name, start_time, duration_minutes) if self.slots is not None else None
+        if slot_open is False:
+            return self._conflict(teacher_name, start_time, duration_minutes)
+
+        holder, held = uuid.uuid4().hex, None
+        if self.reserve_slots and self.db is not None:
+            key = self.reservation_key(teacher_name)
+            # None means the reservation table could not be reached; the booking goes ahead unprotected
+            held = self.db.reserve_slot(key, start_time, end_time, holder, SLOT_HOLD_TTL)
+            if held is False:
+                print(f"[CalendarManager] {teacher_name} at {start_time} is held by another booking")
+                return self._conflict(teacher_name, start_time, duration_minutes)
+
+        # An open slot is still checked against the calendar (the availability index when it covers the slot) before booking
+        try:
+            available = self.check_availability(start_time, end_time, teacher_name)
+        except Exception:
+            if held:
+                with resilience.without_deadline():
+                    self.db.release_slot(key, start_time, end_time, holder)
+            raise
+        if not available:
+            if held:
+                with resilience.without_deadline():
+                    self.db.release_slot(key, start_time, end_time, holder)
+            return self._conflict(teacher_name, start_time, duration_minutes, slot_open)
+
         # Create the event
         event = {
             'summary': f'Parent-Teacher Meeting: {parent_name} with {teacher_name}',
@@ -108,32 +398,174 @@ class CalendarManager:
         }
         
         try:
-            event = self.service.events().insert(calendarId=self.calendar_id, body=event).execute()
-            print(f"[CalendarManager] Event created successfully: {event.get('htmlLink')}")
-            return {
-                'status': 'success',
-                'event_id': event['id'],
-                'start_time': start_time,
-                'end_time': end_time
-            }
+            event = self._execute(self.service.events().insert(calendarId=calendar_id, body=event))
         except Exception as e:
             print(f"[CalendarManager] Error creating event: {e}")
+            if held:
+                with resilience.without_deadline():
+                    self.db.release_slot(key, start_time, end_time, holder)
             return {
                 'status': 'error',
                 'message': str(e)
             }
 
+        print(f"[CalendarManager] Event created successfully: {event.get('htmlLink')}")
+        # The event exists now, so nothing below may turn the booking into a reported failure
+        self._record_booking(teacher_name, calendar_id, event, start_time, duration_minutes,
+                             (key, end_time, holder) if held else None)
+        return {
+            'status': 'success',
+            'teacher_name': teacher_name,
+            'event_id': event['id'],
+            'start_time': start_time,
+            'end_time': end_time,
+            'hold': holder if held else None
+        }
+
+    def _record_booking(self, teacher_name, calendar_id, event, start_time, duration_minutes, hold):
+        """Update the index, the slot table and the hold after an event was created. Failures are
+        logged: the index and slot table catch up on their next refresh, and a hold that cannot be
+        extended expires after SLOT_HOLD_TTL while the event itself keeps the calendar check busy.
+        """
+        try:
+            if self.index is not None:
+                self.index.add_event(calendar_id, event)
+        except Exception as e:
+            print(f"[CalendarManager] Could not add event {event['id']} to the availability index: {e}")
+        try:
+            if self.slots is not None:
+                self.slots.book(teacher_name, start_time, duration_minutes)
+        except Exception as e:
+            print(f"[CalendarManager] Could not mark {teacher_name} at {start_time} booked in the slot table: {e}")
+        if hold:
+            key, end_time, holder = hold
+            # Booked: keep the key taken until the meeting is over, even if the caller stopped waiting
+            with resilience.without_deadline():
+                # One retry: confirm_slot only moves an expiry, so repeating it is harmless
+                confirmed = (self.db.confirm_slot(key, start_time, end_time, holder)
+                             or self.db.confirm_slot(key, start_time, end_time, holder))
+            if not confirmed:
+                print(f"[CalendarManager] Could not extend the hold on {teacher_name} at {start_time}; "
+                      f"it expires in {SLOT_HOLD_TTL:.0f}s")
+
+    def cancel_appointment(self, teacher_name, event_id, start_time, duration_minutes=30, hold=None,
+                           appointment_id=None):
+        """Delete an appointment's calendar event and reopen its slot: in the open-slot table and,
+        given the hold from create_appointment's result, in slot_reservations. Given appointment_id,
+        the appointments row is deleted first.
+        """
+        if appointment_id and self.db is not None:
+            with resilience.without_deadline():
+                self.db.delete_appointment(appointment_id)
+        calendar_id = self.calendar_for_teacher(teacher_name)
+        self._execute(self.service.events().delete(calendarId=calendar_id, eventId=event_id))
+        print(f"[CalendarManager] Event {event_id} for {teacher_name} on {start_time} cancelled")
+        if self.index is not None:
+            self.index.add_event(calendar_id, {'id': event_id, 'status': 'cancelled'})
+        if self.slots is not None:
+            self.slots.release(teacher_name, start_time, duration_minutes)
+        if hold and self.db is not None:
+            with resilience.without_deadline():
+                self.db.release_slot(
+                    self.reservation_key(teacher_name), start_time, start_time + timedelta(minutes=duration_minutes), hold
+                )
+        return True
+
+    def cancel_appointment_in_background(self, teacher_name, event_id, start_time, duration_minutes=30, hold=None,
+                                         appointment_id=None):
+        """Undo a booking on the calendar pool without waiting for it, e.g. one the database could not record"""
+        def cancel():
+            try:
+                with resilience.without_deadline():
+                    self.cancel_appointment(teacher_name, event_id, start_time, duration_minutes, hold, appointment_id)
+            except Exception as e:
+                print(f"[CalendarManager] Could not cancel event {event_id} for {teacher_name}: {e}")
+
+        return self._executor.submit(cancel)
+
     def get_teacher_schedule(self, teacher_name, date):
-        """Get a teacher's schedule for a specific date"""
+        """Get a teacher's schedule for a specific date.
+        On the shared calendar only the events that name the teacher are returned.
+        """
         start_time = datetime.combine(date, datetime.min.time())
         end_time = datetime.combine(date, datetime.max.time())
-        
-        events_result = self.service.events().list(
-            calendarId=self.calendar_id,
-            timeMin=start_time.isoformat(),
-            timeMax=end_time.isoformat(),
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        
-        return events_result.get('items', []) 
\ No newline at end of file
+        calendar_id = self.calendar_for_teacher(teacher_name)
+
+        events = self._from_index('events_between', calendar_id, start_time, end_time)
+        if events is None:
+            events_result = self._execute(self.service.events().list(
+                calendarId=calendar_id,
+                timeMin=to_rfc3339(start_time),
+                timeMax=to_rfc3339(end_time),
+                singleEvents=True,
+                orderBy='startTime'
+            ))
+            events = events_result.get('items', [])
+
+        if calendar_id == self.calendar_id and teacher_name:
+            events = [
+                event for event in events
+                if teacher_name in event.get('summary', '') or f"Teacher: {teacher_name}" in event.get('description', '')
+            ]
+        return events
+
+    async def check_availability_async(self, start_time, end_time, teacher_name=None, timeout=None):
+        """Async variant of check_availability that keeps the event loop free"""
+        return await self._run(self.check_availability, start_time, end_time, teacher_name, timeout=timeout)
+
+    async def suggest_alternative_times_async(self, desired_time, duration_minutes=30, days_to_check=7,
+                                              teacher_name=None, timeout=None):
+        """Async variant of suggest_alternative_times that keeps the event loop free"""
+        return await self._run(
+            self.suggest_alternative_times, desired_time, duration_minutes, days_to_check,
+            teacher_name=teacher_name, timeout=timeout
+        )
+
+    async def find_teacher_availability_async(self, desired_time, subject=None, teacher_names=None,
+                                              duration_minutes=30, days_to_check=7, timeout=None):
+        """Async variant of find_teacher_availability that keeps the event loop free"""
+        return await self._run(
+            self.find_teacher_availability, desired_time, subject, teacher_names, duration_minutes,
+            days_to_check, timeout=timeout
+        )
+
+    async def create_appointment_async(self, teacher_name, parent_name, student_name, start_time,
+                                       duration_minutes=30, timeout=None):
+        """Async variant of create_appointment; a timeout is reported as an error result, and an event
+        the abandoned call goes on to create is deleted again and its hold released
+        """
+        def undo(result):
+            if result.get('status') == 'success':
+                print(f"[CalendarManager] Booking for {teacher_name} on {start_time} finished after its caller gave up, undoing")
+                self.cancel_appointment_in_background(
+                    result['teacher_name'], result['event_id'], start_time, duration_minutes, result['hold']
+                )
+
+        try:
+            return await self._run(
+                self.create_appointment, teacher_name, parent_name, student_name, start_time,
+                duration_minutes, timeout=timeout, on_abandon=undo
+            )
+        except asyncio.TimeoutError:
+            print(f"[CalendarManager] Timed out creating event for {teacher_name} on {start_time}")
+            return {
+                'status': 'error',
+                'message': 'the calendar service did not respond in time'
+            }
+        except resilience.CircuitOpenError as e:
+            print(f"[CalendarManager] Not creating event for {teacher_name} on {start_time}: {e}")
+            return {
+                'status': 'error',
+                'message': 'the calendar service is unavailable right now'
+            }
+
+    async def cancel_appointment_async(self, teacher_name, event_id, start_time, duration_minutes=30, hold=None,
+                                       timeout=None):
+        """Async variant of cancel_appointment that keeps the event loop free"""
+        return await self._run(
+            self.cancel_appointment, teacher_name, event_id, start_time, duration_minutes, hold, timeout=timeout
+        )
+
+    async def get_teacher_schedule_async(self, teacher_name, date, timeout=None):
+        """Async variant of get_teacher_schedule that keeps the event loop free"""
+        return await self._run(self.get_teacher_schedule, teacher_name, date, timeout=timeout)
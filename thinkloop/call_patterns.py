@@ -0,0 +1,356 @@
+"""Incremental call-pattern analytics over the call lifecycle.
+
+Database feeds every log_call / update_call / update_call_details event into CallPatterns, which
+keeps one rollup per day in memory and periodically upserts it into the call_pattern_rollups
+table. Dashboards read those few rows instead of scanning call_analytics:
+
+    python call_patterns.py --days 7
+"""
+import argparse
+import atexit
+import json
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Set CALL_PATTERNS_ENABLED=false to stop maintaining call_pattern_rollups
+CALL_PATTERNS_ENABLED = os.getenv('CALL_PATTERNS_ENABLED', 'true').lower() == 'true'
+CALL_PATTERNS_FLUSH_INTERVAL = float(os.getenv('CALL_PATTERNS_FLUSH_INTERVAL', 60))  # seconds
+# Relative error of the call duration percentiles
+CALL_PATTERNS_ACCURACY = float(os.getenv('CALL_PATTERNS_ACCURACY', 0.01))
+# A call with no end event after this long is assumed lost (worker killed) and stops being tracked
+CALL_PATTERNS_ACTIVE_TTL = float(os.getenv('CALL_PATTERNS_ACTIVE_TTL', 6 * 3600))  # seconds
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class DDSketch:
+    """Mergeable quantile sketch with a fixed relative error (Masson et al., VLDB 2019).
+
+    Values are counted in logarithmic buckets, so memory grows with the log of the value
+    range rather than with the number of values: calls of 1 s to 10 h at 1% error need
+    at most ~530 buckets.
+    """
+
+    def __init__(self, relative_accuracy=CALL_PATTERNS_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = Counter()
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value):
+        if value <= 0:
+            self.zero_count += 1
+        else:
+            self.bins[math.ceil(math.log(value) / self._log_gamma)] += 1
+        self.count += 1
+
+    def merge(self, other):
+        self.bins.update(other.bins)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        """Value at quantile q, within relative_accuracy of the true one; None when empty"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'zero_count': self.zero_count,
+            'bins': {str(key): count for key, count in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data.get('relative_accuracy', CALL_PATTERNS_ACCURACY))
+        sketch.zero_count = data.get('zero_count', 0)
+        sketch.bins.update({int(key): count for key, count in (data.get('bins') or {}).items()})
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        return sketch
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def _minute(moment):
+    """Minute of the day, the resolution concurrency is tracked at"""
+    return moment.hour * 60 + moment.minute
+
+
+class DayRollup:
+    """Everything known about one day's calls, as counters that merge by addition"""
+
+    def __init__(self, period, relative_accuracy=CALL_PATTERNS_ACCURACY):
+        self.period = period
+        self.hourly = [0] * 24
+        self.calls_started = 0
+        self.calls_completed = 0
+        self.calls_failed = 0
+        self.callers_identified = 0
+        self.languages = Counter()
+        self.durations = DDSketch(relative_accuracy)
+        # Calls starting and ending per minute of the day. Unlike a peak, these add up across
+        # workers, so peak concurrency is computed when rows are merged.
+        self.starts = Counter()
+        self.ends = Counter()
+
+    def to_row(self, source):
+        return {
+            'period': self.period.isoformat(),
+            'source': source,
+            'hourly': list(self.hourly),
+            'calls_started': self.calls_started,
+            'calls_completed': self.calls_completed,
+            'calls_failed': self.calls_failed,
+            'callers_identified': self.callers_identified,
+            'languages': dict(self.languages),
+            'duration_sketch': self.durations.to_dict(),
+            'concurrency': {
+                str(minute): [self.starts[minute], self.ends[minute]] for minute in sorted(set(self.starts) | set(self.ends))
+            },
+            'updated_at': datetime.utcnow().isoformat(),
+        }
+
+
+class CallPatterns:
+    """Streaming aggregation of call lifecycle events into per-day rollups.
+
+    Memory is bounded by the calls currently in progress plus the days not yet flushed:
+    each rollup is a 24-slot hourly histogram, a language counter and a duration sketch.
+    Every process writes its own rollup row per day (keyed on period and source), so
+    workers never overwrite each other and a report merges the rows it reads.
+    Calls that never report an end are dropped after active_ttl; they count as started only,
+    and as ending when they were dropped for peak concurrency.
+    """
+
+    def __init__(self, backend, flush_interval=CALL_PATTERNS_FLUSH_INTERVAL, relative_accuracy=CALL_PATTERNS_ACCURACY,
+                 active_ttl=CALL_PATTERNS_ACTIVE_TTL):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.active_ttl = active_ttl
+        self.relative_accuracy = relative_accuracy
+        self.source = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._days = {}
+        self._dirty = set()
+        self._active = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushes = 0
+
+    def _day(self, period):
+        rollup = self._days.get(period)
+        if rollup is None:
+            rollup = self._days[period] = DayRollup(period, self.relative_accuracy)
+        self._dirty.add(period)
+        return rollup
+
+    def call_started(self, call_id, start_time, language):
+        start_time = _as_datetime(start_time)
+        with self._lock:
+            if call_id in self._active:
+                return
+            rollup = self._day(start_time.date())
+            rollup.hourly[start_time.hour] += 1
+            rollup.calls_started += 1
+            rollup.languages[language] += 1
+            rollup.starts[_minute(start_time)] += 1
+            self._active[call_id] = {
+                'period': start_time.date(), 'language': language, 'identified': False, 'started': time.monotonic()
+            }
+
+    def call_ended(self, call_id, end_time, duration, status='completed'):
+        """Count a call that ended normally ('completed') or in an error (any other status)"""
+        end_time = _as_datetime(end_time)
+        with self._lock:
+            call = self._active.pop(call_id, None)
+            # A call that started before this process did is counted on the day it ended
+            rollup = self._day(call['period'] if call else end_time.date())
+            if status == 'completed':
+                rollup.calls_completed += 1
+            else:
+                rollup.calls_failed += 1
+            # Recorded even for a call this process did not see start: the start is in another row
+            self._day(end_time.date()).ends[_minute(end_time)] += 1
+            if duration is not None:
+                rollup.durations.add(duration)
+
+    def call_updated(self, call_id, **fields):
+        with self._lock:
+            call = self._active.get(call_id)
+            if call is None:
+                return
+            rollup = self._day(call['period'])
+            if fields.get('caller_name') and not call['identified']:
+                call['identified'] = True
+                rollup.callers_identified += 1
+            language = fields.get('language')
+            if language and language != call['language']:
+                rollup.languages[call['language']] -= 1
+                rollup.languages[language] += 1
+                call['language'] = language
+
+    def _expire_active(self):
+        """Stop tracking calls that started more than active_ttl ago and never ended"""
+        cutoff = time.monotonic() - self.active_ttl
+        expired = [call_id for call_id, call in self._active.items() if call['started'] < cutoff]
+        now = datetime.now()
+        for call_id in expired:
+            del self._active[call_id]
+            self._day(now.date()).ends[_minute(now)] += 1
+        if expired:
+            print(f"[CallPatterns] Dropped {len(expired)} calls that never ended")
+
+    def flush(self):
+        """Upsert the rollups that changed since the last flush; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                self._expire_active()
+                periods = sorted(self._dirty)
+                rows = [self._days[period].to_row(self.source) for period in periods]
+                self._dirty.clear()
+            if rows:
+                try:
+                    self.backend.upsert_call_rollups(rows)
+                except Exception as e:
+                    print(f"[CallPatterns] Error writing {len(rows)} rollups: {e}")
+                    with self._lock:
+                        self._dirty.update(periods)
+                    return 0
+                self.flushes += 1
+            with self._lock:
+                # Keep today and yesterday for late events; older days are final once written
+                cutoff = date.today() - timedelta(days=1)
+                open_days = {call['period'] for call in self._active.values()}
+                for period in list(self._days):
+                    if period < cutoff and period not in open_days and period not in self._dirty:
+                        del self._days[period]
+            return len(rows)
+
+    def report(self, start_date, end_date):
+        """Call patterns between two dates (inclusive), merged from the rollup rows"""
+        self.flush()
+        rows = self.backend.get_call_rollups(start_date.isoformat(), end_date.isoformat())
+        return summarize_rollups(rows)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self):
+        """Flush in the background every flush_interval seconds and once more at exit"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='call-patterns-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+
+def _load(value):
+    return json.loads(value) if isinstance(value, str) else (value or {})
+
+
+def summarize_rollups(rows, quantiles=QUANTILES):
+    """Merge rollup rows into a dashboard summary; hourly counts are grouped by weekday (0 = Monday)"""
+    by_weekday = [[0] * 24 for _ in range(7)]
+    languages = Counter()
+    durations = None
+    started = completed = failed = identified = 0
+    minutes = Counter()
+    for row in rows:
+        weekday = date.fromisoformat(row['period']).weekday()
+        for hour, count in enumerate(_load(row['hourly']) or [0] * 24):
+            by_weekday[weekday][hour] += count
+        started += row['calls_started'] or 0
+        completed += row['calls_completed'] or 0
+        failed += row.get('calls_failed') or 0
+        identified += row['callers_identified'] or 0
+        languages.update(_load(row['languages']))
+        sketch = DDSketch.from_dict(_load(row['duration_sketch']))
+        durations = sketch if durations is None else durations.merge(sketch)
+        for minute, (starts, ends) in _load(row.get('concurrency')).items():
+            moment = (row['period'], int(minute))
+            minutes[moment, 'starts'] += starts
+            minutes[moment, 'ends'] += ends
+
+    # Replay the merged starts and ends in time order. Within a minute, every start is counted
+    # before any end, so the peak is never under-reported. Calls already running when the
+    # window opens are not known, so the level never drops below zero.
+    level = peak = 0
+    peak_at = None
+    for moment in sorted({moment for moment, _ in minutes}):
+        if level + minutes[moment, 'starts'] > peak:
+            peak = level + minutes[moment, 'starts']
+            peak_at = f"{moment[0]}T{moment[1] // 60:02d}:{moment[1] % 60:02d}"
+        level = max(0, level + minutes[moment, 'starts'] - minutes[moment, 'ends'])
+
+    return {
+        'calls_started': started,
+        'calls_completed': completed,
+        'calls_failed': failed,
+        'completion_rate': round(completed / started, 4) if started else None,
+        'failure_rate': round(failed / started, 4) if started else None,
+        'caller_identification_rate': round(identified / started, 4) if started else None,
+        'duration_seconds': {
+            f'p{round(q * 100)}': (round(durations.quantile(q), 1) if durations and durations.count else None)
+            for q in quantiles
+        },
+        'languages': {language: count for language, count in languages.most_common() if count},
+        'peak_concurrency': peak,
+        'peak_concurrency_at': peak_at,
+        'calls_by_weekday_hour': by_weekday,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print call patterns from the call_pattern_rollups table')
+    parser.add_argument('--days', type=int, default=7, help='days back from today to include')
+    args = parser.parse_args()
+
+    from storage import create_backend
+
+    backend = create_backend()
+    try:
+        end = date.today()
+        rows = backend.get_call_rollups((end - timedelta(days=args.days - 1)).isoformat(), end.isoformat())
+        print(json.dumps(summarize_rollups(rows), indent=2))
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
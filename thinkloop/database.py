@@ -1,46 +1,122 @@
-from supabase import create_client
 import os
 from dotenv import load_dotenv
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import json
+import re
+
+from availability_index import to_utc
+from cache import TTLCache
+from call_patterns import CALL_PATTERNS_ENABLED, CallPatterns, summarize_rollups
+from slot_table import SLOT_DURATION_MINUTES
+from storage import SupabaseBackend, create_backend
+from write_behind import CallAnalyticsBuffer
 
 load_dotenv()
 
+# Write-behind for call_analytics: set CALL_ANALYTICS_WRITE_BEHIND=false to write synchronously
+CALL_ANALYTICS_WRITE_BEHIND = os.getenv('CALL_ANALYTICS_WRITE_BEHIND', 'true').lower() == 'true'
+CALL_ANALYTICS_BATCH_SIZE = int(os.getenv('CALL_ANALYTICS_BATCH_SIZE', 50))
+CALL_ANALYTICS_FLUSH_INTERVAL = float(os.getenv('CALL_ANALYTICS_FLUSH_INTERVAL', 2))  # seconds
+# Seconds a written call that never completed stays buffered before it is dropped
+CALL_ANALYTICS_ROW_TTL = float(os.getenv('CALL_ANALYTICS_ROW_TTL', 6 * 3600))
+
+# Reference data read-through cache TTLs, in seconds
+CACHE_TTL_SCHOOL_INFO = float(os.getenv('CACHE_TTL_SCHOOL_INFO', 3600))
+CACHE_TTL_TEACHERS = float(os.getenv('CACHE_TTL_TEACHERS', 600))
+CACHE_NEGATIVE_TTL = float(os.getenv('CACHE_NEGATIVE_TTL', 60))
+CACHE_TEACHER_MAXSIZE = int(os.getenv('CACHE_TEACHER_MAXSIZE', 256))
+
+# Rows fetched per request by the streaming readers
+DATABASE_PAGE_SIZE = int(os.getenv('DATABASE_PAGE_SIZE', 500))
+
+
+def _paged(fetch_page, sort_key, columns, page_size, after=None):
+    """Yield rows from keyset-paginated fetches, one page in memory at a time.
+    The (sort_key, id) cursor columns are always fetched and dropped again if not asked for.
+    Backends leave out rows whose sort_key is NULL; a NULL cursor could not resume the scan.
+    """
+    fetched = list(columns) if columns else ['*']
+    if columns:
+        fetched += [key for key in (sort_key, 'id') if key not in fetched]
+    while True:
+        page = fetch_page(fetched, after, page_size)
+        for row in page:
+            yield {column: row[column] for column in columns} if columns else row
+        if len(page) < page_size:
+            return
+        after = (page[-1][sort_key], page[-1]['id'])
+        if after[0] is None:
+            raise ValueError(f"cannot page past a row with no {sort_key} (id {after[1]})")
+
+def _slot_key(start_time):
+    """Reservation keys are UTC ISO timestamps, so the same slot always maps to the same key"""
+    return to_utc(start_time).isoformat()
+
+
+def _slot_cells(start_time, end_time):
+    """Keys of the SLOT_DURATION_MINUTES grid cells that [start_time, end_time) overlaps, so
+    bookings that overlap without starting at the same time still contend for a key
+    """
+    grid = timedelta(minutes=SLOT_DURATION_MINUTES)
+    start, end = to_utc(start_time), to_utc(end_time)
+    cell = start - (start - datetime(1970, 1, 1, tzinfo=timezone.utc)) % grid
+    cells = []
+    while cell < end:
+        cells.append(cell.isoformat())
+        cell += grid
+    return cells
+
+
+HONORIFICS = {'mr', 'mrs', 'ms', 'miss', 'mx', 'dr', 'prof', 'professor', 'sir', 'madam', 'maam'}
+
+
+def normalize_teacher_name(name):
+    """'Mrs. Priya  Sharma' -> 'priya sharma': case, punctuation and titles do not tell teachers apart"""
+    words = re.findall(r'[^\W_]+', (name or '').casefold().replace("'", ''))
+    return ' '.join(word for word in words if word not in HONORIFICS)
+
+
 class Database:
-    def __init__(self):
-        """Initialize Supabase client"""
+    def __init__(self, client=None, backend=None):
+        """Initialize the storage backend selected by DATABASE_BACKEND.
+        Pass a Supabase client (e.g. a local fake) or a StorageBackend to use one that is already configured.
+        """
         try:
-            self.supabase_url = os.getenv('SUPABASE_URL')
-            self.supabase_key = os.getenv('SUPABASE_KEY')
-            
-            if not self.supabase_url or not self.supabase_key:
-                raise ValueError("Missing Supabase credentials in .env file")
-                
-            self.supabase = create_client(self.supabase_url, self.supabase_key)
-            print("Successfully connected to Supabase")
+            if backend is not None:
+                self.backend = backend
+            elif client is not None:
+                self.backend = SupabaseBackend(client)
+            else:
+                self.backend = create_backend()
+
+            self.cache = {
+                'school_info': TTLCache(CACHE_TTL_SCHOOL_INFO, maxsize=1, negative_ttl=CACHE_NEGATIVE_TTL),
+                'teachers': TTLCache(CACHE_TTL_TEACHERS, maxsize=1, negative_ttl=CACHE_NEGATIVE_TTL),
+                'teacher_by_name': TTLCache(
+                    CACHE_TTL_TEACHERS, maxsize=CACHE_TEACHER_MAXSIZE, negative_ttl=CACHE_NEGATIVE_TTL
+                ),
+            }
+
+            self.call_buffer = None
+            if CALL_ANALYTICS_WRITE_BEHIND:
+                self.call_buffer = CallAnalyticsBuffer(
+                    self._upsert_call_rows,
+                    max_batch=CALL_ANALYTICS_BATCH_SIZE,
+                    flush_interval=CALL_ANALYTICS_FLUSH_INTERVAL,
+                    row_ttl=CALL_ANALYTICS_ROW_TTL
+                ).start()
+
+            # Rolling call-pattern rollups fed by the call lifecycle methods below
+            self.call_patterns = CallPatterns(self.backend).start() if CALL_PATTERNS_ENABLED else None
         except Exception as e:
-            print(f"Error initializing Supabase client: {str(e)}")
+            print(f"Error initializing database backend: {str(e)}")
             raise
 
     def initialize_tables(self):
-        """Check if required tables exist in Supabase"""
+        """Check if required tables exist in the database"""
         try:
-            # Check school_info table
-            response = self.supabase.table('school_info').select('*').limit(1).execute()
-            print("school_info table exists")
-            
-            # Check teachers table
-            response = self.supabase.table('teachers').select('*').limit(1).execute()
-            print("teachers table exists")
-            
-            # Check appointments table
-            response = self.supabase.table('appointments').select('*').limit(1).execute()
-            print("appointments table exists")
-            
-            # Check call_analytics table
-            response = self.supabase.table('call_analytics').select('*').limit(1).execute()
-            print("call_analytics table exists")
-            
+            self.backend.check_tables()
+
         except Exception as e:
             print(f"Error checking tables: {str(e)}")
             raise
@@ -49,11 +125,10 @@ class Database:
         """Initialize school information in the database"""
         try:
             # Check if school info already exists
-            response = self.supabase.table('school_info').select('*').execute()
-            
-            if not response.data:
+            if not self.backend.get_school_info():
                 # Insert new school info
-                response = self.supabase.table('school_info').insert(school_info).execute()
+                self.backend.insert_school_info(school_info)
+                self.invalidate_cache('school_info')
                 print("School information initialized successfully")
             else:
                 print("School information already exists")
@@ -77,11 +152,11 @@ class Database:
                 'status': 'scheduled'
             }
             
-            response = self.supabase.table('appointments').insert(appointment_data).execute()
+            row = self.backend.insert_appointment(appointment_data)
             
-            if response.data:
-                print(f"Appointment added successfully with ID: {response.data[0]['id']}")
-                return response.data[0]['id']
+            if row:
+                print(f"Appointment added successfully with ID: {row['id']}")
+                return row['id']
             else:
                 print("Failed to add appointment")
                 return None
@@ -90,8 +165,100 @@ class Database:
             print(f"Error adding appointment: {str(e)}")
             return None
 
+    def delete_appointment(self, appointment_id):
+        """Remove an appointment row, e.g. one whose booking was rolled back"""
+        try:
+            self.backend.delete_appointment(appointment_id)
+            return True
+        except Exception as e:
+            print(f"Error deleting appointment {appointment_id}: {str(e)}")
+            return False
+
+    def reserve_slot(self, teacher_key, start_time, end_time, holder, ttl):
+        """Hold a teacher's time for ttl seconds so concurrent bookings of it fail fast. Every grid
+        cell the booking overlaps is claimed, all or none. teacher_key names the teacher's calendar
+        (see CalendarManager.reservation_key), not the spelling the caller used.
+        Returns True if held, False if someone else holds any of it, and None if the hold could not be checked.
+        """
+        try:
+            now = datetime.now(timezone.utc)
+            return self.backend.claim_slots(
+                teacher_key, _slot_cells(start_time, end_time), holder,
+                (now + timedelta(seconds=ttl)).isoformat(), now.isoformat()
+            )
+        except Exception as e:
+            print(f"Error reserving slot: {str(e)}")
+            return None
+
+    def confirm_slot(self, teacher_key, start_time, end_time, holder):
+        """Keep a hold until the booked appointment is over"""
+        try:
+            self.backend.extend_slots(teacher_key, _slot_cells(start_time, end_time), holder, _slot_key(end_time))
+            return True
+        except Exception as e:
+            print(f"Error confirming slot: {str(e)}")
+            return False
+
+    def release_slot(self, teacher_key, start_time, end_time, holder):
+        """Give up a hold so the time can be booked again at once"""
+        try:
+            self.backend.release_slots(teacher_key, _slot_cells(start_time, end_time), holder)
+            return True
+        except Exception as e:
+            print(f"Error releasing slot: {str(e)}")
+            return False
+
+    def get_reminded_appointments(self, appointment_ids):
+        """Ids among appointment_ids that already had a reminder; None if that could not be checked"""
+        try:
+            return self.backend.get_reminded(appointment_ids)
+        except Exception as e:
+            print(f"Error checking sent reminders: {str(e)}")
+            return None
+
+    def record_reminders_sent(self, appointment_ids):
+        """Mark reminders as sent so later runs skip these appointments"""
+        try:
+            sent_at = datetime.now(timezone.utc).isoformat()
+            self.backend.record_reminders([
+                {'appointment_id': appointment_id, 'sent_at': sent_at} for appointment_id in appointment_ids
+            ])
+            return True
+        except Exception as e:
+            print(f"Error recording sent reminders: {str(e)}")
+            return False
+
+    def cache_stats(self):
+        """Hit/miss counters and sizes of the reference data caches"""
+        return {name: cache.stats() for name, cache in self.cache.items()}
+
+    def invalidate_cache(self, *names):
+        """Drop cached reference data; with no names every cache is cleared"""
+        for name in names or self.cache:
+            self.cache[name].invalidate()
+
+    def _upsert_call_rows(self, rows):
+        """Write a batch of buffered call_analytics rows in one request"""
+        self.backend.upsert_calls(rows)
+
+    def flush(self):
+        """Write any buffered call_analytics changes now"""
+        if self.call_buffer is not None:
+            return self.call_buffer.flush()
+        return 0
+
+    def close(self):
+        """Stop background writers, flushing what they still hold"""
+        if self.call_buffer is not None:
+            self.call_buffer.stop()
+        if self.call_patterns is not None:
+            self.call_patterns.stop()
+        self.backend.close()
+
     def log_call(self, call_id, start_time, language, caller_name=None):
-        """Log a new call in the database"""
+        """Log a new call in the database.
+        With write-behind enabled the row is buffered and the call_id is returned immediately.
+        """
         try:
             call_data = {
                 'call_id': call_id,
@@ -100,12 +267,18 @@ class Database:
                 'status': 'in_progress',
                 'caller_name': caller_name
             }
+            if self.call_patterns is not None:
+                self.call_patterns.call_started(call_id, start_time, language)
+
+            if self.call_buffer is not None:
+                self.call_buffer.record(**call_data)
+                return call_id
+
+            row = self.backend.insert_call(call_data)
             
-            response = self.supabase.table('call_analytics').insert(call_data).execute()
-            
-            if response.data:
-                print(f"Call logged successfully with ID: {response.data[0]['id']}")
-                return response.data[0]['id']
+            if row:
+                print(f"Call logged successfully with ID: {row['id']}")
+                return row['id']
             else:
                 print("Failed to log call")
                 return None
@@ -114,18 +287,22 @@ class Database:
             print(f"Error logging call: {str(e)}")
             return None
 
-    def update_call(self, call_id, end_time, duration):
-        """Update call information when it ends"""
+    def update_call(self, call_id, end_time, duration, status='completed'):
+        """Update call information when it ends; status is 'failed' when the call ended in an error"""
         try:
             update_data = {
                 'end_time': end_time.isoformat(),
                 'duration': duration,
-                'status': 'completed'
+                'status': status
             }
-            
-            response = self.supabase.table('call_analytics').update(update_data).eq('call_id', call_id).execute()
-            
-            if response.data:
+            if self.call_patterns is not None:
+                self.call_patterns.call_ended(call_id, end_time, duration, status)
+
+            if self.call_buffer is not None:
+                self.call_buffer.record(call_id, **update_data)
+                return True
+
+            if self.backend.update_call(call_id, update_data):
                 print(f"Call updated successfully")
                 return True
             else:
@@ -154,36 +331,93 @@ class Database:
                     update_data[key] = value.isoformat()
                 else:
                     update_data[key] = value
+            if self.call_patterns is not None:
+                self.call_patterns.call_updated(call_id, **kwargs)
+
+            if self.call_buffer is not None:
+                self.call_buffer.record(call_id, **update_data)
+                return True
 
-            response = self.supabase.table('call_analytics').update(update_data).eq('call_id', call_id).execute()
+            updated = self.backend.update_call(call_id, update_data)
             
-            if response.data:
+            if updated:
                 print(f"Call details updated successfully for call_id: {call_id}")
                 return True
             else:
-                print(f"Failed to update call details for call_id: {call_id}. Response: {response.data}")
+                print(f"Failed to update call details for call_id: {call_id}. Response: {updated}")
                 return False
                 
         except Exception as e:
             print(f"Error updating call details for call_id {call_id}: {str(e)}")
             return False
 
-    def get_appointments(self, teacher_name=None, start_date=None, end_date=None):
-        """Get appointments from the database with optional filters"""
+    def call_pattern_report(self, start_date, end_date):
+        """Call volume by weekday and hour, completion and failure rates, duration percentiles,
+        language mix and peak concurrency between two dates, read from the pre-aggregated call_pattern_rollups table
+        """
         try:
-            query = self.supabase.table('appointments').select('*')
-            
-            if teacher_name:
-                query = query.eq('teacher_name', teacher_name)
-            if start_date:
-                query = query.gte('date_time', start_date.isoformat())
-            if end_date:
-                query = query.lte('date_time', end_date.isoformat())
-                
-            response = query.execute()
+            if self.call_patterns is not None:
+                return self.call_patterns.report(start_date, end_date)
+            return summarize_rollups(self.backend.get_call_rollups(start_date.isoformat(), end_date.isoformat()))
+        except Exception as e:
+            print(f"Error reading call patterns: {str(e)}")
+            return None
+
+    def iter_appointments(self, teacher_name=None, start_date=None, end_date=None, columns=None,
+                          page_size=DATABASE_PAGE_SIZE):
+        """Stream appointments ordered by date_time in constant memory.
+        Pages are fetched by keyset on (date_time, id), so later pages cost the same as the first.
+        columns limits the fields fetched. Errors are raised, since a stream that stopped early
+        would look complete.
+        """
+        start = start_date.isoformat() if start_date else None
+        end = end_date.isoformat() if end_date else None
+        return _paged(
+            lambda fetched, after, limit: self.backend.page_appointments(
+                fetched, teacher_name, start, end, after, limit
+            ),
+            'date_time', columns, page_size
+        )
+
+    def count_appointments(self, teacher_name=None, start_date=None, end_date=None):
+        """Number of matching appointments, counted by the database without fetching rows"""
+        try:
+            return self.backend.count_appointments(
+                teacher_name,
+                start_date.isoformat() if start_date else None,
+                end_date.isoformat() if end_date else None
+            )
+        except Exception as e:
+            print(f"Error counting appointments: {str(e)}")
+            return None
+
+    def iter_teachers(self, columns=None, page_size=DATABASE_PAGE_SIZE):
+        """Stream teachers ordered by name in constant memory, like iter_appointments"""
+        return _paged(self.backend.page_teachers, 'name', columns, page_size)
+
+    def iter_rows(self, table, order_by, range_column=None, start_date=None, end_date=None, after=None,
+                  columns=None, page_size=DATABASE_PAGE_SIZE):
+        """Stream any table ordered by (order_by, id) for bulk exports, resuming after an
+        (order_by, id) cursor. start_date/end_date filter on range_column.
+        """
+        start = start_date.isoformat() if start_date else None
+        end = end_date.isoformat() if end_date else None
+        return _paged(
+            lambda fetched, cursor, limit: self.backend.page_rows(
+                table, fetched, order_by, range_column, start, end, cursor, limit
+            ),
+            order_by, columns, page_size, after
+        )
+
+    def get_appointments(self, teacher_name=None, start_date=None, end_date=None, columns=None):
+        """Get appointments from the database with optional filters.
+        Rows are fetched in pages; use iter_appointments to process them without holding them all.
+        """
+        try:
+            appointments = list(self.iter_appointments(teacher_name, start_date, end_date, columns))
             
-            if response.data:
-                return response.data
+            if appointments:
+                return appointments
             else:
                 print("No appointments found")
                 return []
@@ -193,46 +427,64 @@ class Database:
             return []
 
     def get_all_teachers(self):
-        """Get all teachers from the database"""
+        """Get all teachers (cached for CACHE_TTL_TEACHERS seconds)"""
+        def load():
+            return list(self.iter_teachers()) or None
+
         try:
-            response = self.supabase.table('teachers').select('*').execute()
-            
-            if response.data:
-                return response.data
+            teachers = self.cache['teachers'].get_or_load('all', load)
+
+            if teachers:
+                return list(teachers)
             else:
                 print("No teachers found")
                 return []
-                
+
         except Exception as e:
             print(f"Error getting teachers: {str(e)}")
             return []
 
     def get_teacher_by_name(self, name):
-        """Get a specific teacher by name"""
+        """Get a specific teacher by name (cached, including misses).
+        A name with no exact match is compared to every teacher ignoring case, punctuation and
+        titles, so 'mrs sharma' finds 'Mrs. Sharma' as long as only one teacher matches.
+        """
+        def load():
+            teachers = self.backend.get_teachers(name)
+            if teachers:
+                return teachers[0]
+            wanted = normalize_teacher_name(name)
+            matches = [teacher for teacher in self.get_all_teachers() if normalize_teacher_name(teacher['name']) == wanted]
+            return matches[0] if wanted and len(matches) == 1 else None
+
         try:
-            response = self.supabase.table('teachers').select('*').eq('name', name).execute()
-            
-            if response.data:
-                return response.data[0]
+            teacher = self.cache['teacher_by_name'].get_or_load(name, load)
+
+            if teacher:
+                return dict(teacher)
             else:
                 print(f"No teacher found with name: {name}")
                 return None
-                
+
         except Exception as e:
             print(f"Error getting teacher: {str(e)}")
             return None
 
     def get_school_info(self):
-        """Get school information from the database"""
+        """Get school information (cached for CACHE_TTL_SCHOOL_INFO seconds)"""
+        def load():
+            rows = self.backend.get_school_info()
+            return rows[0] if rows else None
+
         try:
-            response = self.supabase.table('school_info').select('*').execute()
-            
-            if response.data:
-                return response.data[0]
+            school_info = self.cache['school_info'].get_or_load('school', load)
+
+            if school_info:
+                return dict(school_info)
             else:
                 print("No school information found")
                 return None
-                
+
         except Exception as e:
             print(f"Error getting school info: {str(e)}")
             return None
@@ -241,9 +493,7 @@ class Database:
         """Initialize default teachers in the database"""
         try:
             # Check if teachers already exist
-            response = self.supabase.table('teachers').select('*').execute()
-            
-            if not response.data:
+            if not self.backend.get_teachers():
                 default_teachers = [
                     {
                         'name': 'Dr. Sarah Johnson',
@@ -281,7 +531,8 @@ class Database:
                         'office_hours': '10:30 AM - 4:30 PM'
                     }
                 ]
-                response = self.supabase.table('teachers').insert(default_teachers).execute()
+                self.backend.insert_teachers(default_teachers)
+                self.invalidate_cache('teachers', 'teacher_by_name')
                 print("Default teachers initialized successfully")
             else:
                 print("Teachers already exist in the database.")
@@ -1,26 +1,57 @@
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+import threading
 from dotenv import load_dotenv
 
+from email_outbox import EmailOutbox, SMTPSession
+
 load_dotenv()
 
+# One outbox (and sender thread) per file per process, however many managers are created
+_outboxes = {}
+_outboxes_lock = threading.Lock()
+
 class EmailManager:
-    def __init__(self):
+    def __init__(self, use_outbox=True):
+        """use_outbox=False skips the background outbox, for batch jobs that send over their own session"""
         self.sender_email = os.getenv('EMAIL_USER')
         self.sender_password = os.getenv('EMAIL_PASS')
         self.smtp_server = os.getenv('EMAIL_HOST')
         self.smtp_port = int(os.getenv('EMAIL_PORT', 587)) # Default to 587 for TLS
+        self.use_tls = os.getenv('EMAIL_USE_TLS', 'true').lower() == 'true'
+        self.idle_timeout = float(os.getenv('EMAIL_IDLE_TIMEOUT', 60))
+        self.outbox_path = os.getenv('EMAIL_OUTBOX_PATH', 'email_outbox.db')
+        self.outbox = None
 
-        if not all([self.sender_email, self.sender_password, self.smtp_server]):
+        if not self.configured:
             print("[EmailManager] WARNING: Email credentials not fully configured. Email sending will be skipped.")
+        elif use_outbox:
+            self.outbox = self.get_outbox()
 
-    def send_appointment_confirmation_email(self, recipient_email, parent_name, student_name, teacher_name, date_time, purpose):
-        if not self.sender_email or not self.sender_password or not self.smtp_server:
-            print("[EmailManager] Skipping email sending due to missing credentials.")
-            return False
+    @property
+    def configured(self):
+        """Whether EMAIL_USER, EMAIL_PASS and EMAIL_HOST are all set"""
+        return all([self.sender_email, self.sender_password, self.smtp_server])
 
+    def create_smtp_session(self):
+        """Create a persistent SMTP session using the configured server and credentials"""
+        return SMTPSession(
+            self.smtp_server, self.smtp_port, self.sender_email, self.sender_password,
+            use_tls=self.use_tls, idle_timeout=self.idle_timeout
+        )
+
+    def get_outbox(self):
+        """Return the process-wide outbox for the configured file, starting its sender if needed"""
+        with _outboxes_lock:
+            outbox = _outboxes.get(self.outbox_path)
+            if outbox is None:
+                outbox = EmailOutbox(self.create_smtp_session(), path=self.outbox_path)
+                _outboxes[self.outbox_path] = outbox
+            return outbox.start()
+
+    def build_appointment_confirmation_email(self, recipient_email, parent_name, student_name, teacher_name, date_time, purpose):
+        """Build the confirmation message without sending it"""
         subject = f"Appointment Confirmation: {parent_name} with {teacher_name}"
         body = f"""
         Dear {parent_name},
@@ -43,14 +74,36 @@ class EmailManager:
         msg['Subject'] = subject
 
         msg.attach(MIMEText(body, 'plain'))
+        return msg
 
+    def build_reminder_email(self, recipient_email, subject, body):
+        """Build an already rendered reminder; UTF-8 so every language survives"""
+        msg = MIMEText(body, 'plain', 'utf-8')
+        msg['From'] = self.sender_email
+        msg['To'] = recipient_email
+        msg['Subject'] = subject
+        return msg
+
+    def send_appointment_confirmation_email(self, recipient_email, parent_name, student_name, teacher_name, date_time, purpose):
+        """Queue a confirmation email; returns as soon as it is persisted in the outbox"""
+        if self.outbox is None:
+            print("[EmailManager] Skipping email sending due to missing credentials.")
+            return False
+
+        msg = self.build_appointment_confirmation_email(
+            recipient_email, parent_name, student_name, teacher_name, date_time, purpose
+        )
         try:
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls() # Enable TLS encryption
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(msg)
-            print(f"[EmailManager] Confirmation email sent to {recipient_email}")
+            self.outbox.enqueue(msg)
+            print(f"[EmailManager] Confirmation email to {recipient_email} queued")
             return True
         except Exception as e:
-            print(f"[EmailManager] Failed to send email to {recipient_email}: {e}")
-            return False 
\ No newline at end of file
+            print(f"[EmailManager] Failed to queue email to {recipient_email}: {e}")
+            return False
+
+    def close(self, flush_timeout=10):
+        """Drain and stop the outbox sender, e.g. at worker shutdown"""
+        with _outboxes_lock:
+            outbox = _outboxes.pop(self.outbox_path, None)
+        if outbox is not None:
+            outbox.stop(flush_timeout) 
\ No newline at end of file
@@ -0,0 +1,270 @@
+import os
+import random
+import smtplib
+import sqlite3
+import threading
+import time
+
+from metrics import timed
+import resilience
+
+# Rows stuck in 'sending' longer than this (e.g. the worker died mid-send) are retried
+CLAIM_LEASE_SECONDS = 300
+
+
+class SMTPSession:
+    """Long-lived authenticated SMTP connection shared by every message a sender delivers.
+
+    The connection is opened lazily, probed with NOOP after it has been idle for
+    idle_timeout seconds and transparently re-established if the server dropped it.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True, idle_timeout=60, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.server = None
+        self.last_used = 0.0
+        self.connections_opened = 0
+
+    def _open(self):
+        with timed('smtp', 'connect'):
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                server.starttls()  # Enable TLS encryption
+            if self.password and server.has_extn('auth'):
+                server.login(self.username, self.password)
+        return server
+
+    def _connect(self):
+        self.close()
+        # Connecting is safe to retry; fails fast while the SMTP circuit is open
+        self.server = resilience.call('smtp', 'connect', self._open, idempotent=True)
+        self.connections_opened += 1
+        print(f"[SMTPSession] Connected to {self.host}:{self.port}")
+
+    def _ensure_connected(self):
+        if self.server is None:
+            self._connect()
+        elif time.monotonic() - self.last_used > self.idle_timeout:
+            try:
+                status, _ = self.server.noop()
+                if status != 250:
+                    self._connect()
+            except smtplib.SMTPException:
+                self._connect()
+
+    def _sendmail(self, sender, recipient, message):
+        with timed('smtp', 'send'):
+            self.server.sendmail(sender, [recipient], message)
+
+    def send(self, sender, recipient, message):
+        """Send one raw message, reconnecting once if the server hung up on us.
+        A message is never resent after any other failure, since it may have been delivered.
+        """
+        self._ensure_connected()
+        try:
+            resilience.call('smtp', 'send', self._sendmail, sender, recipient, message)
+        except smtplib.SMTPServerDisconnected:
+            self._connect()
+            resilience.call('smtp', 'send', self._sendmail, sender, recipient, message)
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.server = None
+
+
+class EmailOutbox:
+    """Persistent email queue drained by a background sender thread.
+
+    Messages are written to a SQLite file before enqueue() returns, so they survive
+    restarts. The sender claims due messages in batches, delivers them over one
+    SMTPSession and reschedules failures with jittered exponential backoff until
+    max_attempts is reached. Claims are atomic, so several workers can share a file.
+    """
+
+    def __init__(self, session, path='email_outbox.db', batch_size=20, max_attempts=5,
+                 base_backoff=2.0, max_backoff=300.0):
+        self.session = session
+        self.path = path
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.claim_id = f"{os.getpid()}-{id(self)}"
+        self._db_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sender TEXT NOT NULL,
+                recipient TEXT NOT NULL,
+                message TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL,
+                claimed_by TEXT,
+                claimed_at REAL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt)')
+
+    def enqueue(self, msg):
+        """Persist a message for delivery and wake the sender; returns the outbox id"""
+        now = time.time()
+        with self._db_lock:
+            cursor = self._conn.execute(
+                'INSERT INTO outbox (sender, recipient, message, next_attempt, created_at) VALUES (?, ?, ?, ?, ?)',
+                (msg['From'], msg['To'], msg.as_string(), now, now)
+            )
+        with self._wakeup:
+            self._wakeup.notify()
+        return cursor.lastrowid
+
+    def _claim_batch(self):
+        now = time.time()
+        with self._db_lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    """SELECT id, sender, recipient, message, attempts FROM outbox
+                       WHERE (status = 'pending' AND next_attempt <= ?)
+                          OR (status = 'sending' AND claimed_at < ?)
+                       ORDER BY next_attempt LIMIT ?""",
+                    (now, now - CLAIM_LEASE_SECONDS, self.batch_size)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET status = 'sending', claimed_by = ?, claimed_at = ? WHERE id = ?",
+                    [(self.claim_id, now, row[0]) for row in rows]
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return rows
+
+    def _mark_sent(self, outbox_id):
+        with self._db_lock:
+            self._conn.execute('DELETE FROM outbox WHERE id = ?', (outbox_id,))
+
+    def _mark_failed(self, outbox_id, attempts, error):
+        attempts += 1
+        if attempts >= self.max_attempts:
+            status, next_attempt = 'failed', time.time()
+        else:
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+            status, next_attempt = 'pending', time.time() + delay * random.uniform(0.5, 1.0)
+        with self._db_lock:
+            self._conn.execute(
+                'UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, claimed_by = NULL WHERE id = ?',
+                (status, attempts, next_attempt, str(error), outbox_id)
+            )
+
+    def _defer(self, outbox_ids, delay):
+        """Put claimed messages back without using up an attempt, e.g. while SMTP is known to be down"""
+        with self._db_lock:
+            self._conn.executemany(
+                "UPDATE outbox SET status = 'pending', next_attempt = ?, claimed_by = NULL WHERE id = ?",
+                [(time.time() + delay, outbox_id) for outbox_id in outbox_ids]
+            )
+
+    def _next_due_in(self):
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending'"
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def process_batch(self):
+        """Deliver one batch of due messages over the shared session; returns how many were sent"""
+        sent = 0
+        batch = self._claim_batch()
+        for i, (outbox_id, sender, recipient, message, attempts) in enumerate(batch):
+            try:
+                self.session.send(sender, recipient, message)
+                self._mark_sent(outbox_id)
+                sent += 1
+                print(f"[EmailOutbox] Email sent to {recipient}")
+            except resilience.CircuitOpenError as e:
+                # Nothing was sent: wait for the breaker instead of burning attempts
+                print(f"[EmailOutbox] {e}; deferring {len(batch) - i} emails")
+                self._defer([row[0] for row in batch[i:]], max(e.retry_in, self.base_backoff))
+                break
+            except Exception as e:
+                print(f"[EmailOutbox] Failed to send email to {recipient}: {e}")
+                self._mark_failed(outbox_id, attempts, e)
+                # The connection may be broken; start the next message on a fresh one
+                self.session.close()
+        return sent
+
+    def pending_count(self):
+        with self._db_lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending')"
+            ).fetchone()[0]
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                if self.process_batch():
+                    continue
+                wait = self._next_due_in()
+            except Exception as e:
+                print(f"[EmailOutbox] Sender error: {e}")
+                wait = self.base_backoff
+            if wait is not None and wait == 0:
+                continue
+            with self._wakeup:
+                if not self._stopping:
+                    self._wakeup.wait(timeout=wait if wait is not None else self.session.idle_timeout)
+            if wait is None and self.session.server is not None:
+                # Nothing queued for a while: release the connection rather than let it time out
+                if time.monotonic() - self.session.last_used > self.session.idle_timeout:
+                    self.session.close()
+
+    def start(self):
+        """Start the background sender (idempotent); pending messages from earlier runs go first"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+            self._thread.start()
+        return self
+
+    def flush(self, timeout=30):
+        """Wait until every queued message is sent or given up on; returns True if the queue drained"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.pending_count() == 0:
+                return True
+            with self._wakeup:
+                self._wakeup.notify()
+            time.sleep(0.05)
+        return False
+
+    def stop(self, flush_timeout=10):
+        """Try to drain the queue, then stop the sender; undelivered messages stay on disk"""
+        if self._thread is not None and self._thread.is_alive():
+            self.flush(flush_timeout)
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.session.close()
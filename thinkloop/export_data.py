@@ -0,0 +1,221 @@
+"""Columnar bulk export of appointments and call logs.
+
+Streams each table page by page and writes compressed Parquet or Arrow IPC files chunk by
+chunk, so the export never holds a whole table in memory:
+
+    python export_data.py --start 2026-09-01 --end 2026-12-19 --output exports
+    python export_data.py --incremental --output exports   # only rows added since the last run
+
+Needs pyarrow (in requirements.txt). Each run writes one file per table, named after the
+table and the time of the run; load the directory as a dataset to read all of them.
+"""
+import argparse
+import json
+import os
+from datetime import date, datetime, time, timedelta
+
+from dateutil.parser import isoparse
+
+from availability_index import to_utc
+
+EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', 10000))  # rows per Parquet row group / Arrow batch
+# Incremental exports leave out rows newer than this, so calls still in progress and inserts
+# that commit late are picked up by the next run instead of being skipped past
+EXPORT_SETTLE_SECONDS = float(os.getenv('EXPORT_SETTLE_SECONDS', 3600))
+WATERMARK_FILE = '_watermarks.json'
+
+# Exported columns and types per table. The cursor column orders the export and is what the
+# watermark advances on; the date range filters the range column
+EXPORTS = {
+    'appointments': {
+        'cursor': 'created_at',
+        'range': 'date_time',
+        'columns': {
+            'id': 'string', 'parent_name': 'string', 'student_name': 'string', 'teacher_name': 'string',
+            'date_time': 'timestamp', 'purpose': 'string', 'contact_number': 'string', 'email': 'string',
+            'language': 'string', 'status': 'string', 'created_at': 'timestamp',
+        },
+    },
+    'call_analytics': {
+        'cursor': 'start_time',
+        'range': 'start_time',
+        'columns': {
+            'id': 'string', 'call_id': 'string', 'start_time': 'timestamp', 'end_time': 'timestamp',
+            'duration': 'int64', 'language': 'string', 'status': 'string', 'caller_name': 'string',
+        },
+    },
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise SystemExit("export_data.py needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def _schema(pa, columns):
+    types = {'string': pa.string(), 'int64': pa.int64(), 'timestamp': pa.timestamp('us', tz='UTC')}
+    return pa.schema([(name, types[kind]) for name, kind in columns.items()])
+
+
+def _convert(row, columns):
+    """Timestamps arrive as ISO strings from PostgREST and SQLite; Arrow wants datetimes"""
+    return {
+        name: to_utc(isoparse(row[name])) if kind == 'timestamp' and isinstance(row.get(name), str) else row.get(name)
+        for name, kind in columns.items()
+    }
+
+
+class ChunkWriter:
+    """Writes rows to a Parquet or Arrow IPC file EXPORT_CHUNK_ROWS at a time.
+    The file is written under a temporary name and only appears under its real name once closed.
+    """
+
+    def __init__(self, path, schema, file_format='parquet', compression='zstd', chunk_rows=EXPORT_CHUNK_ROWS):
+        self.pa = _pyarrow()
+        self.path = path
+        self.schema = schema
+        self.file_format = file_format
+        self.compression = compression
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self._chunk = []
+        self._writer = None
+        self._sink = None
+
+    def _open(self):
+        tmp = self.path + '.tmp'
+        if self.file_format == 'parquet':
+            self._writer = self.pa.parquet.ParquetWriter(tmp, self.schema, compression=self.compression)
+        else:
+            self._sink = self.pa.OSFile(tmp, 'wb')
+            options = self.pa.ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = self.pa.ipc.new_file(self._sink, self.schema, options=options)
+
+    def _write_chunk(self):
+        if not self._chunk:
+            return
+        if self._writer is None:
+            self._open()
+        self._writer.write_table(self.pa.Table.from_pylist(self._chunk, schema=self.schema))
+        self.rows += len(self._chunk)
+        self._chunk = []
+
+    def write(self, row):
+        self._chunk.append(row)
+        if len(self._chunk) >= self.chunk_rows:
+            self._write_chunk()
+
+    def close(self):
+        """Write the last chunk and publish the file; returns False when there were no rows"""
+        self._write_chunk()
+        if self._writer is None:
+            return False
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+        os.replace(self.path + '.tmp', self.path)
+        return True
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+            if self._sink is not None:
+                self._sink.close()
+            os.remove(self.path + '.tmp')
+
+
+def load_watermarks(output):
+    path = os.path.join(output, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_watermarks(output, watermarks):
+    path = os.path.join(output, WATERMARK_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def export_table(db, table, output, start_date=None, end_date=None, after=None, settle_before=None,
+                 file_format='parquet', compression='zstd', chunk_rows=EXPORT_CHUNK_ROWS, page_size=None):
+    """Export one table; returns (file written or None, rows, last (cursor, id) exported or None).
+    Rows whose cursor is later than settle_before are left for the next run.
+    """
+    spec = EXPORTS[table]
+    columns, cursor = spec['columns'], spec['cursor']
+    pa = _pyarrow()
+    extension = 'parquet' if file_format == 'parquet' else 'arrow'
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    path = os.path.join(output, f'{table}-{stamp}.{extension}')
+    writer = ChunkWriter(path, _schema(pa, columns), file_format, compression, chunk_rows)
+
+    paging = {'page_size': page_size} if page_size else {}
+    last = None
+    try:
+        for row in db.iter_rows(table, cursor, spec['range'], start_date, end_date, after, list(columns), **paging):
+            if settle_before is not None and to_utc(isoparse(row[cursor])) > settle_before:
+                break
+            writer.write(_convert(row, columns))
+            last = (row[cursor], row['id'])
+    except BaseException:
+        writer.abort()
+        raise
+    return (path if writer.close() else None), writer.rows, last
+
+
+def _day(value):
+    return date.fromisoformat(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tables', type=lambda value: value.split(','), default=list(EXPORTS),
+                        help='comma separated tables to export')
+    parser.add_argument('--start', type=_day, help='first day (YYYY-MM-DD) of appointment dates / call start times')
+    parser.add_argument('--end', type=_day, help='last day (YYYY-MM-DD), inclusive')
+    parser.add_argument('--incremental', action='store_true', help='only rows added since the previous --incremental run')
+    parser.add_argument('--format', choices=('parquet', 'arrow'), default='parquet')
+    parser.add_argument('--compression', default='zstd', help='zstd, lz4, snappy (Parquet only) or gzip (Parquet only)')
+    parser.add_argument('--chunk-rows', type=int, default=EXPORT_CHUNK_ROWS)
+    parser.add_argument('--output', default='exports', help='directory for the files and the watermark')
+    args = parser.parse_args()
+
+    unknown = set(args.tables) - set(EXPORTS)
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(sorted(unknown))}")
+    _pyarrow()
+    os.makedirs(args.output, exist_ok=True)
+
+    from database import Database
+
+    start_date = datetime.combine(args.start, time.min) if args.start else None
+    end_date = datetime.combine(args.end, time.max) if args.end else None
+    watermarks = load_watermarks(args.output) if args.incremental else {}
+    settle_before = to_utc(datetime.utcnow() - timedelta(seconds=EXPORT_SETTLE_SECONDS)) if args.incremental else None
+
+    db = Database()
+    try:
+        for table in args.tables:
+            previous = watermarks.get(table, {}).get('after')
+            path, rows, last = export_table(
+                db, table, args.output, start_date, end_date, tuple(previous) if previous else None,
+                settle_before, args.format, args.compression, args.chunk_rows
+            )
+            print(f"[export] {table}: {rows} rows" + (f" -> {path}" if path else ''))
+            if args.incremental and last is not None:
+                watermarks[table] = {'after': list(last), 'exported_at': datetime.utcnow().isoformat() + 'Z'}
+                # Saved after every table so a failure later on does not re-export this one
+                save_watermarks(args.output, watermarks)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,514 @@
+"""Local stand-ins for Supabase, Google Calendar, SMTP and TTS, with injectable latency.
+
+Used by benchmark.py and the load tests to exercise the real Database, CalendarManager,
+EmailManager and Assistant code paths without network access. Every fake takes a
+`latency` that is either seconds or a zero-argument callable returning seconds. The Supabase
+and Calendar fakes also take a `failure_rate`, the share of requests that fail with a
+ConnectionError after their latency, to simulate an unhealthy dependency.
+"""
+import asyncio
+import copy
+import itertools
+import random
+import socketserver
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from dateutil.parser import isoparse
+
+from availability_index import event_bounds, merge_intervals, to_utc
+
+
+def _delay(latency):
+    return latency() if callable(latency) else latency
+
+
+def _maybe_fail(failure_rate, name):
+    if failure_rate and random.random() < failure_rate:
+        raise ConnectionError(f"{name} unavailable (injected failure)")
+
+
+def jittered(median, spread=0.5):
+    """Latency callable drawing from a log-normal distribution around median seconds"""
+    return lambda: random.lognormvariate(0, spread) * median
+
+
+class FakeAPIError(Exception):
+    """Raised the way postgrest raises APIError, with a PostgreSQL error code"""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _comparable(value):
+    """Compare timestamps by instant and everything else as-is, like PostgreSQL would"""
+    if isinstance(value, str) and len(value) >= 19 and value[4] == '-' and value[10] == 'T':
+        try:
+            return to_utc(isoparse(value))
+        except ValueError:
+            pass
+    return value
+
+
+_OPERATORS = {
+    'eq': lambda a, b: a == b, 'neq': lambda a, b: a != b,
+    'gt': lambda a, b: a > b, 'gte': lambda a, b: a >= b,
+    'lt': lambda a, b: a < b, 'lte': lambda a, b: a <= b,
+}
+
+
+def _split_conditions(text):
+    """Split a PostgREST logic expression on the commas that are not nested or quoted"""
+    parts, depth, quoted, current = [], 0, False, ''
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == '(':
+            depth += 1
+        elif not quoted and char == ')':
+            depth -= 1
+        elif not quoted and depth == 0 and char == ',':
+            parts.append(current)
+            current = ''
+            continue
+        current += char
+    return parts + [current] if current else parts
+
+
+def _parse_condition(text):
+    for logic, combine in (('and(', all), ('or(', any)):
+        if text.startswith(logic):
+            tests = [_parse_condition(part) for part in _split_conditions(text[len(logic):-1])]
+            return lambda row: combine(test(row) for test in tests)
+    column, operator, value = text.split('.', 2)
+    value = _comparable(value[1:-1] if value.startswith('"') else value)
+    compare = _OPERATORS[operator]
+    return lambda row: row.get(column) is not None and compare(_comparable(row[column]), value)
+
+
+class FakeQuery:
+    """The subset of the postgrest query builder the app uses"""
+
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.action = None
+        self.payload = None
+        self.columns = '*'
+        self.count = None
+        self.head = False
+        self.on_conflict = None
+        self.filters = []
+        self.ordering = []
+        self.bounds = (0, None)
+
+    def select(self, *columns, count=None, head=None):
+        self.action, self.columns, self.count, self.head = 'select', ','.join(columns) or '*', count, head
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = 'insert', rows
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.action, self.payload, self.on_conflict = 'upsert', rows, on_conflict
+        return self
+
+    def update(self, values):
+        self.action, self.payload = 'update', values
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    def _filter(self, column, test):
+        self.filters.append(lambda row: column in row and row[column] is not None and test(_comparable(row[column])))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda v: v == _comparable(value))
+
+    def neq(self, column, value):
+        return self._filter(column, lambda v: v != _comparable(value))
+
+    def gt(self, column, value):
+        return self._filter(column, lambda v: v > _comparable(value))
+
+    def gte(self, column, value):
+        return self._filter(column, lambda v: v >= _comparable(value))
+
+    def lt(self, column, value):
+        return self._filter(column, lambda v: v < _comparable(value))
+
+    def lte(self, column, value):
+        return self._filter(column, lambda v: v <= _comparable(value))
+
+    def in_(self, column, values):
+        values = [_comparable(value) for value in values]
+        return self._filter(column, lambda v: v in values)
+
+    def filter(self, column, operator, criteria):
+        """Raw PostgREST filter; only 'not.is' 'null' is supported"""
+        if (operator, criteria) != ('not.is', 'null'):
+            raise NotImplementedError(f"FakeQuery.filter {operator} {criteria}")
+        self.filters.append(lambda row: row.get(column) is not None)
+        return self
+
+    def or_(self, filters):
+        """PostgREST logic tree, e.g. 'date_time.gt."X",and(date_time.eq."X",id.gt."Y")'"""
+        tests = [_parse_condition(condition) for condition in _split_conditions(filters)]
+        self.filters.append(lambda row: any(test(row) for test in tests))
+        return self
+
+    def order(self, column, desc=False):
+        self.ordering.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.bounds = (self.bounds[0], self.bounds[0] + count)
+        return self
+
+    def range(self, start, end):
+        self.bounds = (start, end + 1)
+        return self
+
+    def _matches(self, row):
+        return all(test(row) for test in self.filters)
+
+    def execute(self):
+        time.sleep(_delay(self.client.latency))
+        _maybe_fail(self.client.failure_rate, 'supabase')
+        with self.client.lock:
+            self.client.requests += 1
+            return getattr(self, '_' + self.action)(self.client.tables.setdefault(self.table, []))
+
+    def _select(self, rows):
+        matched = [row for row in rows if self._matches(row)]
+        for column, desc in reversed(self.ordering):
+            matched.sort(key=lambda row: (row.get(column) is None, _comparable(row.get(column))), reverse=desc)
+        count = len(matched) if self.count else None
+        if self.head:
+            return FakeResponse([], count)
+        matched = matched[self.bounds[0]:self.bounds[1]]
+        if self.columns != '*':
+            names = [name.strip() for name in self.columns.split(',')]
+            matched = [{name: row.get(name) for name in names} for row in matched]
+        return FakeResponse(copy.deepcopy(matched), count)
+
+    def _check_unique(self, rows, row, ignore=None):
+        for columns in self.client.unique.get(self.table, ()):
+            key = tuple(row.get(column) for column in columns)
+            if None in key:
+                continue
+            for existing in rows:
+                if existing is not ignore and tuple(existing.get(column) for column in columns) == key:
+                    raise FakeAPIError(
+                        f'duplicate key value violates unique constraint "{self.table}_{"_".join(columns)}_key"',
+                        '23505'
+                    )
+
+    def _insert(self, rows):
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        inserted = []
+        for values in payload:
+            row = {'id': str(uuid.uuid4()), 'created_at': datetime.utcnow().isoformat()}
+            row.update(copy.deepcopy(values))
+            self._check_unique(rows + inserted, row)
+            inserted.append(row)
+        rows.extend(inserted)
+        return FakeResponse(copy.deepcopy(inserted))
+
+    def _upsert(self, rows):
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        key = [column.strip() for column in (self.on_conflict or 'id').split(',')]
+        written = []
+        for values in payload:
+            existing = next((row for row in rows if all(row.get(c) == values.get(c) for c in key)), None)
+            if existing is None:
+                row = {'id': str(uuid.uuid4()), 'created_at': datetime.utcnow().isoformat()}
+                row.update(copy.deepcopy(values))
+                self._check_unique(rows, row)
+                rows.append(row)
+                written.append(row)
+            else:
+                existing.update(copy.deepcopy(values))
+                written.append(existing)
+        return FakeResponse(copy.deepcopy(written))
+
+    def _update(self, rows):
+        updated = []
+        for row in rows:
+            if self._matches(row):
+                candidate = dict(row, **copy.deepcopy(self.payload))
+                self._check_unique(rows, candidate, ignore=row)
+                row.update(copy.deepcopy(self.payload))
+                updated.append(row)
+        return FakeResponse(copy.deepcopy(updated))
+
+    def _delete(self, rows):
+        removed = [row for row in rows if self._matches(row)]
+        rows[:] = [row for row in rows if not self._matches(row)]
+        return FakeResponse(copy.deepcopy(removed))
+
+
+class FakeSupabase:
+    """In-memory PostgREST-compatible stand-in for the supabase client.
+
+    `unique` maps a table to column tuples that reject duplicates with code 23505, like a
+    PostgreSQL unique index.
+    """
+
+    def __init__(self, latency=0.0, unique=None, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.unique = unique if unique is not None else {
+            'call_analytics': [('call_id',)],
+            'slot_reservations': [('teacher_key', 'slot_start')],
+        }
+        self.tables = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+class FakeCalendarRequest:
+    def __init__(self, service, method_id, run):
+        self.service = service
+        self.methodId = method_id
+        self.run = run
+
+    def execute(self, http=None, num_retries=0):
+        time.sleep(_delay(self.service.latency))
+        _maybe_fail(self.service.failure_rate, 'calendar')
+        with self.service.lock:
+            self.service.requests += 1
+            return self.run()
+
+
+class FakeCalendarService:
+    """In-memory stand-in for the Calendar v3 service: events list/insert/delete and freebusy"""
+
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.calendars = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._version = 0
+
+    def events(self):
+        return _FakeEvents(self)
+
+    def freebusy(self):
+        return _FakeFreeBusy(self)
+
+    def _overlapping(self, calendar_id, time_min, time_max):
+        start, end = to_utc(isoparse(time_min)), to_utc(isoparse(time_max))
+        events = []
+        for event in self.calendars.get(calendar_id, {}).values():
+            if event.get('status') == 'cancelled':
+                continue
+            event_start, event_end = event_bounds(event)
+            if event_start < end and event_end > start:
+                events.append(event)
+        return sorted(events, key=event_bounds)
+
+
+class _FakeEvents:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, calendarId, timeMin=None, timeMax=None, syncToken=None, pageToken=None, **kwargs):
+        service = self.service
+
+        def run():
+            events = service.calendars.get(calendarId, {})
+            if syncToken is not None:
+                items = [event for event in events.values() if event['_version'] > int(syncToken)]
+            else:
+                items = service._overlapping(calendarId, timeMin or '1970-01-01T00:00:00Z',
+                                             timeMax or '9999-12-31T00:00:00Z')
+            return {
+                'items': [{k: v for k, v in event.items() if k != '_version'} for event in items],
+                'nextSyncToken': str(service._version),
+            }
+        return FakeCalendarRequest(service, 'calendar.events.list', run)
+
+    def insert(self, calendarId, body):
+        service = self.service
+
+        def run():
+            service._version += 1
+            event = dict(copy.deepcopy(body), id=f"evt{next(service._ids)}", status='confirmed',
+                         htmlLink='http://localhost/calendar', _version=service._version)
+            service.calendars.setdefault(calendarId, {})[event['id']] = event
+            return {k: v for k, v in event.items() if k != '_version'}
+        return FakeCalendarRequest(service, 'calendar.events.insert', run)
+
+    def delete(self, calendarId, eventId):
+        service = self.service
+
+        def run():
+            service._version += 1
+            event = service.calendars.get(calendarId, {})[eventId]
+            event.update(status='cancelled', _version=service._version)
+            return ''
+        return FakeCalendarRequest(service, 'calendar.events.delete', run)
+
+
+class _FakeFreeBusy:
+    def __init__(self, service):
+        self.service = service
+
+    def query(self, body):
+        service = self.service
+
+        def run():
+            calendars = {}
+            for item in body['items']:
+                busy = merge_intervals(
+                    event_bounds(event)
+                    for event in service._overlapping(item['id'], body['timeMin'], body['timeMax'])
+                )
+                calendars[item['id']] = {
+                    'busy': [{'start': start.isoformat(), 'end': end.isoformat()} for start, end in busy]
+                }
+            return {'calendars': calendars}
+        return FakeCalendarRequest(service, 'calendar.freebusy.query', run)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Minimal SMTP dialogue: enough for smtplib without STARTTLS or AUTH"""
+
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode('ascii'))
+
+    def handle(self):
+        sink = self.server.sink
+        sink.connections += 1
+        self.reply('220 localhost fake SMTP sink')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 8BITMIME')
+            elif verb == 'HELO':
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                body = []
+                for data in iter(self.rfile.readline, b''):
+                    if data in (b'.\r\n', b'.\n'):
+                        break
+                    body.append(data)
+                time.sleep(_delay(sink.latency))
+                with sink.lock:
+                    sink.messages.append({'from': sender, 'to': recipients, 'data': b''.join(body)})
+                self.reply('250 OK: queued')
+            elif verb in ('NOOP', 'RSET'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink:
+    """Local SMTP server that accepts and records every message; run with EMAIL_USE_TLS=false"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        self.latency = latency
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer((host, port), _SMTPHandler)
+        self.server.daemon_threads = True
+        self.server.sink = self
+        self.host, self.port = self.server.server_address
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='smtp-sink', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _SpeechHandle:
+    def __init__(self, task):
+        self._task = task
+
+    async def wait_for_playout(self):
+        await self._task
+
+    def __await__(self):
+        return self.wait_for_playout().__await__()
+
+
+class _EmptyStream:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raise StopAsyncIteration
+
+
+class FakeTTS:
+    """Stand-in for a livekit TTS plugin; synthesize() yields no frames"""
+
+    def synthesize(self, text):
+        return _EmptyStream()
+
+
+class FakeSession:
+    """No-op AgentSession stand-in: say() records the text and plays out after the TTS latency"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.tts = FakeTTS()
+        self.spoken = []
+
+    async def _play(self, text, audio):
+        if audio is not None:
+            async for _ in audio:
+                pass
+        await asyncio.sleep(_delay(self.latency))
+        self.spoken.append(text)
+
+    def say(self, text, *, audio=None, allow_interruptions=None, add_to_chat_ctx=True):
+        return _SpeechHandle(asyncio.ensure_future(self._play(text, audio)))
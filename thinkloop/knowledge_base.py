@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+
+from knowledge_index import INDEXED_SECTIONS, KnowledgeIndex
+from prompts import PROMPT_MODE, compile_system_prompt, content_hash, prompt_sections
+
+KNOWLEDGE_BASE_PATH = os.getenv('KNOWLEDGE_BASE_PATH', 'knowledge_base.json')
+# Seconds between checks of the knowledge base file for changes; 0 disables hot reload
+KNOWLEDGE_BASE_RELOAD_INTERVAL = float(os.getenv('KNOWLEDGE_BASE_RELOAD_INTERVAL', 5))
+
+REQUIRED_SECTIONS = {
+    'school_info': dict,
+    'hours': dict,
+    'departments': dict,
+    'faq': dict,
+    'emergency_contacts': dict,
+    'holidays': list,
+    'important_dates': dict,
+    'courses_offered': dict,
+}
+REQUIRED_KEYS = {
+    'school_info': ['name', 'address', 'phone', 'email', 'website'],
+    'hours': ['office', 'classes', 'summer'],
+}
+
+
+def load_knowledge_base(path=KNOWLEDGE_BASE_PATH):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def validate_knowledge_base(knowledge_base):
+    """Raise ValueError if a section the agent relies on is missing or malformed"""
+    if not isinstance(knowledge_base, dict):
+        raise ValueError("Knowledge base must be a JSON object")
+    for section, expected_type in REQUIRED_SECTIONS.items():
+        if not isinstance(knowledge_base.get(section), expected_type):
+            raise ValueError(f"Knowledge base section '{section}' must be a {expected_type.__name__}")
+    for section, keys in REQUIRED_KEYS.items():
+        missing = [key for key in keys if key not in knowledge_base[section]]
+        if missing:
+            raise ValueError(f"Knowledge base section '{section}' is missing {', '.join(missing)}")
+
+
+def school_info_from_knowledge_base(knowledge_base):
+    """Build the school_info row stored in the database from the knowledge base"""
+    return {
+        'name': knowledge_base['school_info']['name'],
+        'address': knowledge_base['school_info']['address'],
+        'phone': knowledge_base['school_info']['phone'],
+        'email': knowledge_base['school_info']['email'],
+        'website': knowledge_base['school_info']['website'],
+        'office_hours': knowledge_base['hours']['office'],
+        'class_hours': knowledge_base['hours']['classes'],
+        'summer_hours': knowledge_base['hours']['summer']
+    }
+
+
+class KnowledgeSnapshot:
+    """One immutable version of the knowledge base and the artifacts derived from it.
+    A session keeps the snapshot it started with even if a newer one is swapped in.
+    """
+
+    def __init__(self, data, index):
+        self.data = data
+        self.version = content_hash(data)
+        self.section_hashes = {section: content_hash(value) for section, value in data.items()}
+        self.index = index
+
+    def system_prompt(self, school_info, language='en'):
+        return compile_system_prompt(school_info, self.data, language).text
+
+
+class KnowledgeStore:
+    """Holds the current KnowledgeSnapshot and hot-reloads it when the file changes.
+
+    The file is polled by mtime and size. A changed file is parsed and validated, and only the
+    artifacts whose source sections changed are rebuilt before the new snapshot is swapped in.
+    An invalid file is reported and the previous snapshot stays live.
+    """
+
+    def __init__(self, path=KNOWLEDGE_BASE_PATH, reload_interval=KNOWLEDGE_BASE_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.last_reload = {}
+        self._file_state = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._reload_lock = threading.Lock()
+        self.snapshot = None
+        self.reload()
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self):
+        """Re-read the file and swap in a new snapshot; returns True if the content changed"""
+        with self._reload_lock:
+            started = time.perf_counter()
+            # Remember the file state first so a broken file is not re-parsed until it changes again
+            self._file_state = self._stat()
+            data = load_knowledge_base(self.path)
+            validate_knowledge_base(data)
+            parsed = time.perf_counter()
+
+            previous = self.snapshot
+            if previous is not None and content_hash(data) == previous.version:
+                return False
+
+            changed = set(data) if previous is None else {
+                section for section in set(data) | set(previous.data)
+                if content_hash(data.get(section)) != previous.section_hashes.get(section)
+            }
+
+            # Only rebuild the lookup index if a section it covers changed
+            if previous is not None and not changed.intersection(INDEXED_SECTIONS):
+                index = previous.index
+            else:
+                index = KnowledgeIndex.from_knowledge_base(data)
+            snapshot = KnowledgeSnapshot(data, index)
+
+            # Compiled prompts are keyed by the sections they use, so unrelated edits keep the cached prompt
+            prompt_changed = previous is None or (
+                content_hash(prompt_sections(data, PROMPT_MODE)) != content_hash(prompt_sections(previous.data, PROMPT_MODE))
+            )
+            self.snapshot = snapshot
+            finished = time.perf_counter()
+
+            self.last_reload = {
+                'changed_sections': sorted(changed),
+                'index_rebuilt': index is not (previous.index if previous else None),
+                'prompt_changed': prompt_changed,
+                'parse_ms': round((parsed - started) * 1000, 2),
+                'rebuild_ms': round((finished - parsed) * 1000, 2),
+                'total_ms': round((finished - started) * 1000, 2),
+            }
+            if previous is not None:
+                print(f"[KnowledgeStore] Reloaded {self.path}: {self.last_reload}")
+            return True
+
+    def check_for_changes(self):
+        """Reload if the file's mtime or size moved; invalid edits are logged and ignored"""
+        try:
+            if self._stat() == self._file_state:
+                return False
+            return self.reload()
+        except (OSError, ValueError) as e:
+            print(f"[KnowledgeStore] Keeping previous knowledge base, reload failed: {e}")
+            return False
+
+    def _watch(self):
+        while not self._stop.wait(self.reload_interval):
+            self.check_for_changes()
+
+    def start_watching(self):
+        """Poll the file in the background; a no-op when reload_interval is 0"""
+        if self.reload_interval <= 0:
+            return self
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name='knowledge-base-watch', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop_watching(self):
+        self._stop.set()
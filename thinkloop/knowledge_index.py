@@ -0,0 +1,148 @@
+from collections import Counter
+import heapq
+import math
+import re
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+|[\u0900-\u097F]+')
+
+STOPWORDS = {
+    # English
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from', 'how',
+    'i', 'in', 'is', 'it', 'me', 'my', 'of', 'on', 'or', 'our', 'please', 'tell', 'the', 'to',
+    'what', 'when', 'where', 'which', 'who', 'will', 'with', 'you', 'your',
+    # Hindi
+    'का', 'की', 'के', 'को', 'में', 'है', 'हैं', 'से', 'और', 'क्या', 'कब', 'कहाँ', 'कैसे', 'मुझे',
+    'मेरा', 'मेरी', 'मेरे', 'आप', 'यह', 'वह', 'पर', 'भी', 'तो', 'बताइए', 'बताएं', 'कृपया',
+}
+
+# Callers often ask in Hindi or Hinglish while the knowledge base is written in English,
+# so query terms are expanded with their English equivalents.
+HINDI_SYNONYMS = {
+    'प्रवेश': ['admission'], 'दाखिला': ['admission'], 'daakhila': ['admission'], 'dakhila': ['admission'],
+    'फीस': ['tuition', 'fees'], 'शुल्क': ['tuition', 'fees'],
+    'छुट्टी': ['holiday', 'break'], 'छुट्टियाँ': ['holiday', 'break'], 'छुट्टियां': ['holiday', 'break'],
+    'chutti': ['holiday', 'break'], 'chhutti': ['holiday', 'break'],
+    'वर्दी': ['uniform'], 'यूनिफॉर्म': ['uniform'], 'vardi': ['uniform'],
+    'बस': ['bus', 'transportation'], 'परिवहन': ['transportation'],
+    'खाना': ['lunch'], 'भोजन': ['lunch'], 'khana': ['lunch'],
+    'समय': ['hour', 'time'], 'samay': ['hour', 'time'],
+    'नर्स': ['nurse'], 'सुरक्षा': ['security'], 'आपातकाल': ['emergency'], 'आपातकालीन': ['emergency'],
+    'विभाग': ['department'], 'पाठ्यक्रम': ['course'], 'विषय': ['course', 'subject'],
+    'गणित': ['mathematics'], 'विज्ञान': ['science'], 'अंग्रेज़ी': ['english'], 'अंग्रेजी': ['english'],
+    'इतिहास': ['history'], 'कंप्यूटर': ['computer'], 'तारीख': ['date'], 'तिथि': ['date'],
+    'पंजीकरण': ['registration'], 'रजिस्ट्रेशन': ['registration'], 'पता': ['address'], 'फ़ोन': ['phone'],
+    'फोन': ['phone'], 'ईमेल': ['email'], 'अभिभावक': ['parent'], 'शिक्षक': ['teacher', 'faculty'],
+}
+
+
+# Knowledge base sections that documents are built from
+INDEXED_SECTIONS = (
+    'school_info', 'hours', 'departments', 'emergency_contacts', 'faq', 'holidays', 'important_dates',
+    'courses_offered',
+)
+
+
+def stem(token):
+    """Very light English suffix stripping that maps singular and plural to the same stem:
+    'holidays' -> 'holiday', 'courses'/'course' -> 'cours', 'buses'/'bus' -> 'bus', 'activities' -> 'activity'.
+    Every step applies to index and query terms alike, so both sides always meet on one form.
+    """
+    if not token.isascii() or len(token) <= 3:
+        return token
+    if token.endswith('ing') and len(token) - 3 >= 4:
+        return token[:-3]
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    # 'ss', 'us' and 'is' endings are singular: class, bus, basis
+    if token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        token = token[:-1]
+    # A silent final e is dropped so 'courses' -> 'course' -> 'cours' meets 'course'; 'buses' -> 'buse' -> 'bus'
+    if token.endswith('e') and len(token) > 3:
+        token = token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lowercase, split into Latin and Devanagari words, drop stopwords and stem"""
+    return [stem(token) for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def expand_query(tokens):
+    expanded = list(tokens)
+    for token in tokens:
+        expanded.extend(stem(synonym) for synonym in HINDI_SYNONYMS.get(token, []))
+    return expanded
+
+
+def humanize(key):
+    return key.replace('_', ' ')
+
+
+def knowledge_base_documents(knowledge_base):
+    """Flatten the knowledge base into small searchable documents"""
+    documents = []
+
+    def add(section, title, text):
+        documents.append({'section': section, 'title': title, 'text': text})
+
+    school = knowledge_base.get('school_info', {})
+    if school:
+        add('school_info', 'School contact details',
+            ', '.join(f"{humanize(key)}: {value}" for key, value in school.items()))
+    for key, value in knowledge_base.get('hours', {}).items():
+        add('hours', f"{humanize(key)} hours", f"{humanize(key)} hours: {value}")
+    for name, details in knowledge_base.get('departments', {}).items():
+        add('departments', f"{humanize(name)} department",
+            f"{humanize(name)} department " + ', '.join(f"{key}: {value}" for key, value in details.items()))
+    for name, extension in knowledge_base.get('emergency_contacts', {}).items():
+        add('emergency_contacts', f"{humanize(name)} emergency contact",
+            f"emergency contact {humanize(name)}: {extension}")
+    for question, answer in knowledge_base.get('faq', {}).items():
+        add('faq', humanize(question), f"{humanize(question)}: {answer}")
+    holidays = knowledge_base.get('holidays', [])
+    if holidays:
+        # One document for the whole list, so "when are the holidays" returns every holiday
+        add('holidays', 'School holidays', 'school holidays: ' + ', '.join(str(holiday) for holiday in holidays))
+    for name, date in knowledge_base.get('important_dates', {}).items():
+        add('important_dates', humanize(name), f"important date {humanize(name)}: {date}")
+    for course, description in knowledge_base.get('courses_offered', {}).items():
+        add('courses_offered', f"{humanize(course)} course", f"{humanize(course)} course: {description}")
+    return documents
+
+
+class KnowledgeIndex:
+    """In-memory inverted index over knowledge base documents with BM25 scoring"""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = []
+        for doc_id, document in enumerate(documents):
+            tokens = tokenize(f"{document['title']} {document['text']}")
+            self.doc_lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                self.postings.setdefault(term, []).append((doc_id, frequency))
+        self.avg_length = sum(self.doc_lengths) / len(self.doc_lengths) if documents else 0.0
+        self.idf = {
+            term: math.log(1 + (len(documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    @classmethod
+    def from_knowledge_base(cls, knowledge_base):
+        return cls(knowledge_base_documents(knowledge_base))
+
+    def search(self, query, top_k=3):
+        """Return up to top_k (score, document) pairs, best first"""
+        scores = {}
+        for term in set(expand_query(tokenize(query))):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, frequency in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(score, self.documents[doc_id]) for doc_id, score in best]
@@ -0,0 +1,240 @@
+"""Concurrent-call load test for one worker event loop.
+
+Runs N simulated callers against the local stand-ins in fakes.py, all in one event loop, the
+way a worker process hosts its sessions. Each caller replays a scripted call with think time:
+greeting, caller identification, a booking and a booking that hits a conflict. The load steps
+up through --levels while LoopLagMonitor records event loop lag and which synchronous calls
+stalled the loop:
+
+    python load_test.py --levels 5,10,20,40 --duration 30
+
+With --contention N every caller of a level places one call, waits at a starting line until
+all callers are ready, then books one of the same N teacher/time slots with no think time. The
+report counts slots that were booked more than once (compare --no-reservations):
+
+    python load_test.py --levels 50 --duration 5 --contention 2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+from benchmark import booking_times, build_resources, summarize
+from fakes import FakeSession
+from loop_monitor import LoopLagMonitor
+import resilience
+
+# One 20 ms audio frame: a loop that stalls longer than this starts to stutter
+DEFAULT_LAG_BUDGET = 0.02
+
+
+class StartingLine:
+    """Holds callers until `parties` of them are waiting, then releases them all at once
+    (asyncio.Barrier, which needs Python 3.11)
+    """
+
+    def __init__(self, parties):
+        self.parties = parties
+        self.waiting = 0
+        self._go = asyncio.Event()
+
+    async def wait(self):
+        self.waiting += 1
+        if self.waiting >= self.parties:
+            self._go.set()
+        await self._go.wait()
+
+
+async def caller(pool, args, rng, times, deadline, samples, counts, hot_slots=None, start_line=None):
+    """Place scripted calls back to back until the deadline; with hot_slots, place one call that
+    books as soon as every caller is at start_line
+    """
+    from agent import Assistant
+
+    async def think():
+        await asyncio.sleep(rng.uniform(args.think_min, args.think_max))
+
+    async def step(name, coro):
+        started = time.perf_counter()
+        result = await coro
+        samples.setdefault(name, []).append(time.perf_counter() - started)
+        return result
+
+    while time.perf_counter() < deadline:
+        session = FakeSession(latency=args.tts_latency)
+        # Mirrors entrypoint(), which keeps these database calls off the loop
+        agent = Assistant(pool)
+        await resilience.run_in_thread(agent.db.log_call, agent.call_id, agent.call_start_time, agent.current_language)
+        await agent.phrases.say(session, 'greeting', agent.current_language)
+        await think()
+
+        await step('log_caller_information', agent.log_caller_information('Load Test Parent', session))
+        await think()
+
+        if hot_slots:
+            teacher, slot = rng.choice(hot_slots)
+            await start_line.wait()
+        else:
+            teacher = rng.choice(agent.db.get_all_teachers())['name']
+            slot = rng.choice(times)
+        booked = await step('schedule_appointment', agent.schedule_appointment(
+            'Load Test Parent', 'Load Test Student', teacher, slot, 'Progress review',
+            '555-0100', 'parent@example.com', session
+        ))
+        counts['booked' if booked else 'not_booked'] += 1
+        if hot_slots:
+            await resilience.run_in_thread(
+                agent.db.update_call, agent.call_id, datetime.now(), int((datetime.now() - agent.call_start_time).total_seconds())
+            )
+            counts['calls'] += 1
+            return
+        await think()
+
+        # The same teacher and time again takes the conflict path
+        await step('schedule_conflict', agent.schedule_appointment(
+            'Load Test Parent', 'Load Test Student', teacher, slot, 'Progress review',
+            '555-0100', 'parent@example.com', session
+        ))
+
+        await resilience.run_in_thread(
+            agent.db.update_call, agent.call_id, datetime.now(), int((datetime.now() - agent.call_start_time).total_seconds())
+        )
+        counts['calls'] += 1
+        await think()
+
+
+def duplicate_bookings(db):
+    """Teacher/time slots with more than one appointment so far (the count is cumulative across levels)"""
+    booked = Counter((row['teacher_name'], row['date_time'])
+                     for row in db.iter_appointments(columns=['teacher_name', 'date_time']))
+    return sum(count - 1 for count in booked.values() if count > 1)
+
+
+def contended_slots(pool, args, level_index):
+    """--contention teacher/time slots of its own for each level, so earlier levels have not booked them"""
+    if not args.contention:
+        return None
+    teachers = [teacher['name'] for teacher in pool.db.get_all_teachers()]
+    times = booking_times(days=10)[::-1]
+    first = level_index * args.contention
+    return [(teachers[i % len(teachers)], times[first + i]) for i in range(args.contention)]
+
+
+async def run_level(pool, args, concurrency, monitor, level_index=0):
+    rng = random.Random(args.seed + concurrency)
+    samples, counts = {}, {'calls': 0, 'booked': 0, 'not_booked': 0}
+    hot_slots = contended_slots(pool, args, level_index)
+    start_line = StartingLine(concurrency) if hot_slots else None
+    monitor.reset()
+    deadline = time.perf_counter() + args.duration
+    await asyncio.gather(*(
+        caller(pool, args, rng, booking_times(days=10), deadline, samples, counts, hot_slots, start_line)
+        for _ in range(concurrency)
+    ))
+    lag = monitor.summary()
+    return {
+        'concurrency': concurrency,
+        'completed_calls': counts['calls'],
+        'bookings': {key: counts[key] for key in ('booked', 'not_booked')},
+        'duplicate_bookings': await asyncio.to_thread(duplicate_bookings, pool.db),
+        'tools': {name: summarize(values) for name, values in sorted(samples.items())},
+        'loop_lag': lag,
+        'sustainable': lag.get('p99_ms', 0) <= args.lag_budget * 1000,
+    }
+
+
+async def run(pool, args):
+    monitor = LoopLagMonitor(threshold=args.stall_threshold).start()
+    levels = []
+    try:
+        for level_index, concurrency in enumerate(args.levels):
+            levels.append(await run_level(pool, args, concurrency, monitor, level_index))
+            # The application's own logging is silenced on stdout, so progress goes to stderr
+            print(f"[load_test] {concurrency} calls: p99 lag {levels[-1]['loop_lag'].get('p99_ms')} ms", file=sys.stderr)
+    finally:
+        monitor.stop()
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--levels', type=lambda value: [int(level) for level in value.split(',')],
+                        default=[5, 10, 20, 40], help='comma separated numbers of concurrent calls')
+    parser.add_argument('--duration', type=float, default=30, help='seconds each level runs')
+    parser.add_argument('--think-min', type=float, default=1.0, help='shortest caller pause in seconds')
+    parser.add_argument('--think-max', type=float, default=4.0, help='longest caller pause in seconds')
+    parser.add_argument('--backend', choices=('supabase', 'sqlite'), default='supabase')
+    parser.add_argument('--supabase-latency', type=float, default=0.02)
+    parser.add_argument('--calendar-latency', type=float, default=0.08)
+    parser.add_argument('--smtp-latency', type=float, default=0.05)
+    parser.add_argument('--tts-latency', type=float, default=0.0)
+    parser.add_argument('--jitter', action='store_true')
+    parser.add_argument('--no-slot-table', action='store_true')
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help='share of Supabase and Calendar requests that fail')
+    parser.add_argument('--contention', type=int, default=0,
+                        help='book only this many teacher/time slots per level, all callers at once')
+    parser.add_argument('--no-reservations', action='store_true', help='book without holding slots in slot_reservations')
+    parser.add_argument('--lag-budget', type=float, default=DEFAULT_LAG_BUDGET,
+                        help='p99 loop lag in seconds a level may reach and still count as sustainable')
+    parser.add_argument('--stall-threshold', type=float, default=0.05, help='seconds of lag recorded as a stall')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the full report as JSON to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            pool, sink = build_resources(args, workdir)
+            pool.calendar.reserve_slots = not args.no_reservations
+            try:
+                levels = asyncio.run(run(pool, args))
+            finally:
+                pool.close()
+                sink.stop()
+
+    sustainable = [level['concurrency'] for level in levels if level['sustainable']]
+    report = {
+        'created_at': datetime.utcnow().isoformat() + 'Z',
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'levels': levels,
+        'max_sustainable_calls': max(sustainable) if sustainable else 0,
+    }
+
+    print(f"\n{'calls':>6} {'done':>6} {'lag p50':>9} {'lag p99':>9} {'lag max':>9} {'stalls':>7} {'dup':>4}  ok")
+    for level in levels:
+        lag = level['loop_lag']
+        print(f"{level['concurrency']:>6} {level['completed_calls']:>6} {lag.get('p50_ms', 0):>9.2f} "
+              f"{lag.get('p99_ms', 0):>9.2f} {lag.get('max_ms', 0):>9.2f} {lag.get('stalls', 0):>7} "
+              f"{level['duplicate_bookings']:>4}  "
+              f"{'yes' if level['sustainable'] else 'no'}")
+    print(f"\nMax sustainable calls per worker (p99 loop lag <= {args.lag_budget * 1000:.0f} ms): "
+          f"{report['max_sustainable_calls']}")
+
+    culprits = {}
+    for level in levels:
+        for name, entry in level['loop_lag'].get('culprits', {}).items():
+            total = culprits.setdefault(name, {'stalls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            total['stalls'] += entry['stalls']
+            total['total_ms'] += entry['total_ms']
+            total['max_ms'] = max(total['max_ms'], entry['max_ms'])
+    if culprits:
+        print("\nSynchronous calls that stalled the event loop:")
+        for name, total in sorted(culprits.items(), key=lambda item: -item[1]['total_ms']):
+            print(f"  {name:<55} {total['stalls']:>5} stalls  {total['total_ms']:>9.1f} ms total  "
+                  f"{total['max_ms']:>7.1f} ms max")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
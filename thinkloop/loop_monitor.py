@@ -0,0 +1,123 @@
+import asyncio
+from collections import deque
+import os
+import sys
+import threading
+import time
+import traceback
+
+# Stalls longer than this are recorded with the stack that caused them
+LOOP_STALL_THRESHOLD = float(os.getenv('LOOP_STALL_THRESHOLD', 0.05))  # seconds
+LOOP_MONITOR_INTERVAL = 0.01  # seconds between heartbeats
+
+# Frames from these files are skipped when naming the call that blocked the loop
+_INFRASTRUCTURE = ('asyncio', 'loop_monitor.py', 'fakes.py', 'threading.py', 'selectors.py')
+
+
+def _culprit(stack):
+    """The innermost public function from application code, as 'file.py:function:line'.
+    Private helpers such as Database._execute are skipped so the stall is named after the
+    operation that made the call.
+    """
+    if stack and os.path.basename(stack[-1].filename) == 'selectors.py':
+        # The loop was idle in select yet late: other threads were holding the GIL
+        return 'idle in select (GIL held by another thread)'
+    fallback = 'unknown'
+    for frame in reversed(stack):
+        if frame.filename.startswith(sys.prefix) or any(part in frame.filename for part in _INFRASTRUCTURE):
+            continue
+        location = f"{os.path.basename(frame.filename)}:{frame.name}:{frame.lineno}"
+        if not frame.name.startswith('_'):
+            return location
+        if fallback == 'unknown':
+            fallback = location
+    return fallback
+
+
+class LoopLagMonitor:
+    """Measures event loop lag and records the stack behind every stall.
+
+    A heartbeat task on the loop wakes every LOOP_MONITOR_INTERVAL and records how late it was.
+    A watchdog thread notices when the heartbeat is overdue by more than `threshold` and
+    samples the loop thread's stack while it is still blocked, so each stall is attributed
+    to the synchronous call that caused it rather than to whatever ran afterwards.
+    """
+
+    def __init__(self, threshold=LOOP_STALL_THRESHOLD, interval=LOOP_MONITOR_INTERVAL, max_samples=100000):
+        self.threshold = threshold
+        self.interval = interval
+        self.lags = deque(maxlen=max_samples)
+        self.stalls = []
+        self._last_beat = None
+        self._pending_stack = None
+        self._loop_thread_id = None
+        self._task = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - expected)
+            self.lags.append(lag)
+            if lag >= self.threshold:
+                stack = self._pending_stack
+                self.stalls.append({
+                    'duration_ms': round(lag * 1000, 1),
+                    'at': time.time(),
+                    'culprit': _culprit(stack) if stack else 'unknown',
+                    'stack': traceback.format_list(stack) if stack else [],
+                })
+            self._pending_stack = None
+            self._last_beat = now
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 2):
+            last_beat = self._last_beat
+            if last_beat is None or self._pending_stack is not None:
+                continue
+            if time.perf_counter() - last_beat > self.interval + self.threshold / 2:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._pending_stack = traceback.extract_stack(frame)
+
+    def start(self):
+        """Start monitoring the running event loop; call from a coroutine on that loop"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name='loop-monitor', daemon=True)
+        self._watchdog.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    def reset(self):
+        self.lags.clear()
+        self.stalls = []
+
+    def summary(self):
+        """Lag percentiles in milliseconds and stalls grouped by the call that caused them"""
+        lags = sorted(self.lags)
+        if not lags:
+            return {'samples': 0}
+        culprits = {}
+        for stall in self.stalls:
+            entry = culprits.setdefault(stall['culprit'], {'stalls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            entry['stalls'] += 1
+            entry['total_ms'] = round(entry['total_ms'] + stall['duration_ms'], 1)
+            entry['max_ms'] = max(entry['max_ms'], stall['duration_ms'])
+        return {
+            'samples': len(lags),
+            'p50_ms': round(lags[len(lags) // 2] * 1000, 2),
+            'p99_ms': round(lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000, 2),
+            'max_ms': round(lags[-1] * 1000, 2),
+            'stalls': len(self.stalls),
+            'culprits': dict(sorted(culprits.items(), key=lambda item: -item[1]['total_ms'])),
+        }
@@ -0,0 +1,199 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+import os
+import socket
+import sys
+import threading
+import time
+
+# First port tried for the /metrics endpoint; 0 disables it. Each worker process on a host
+# takes the next free port in [METRICS_PORT, METRICS_PORT + METRICS_PORT_RANGE), so the range
+# must cover every worker; one that finds no port warns on stderr. Series carry a worker label.
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9464))
+METRICS_PORT_RANGE = int(os.getenv('METRICS_PORT_RANGE', 16))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+def _series_labels(names, values):
+    """Label text for one series. Every series carries the pid of the worker process that exported
+    it, so series from the workers on a host stay apart when they are summed or compared.
+    """
+    return _label_text(('worker',) + tuple(names), (os.getpid(),) + tuple(values))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_series_labels(self.labelnames, labels)} {value}" for labels, value in values]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return self._header() + [f"{self.name}{_series_labels(self.labelnames, labels)} {value}" for labels, value in values]
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; observing is one bisect and three additions under a lock"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = sorted((labels, [list(series[0]), series[1], series[2]]) for labels, series in self._values.items())
+        lines = self._header()
+        names = self.labelnames + ('le',)
+        for labels, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_series_labels(names, labels + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_series_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_series_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+REGISTRY = []
+
+dependency_latency = Histogram(
+    'thinkloop_dependency_latency_seconds', 'Latency of calls to external dependencies',
+    ('dependency', 'operation')
+)
+dependency_errors = Counter(
+    'thinkloop_dependency_errors_total', 'Failed calls to external dependencies',
+    ('dependency', 'operation')
+)
+active_calls = Gauge('thinkloop_active_calls', 'Calls currently handled by the worker process in the worker label')
+
+
+@contextmanager
+def timed(dependency, operation):
+    """Record the latency of the wrapped call, and count it as an error if it raises.
+    Cancellation and abandoned generators are not counted as errors.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        dependency_errors.inc(dependency, operation)
+        raise
+    finally:
+        dependency_latency.observe(time.perf_counter() - started, dependency, operation)
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+_server_lock = threading.Lock()
+_server_port = None
+
+
+def _bind(host, first_port, port_range):
+    for port in range(first_port, first_port + port_range):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            sock.bind((host, port))
+            return sock, port
+        except OSError:
+            sock.close()
+    return None, None
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST, port_range=METRICS_PORT_RANGE):
+    """Serve GET /metrics from a background thread; returns the bound port, or None if disabled.
+    Only the first call in a process starts a server.
+    """
+    global _server_port
+    with _server_lock:
+        if _server_port is not None or port <= 0:
+            return _server_port
+        sock, bound_port = _bind(host, port, port_range)
+        if sock is None:
+            print(f"[metrics] WARNING: no free port in {port}-{port + port_range - 1}; worker {os.getpid()} "
+                  f"exports NO metrics. Raise METRICS_PORT_RANGE to at least the number of worker processes.",
+                  file=sys.stderr)
+            return None
+
+        from fastapi import FastAPI
+        from fastapi.responses import PlainTextResponse
+        import uvicorn
+
+        app = FastAPI()
+
+        @app.get('/metrics', response_class=PlainTextResponse)
+        def metrics():
+            return PlainTextResponse(render(), media_type='text/plain; version=0.0.4')
+
+        # uvicorn only installs signal handlers on the main thread, so the worker keeps its own
+        server = uvicorn.Server(uvicorn.Config(app, log_level='warning'))
+        threading.Thread(target=server.run, kwargs={'sockets': [sock]}, name='metrics-server', daemon=True).start()
+        _server_port = bound_port
+        print(f"[metrics] Serving Prometheus metrics on http://{host}:{bound_port}/metrics")
+        return bound_port
@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import string
+import threading
+import time
+
+from livekit import rtc
+
+from metrics import dependency_latency, timed
+from translations import TRANSLATIONS, get_translation
+
+PHRASE_CACHE_DIR = os.getenv('PHRASE_CACHE_DIR', 'phrase_cache')
+# Label of the TTS voice the cache was rendered with; change it when the voice changes
+TTS_VOICE = os.getenv('TTS_VOICE', 'google-default')
+
+FRAME_MS = 20
+# Static prefixes shorter than this are not worth a cache entry
+MIN_CACHED_CHARS = 12
+
+
+def split_template(template):
+    """Split a translation into its static prefix and the templated remainder.
+    'I will transfer your call to {department}.' -> ('I will transfer your call to ', '{department}.')
+    """
+    for literal, field, _, _ in string.Formatter().parse(template):
+        if field is not None:
+            return literal, template[len(literal):]
+        return template, ''
+    return '', ''
+
+
+class PhraseAudioCache:
+    """Content-addressed on-disk cache of synthesized audio for the fixed phrases in translations.py.
+
+    Each phrase is rendered once per (text, voice, language) to raw 16-bit PCM and served from
+    memory-mapped files, so the page cache is shared by every worker on the host. Templated
+    phrases are split so their static prefix plays from the cache while the rest is synthesized.
+    """
+
+    def __init__(self, directory=PHRASE_CACHE_DIR, voice=TTS_VOICE):
+        self.directory = directory
+        self.voice = voice
+        self._mapped = {}
+        self._rendering = set()
+        self._tasks = set()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # Built in prewarm: mapping what is on disk now means say() never touches the disk on the event loop
+        self.load()
+
+    def _path(self, text, language):
+        digest = hashlib.sha256(f"{self.voice}\0{language}\0{text}".encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def _load(self, path):
+        """Map a rendered phrase into memory; returns (mmap, metadata), or None if it is not on disk"""
+        with self._lock:
+            if path in self._mapped:
+                return self._mapped[path]
+            try:
+                with open(path + '.json', 'r') as f:
+                    meta = json.load(f)
+                with open(path + '.pcm', 'rb') as f:
+                    audio = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return None
+            self._mapped[path] = (audio, meta)
+            return self._mapped[path]
+
+    def load(self):
+        """Map every phrase already rendered in the directory; returns the number mapped"""
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                self._load(os.path.join(self.directory, name[:-len('.json')]))
+        return len(self._mapped)
+
+    def frames(self, text, language):
+        """Cached audio as a list of 20 ms AudioFrames, or None if the phrase is not mapped.
+        Only reads memory, so it is safe to call on the event loop.
+        """
+        cached = self._mapped.get(self._path(text, language))
+        if cached is None:
+            return None
+        audio, meta = cached
+        samples = meta['sample_rate'] * FRAME_MS // 1000
+        step = samples * meta['num_channels'] * 2
+        view = memoryview(audio)
+        return [
+            rtc.AudioFrame(
+                view[offset:offset + step], meta['sample_rate'], meta['num_channels'],
+                len(view[offset:offset + step]) // (2 * meta['num_channels'])
+            )
+            for offset in range(0, len(view), step)
+        ]
+
+    def _store(self, path, pcm, meta):
+        """Write a rendered phrase and map it; runs in a thread"""
+        # Write under temporary names and rename so readers never see a partial file
+        with open(path + '.pcm.tmp', 'wb') as f:
+            f.write(pcm)
+        os.replace(path + '.pcm.tmp', path + '.pcm')
+        with open(path + '.json.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(path + '.json.tmp', path + '.json')
+        self._load(path)
+
+    async def render(self, tts, text, language):
+        """Synthesize a phrase with the given TTS and store it, unless it is already cached"""
+        path = self._path(text, language)
+        if not text.strip() or path in self._mapped or path in self._rendering:
+            return
+        self._rendering.add(path)
+        try:
+            # Another worker on this host may have rendered it since this one started
+            if await asyncio.to_thread(self._load, path) is not None:
+                return
+            pcm = bytearray()
+            sample_rate = num_channels = None
+            with timed('tts', 'render'):
+                async with tts.synthesize(text) as stream:
+                    async for audio in stream:
+                        sample_rate, num_channels = audio.frame.sample_rate, audio.frame.num_channels
+                        pcm.extend(audio.frame.data.cast('B'))
+            if not pcm:
+                return
+            await asyncio.to_thread(self._store, path, pcm, {
+                'text': text, 'language': language, 'voice': self.voice,
+                'sample_rate': sample_rate, 'num_channels': num_channels,
+            })
+            print(f"[PhraseAudioCache] Cached {language} phrase: {text[:40]!r}")
+        except Exception as e:
+            print(f"[PhraseAudioCache] Failed to render {language} phrase {text[:40]!r}: {e}")
+        finally:
+            self._rendering.discard(path)
+
+    def _spawn(self, coro):
+        """Run a coroutine in the background, holding a reference so it is not garbage collected mid-flight"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def _timed_playout(self, handle, operation):
+        """Record how long a speech takes from being asked for until it has played out.
+        session.say only queues the speech, so timing the call itself would measure nothing.
+        """
+        started = time.perf_counter()
+
+        async def wait():
+            await handle.wait_for_playout()
+            if not getattr(handle, 'interrupted', False):
+                dependency_latency.observe(time.perf_counter() - started, 'tts', operation)
+
+        self._spawn(wait())
+        return handle
+
+    async def warm(self, tts, languages=None):
+        """Render the static part of every translation for the given languages"""
+        for language in languages or TRANSLATIONS:
+            for template in TRANSLATIONS[language].values():
+                static, _ = split_template(template)
+                if len(static) >= MIN_CACHED_CHARS:
+                    await self.render(tts, static, language)
+
+    async def say(self, session, key, language='en', **kwargs):
+        """Speak a translation, playing its static prefix from the cache when it is available.
+        Phrases that are not cached yet are spoken live and rendered in the background for next time.
+        """
+        if language not in TRANSLATIONS:
+            language = 'en'
+        template = TRANSLATIONS[language].get(key, TRANSLATIONS['en'].get(key, key))
+        text = get_translation(key, language, **kwargs)
+        static, _ = split_template(template) if kwargs else (template, '')
+        cacheable = len(static) >= MIN_CACHED_CHARS and text.startswith(static)
+        cached = self.frames(static, language) if cacheable else None
+
+        if cached is None:
+            if cacheable:
+                self._spawn(self.render(session.tts, static, language))
+            return self._timed_playout(session.say(text), 'say_live')
+
+        remainder = text[len(static):]
+
+        async def audio():
+            for frame in cached:
+                yield frame
+            if remainder.strip():
+                # Time to the first synthesized frame is what the caller hears as a gap after the cached prefix
+                started = time.perf_counter()
+                with timed('tts', 'synthesize'):
+                    async with session.tts.synthesize(remainder) as stream:
+                        async for synthesized in stream:
+                            if started is not None:
+                                dependency_latency.observe(time.perf_counter() - started, 'tts', 'first_frame')
+                                started = None
+                            yield synthesized.frame
+
+        return self._timed_playout(session.say(text, audio=audio()), 'say_cached')
+
+    async def speak(self, session, text):
+        """Speak text that is not a fixed phrase, timed like a live phrase"""
+        return self._timed_playout(session.say(text), 'say_live')
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from livekit.plugins import google
+
+    load_dotenv()
+
+    async def main():
+        await PhraseAudioCache().warm(google.TTS())
+
+    asyncio.run(main())
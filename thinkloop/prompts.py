@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+# 'lookup' keeps the prompt to a compact core and answers the rest through the lookup tool;
+# 'inline' embeds every knowledge base section, which is only sensible for small files.
+PROMPT_MODE = os.getenv('PROMPT_MODE', 'lookup')
+PROMPT_COMPACT = os.getenv('PROMPT_COMPACT', 'true').lower() == 'true'
+
+# Knowledge base sections embedded in 'inline' mode, in prompt order
+INLINE_SECTIONS = [
+    ('Department Extensions', 'departments'),
+    ('Emergency Contacts', 'emergency_contacts'),
+    ('Frequently Asked Questions (FAQs)', 'faq'),
+    ('School Holidays', 'holidays'),
+    ('Important Dates', 'important_dates'),
+    ('Courses Offered', 'courses_offered'),
+]
+
+LANGUAGE_NAMES = {'en': 'English', 'hi': 'Hindi'}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def content_hash(value):
+    """Stable hash of JSON-serializable content, independent of key order and formatting"""
+    canonical = json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def prompt_sections(knowledge_base, mode=PROMPT_MODE):
+    """The knowledge base sections a prompt variant is rendered from"""
+    if mode == 'inline':
+        return {key: knowledge_base[key] for _, key in INLINE_SECTIONS}
+    return {'emergency_contacts': knowledge_base['emergency_contacts']}
+
+
+def estimate_tokens(text):
+    """Rough token count: words, punctuation and whitespace runs, long words counted per 4 characters"""
+    return sum(max(1, len(piece) // 4) for piece in re.findall(r'\w+|[^\w\s]|\s{2,}', text))
+
+
+def _dump(value, compact):
+    if compact:
+        return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+    return json.dumps(value, indent=2)
+
+
+def _compact_whitespace(text):
+    """Strip indentation and trailing spaces and collapse runs of blank lines"""
+    lines = [line.strip() for line in text.splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def build_system_prompt(school_info, knowledge_base, language='en', mode=PROMPT_MODE, compact=PROMPT_COMPACT):
+    """Render the receptionist system prompt from school info and the knowledge base"""
+    if mode == 'inline':
+        knowledge = "\n\n".join(
+            f"        {title}:\n        {_dump(knowledge_base[key], compact)}"
+            for title, key in INLINE_SECTIONS
+        )
+        knowledge_usage = "Use the knowledge base to provide accurate information."
+    else:
+        knowledge = f"""        Emergency Contacts:
+        {_dump(knowledge_base['emergency_contacts'], compact)}
+
+        For departments and extensions, admissions, fees, uniforms, transportation, lunch,
+        holidays, important dates and courses, call the 'lookup_school_information' tool
+        with the caller's question and answer from what it returns."""
+        knowledge_usage = "Use the lookup tool rather than guessing so your information is accurate."
+
+    language_note = ""
+    if language != 'en':
+        language_note = f"\n        The caller prefers {LANGUAGE_NAMES.get(language, language)}; respond in it unless asked otherwise.\n"
+
+    prompt = f"""You are a professional school receptionist for {school_info['name']}.
+        Your role is to:
+        1. Greet callers warmly and professionally
+        2. Handle inquiries about school hours, admissions, and general information
+        3. Take messages for staff members
+        4. Provide clear and concise information
+        5. Maintain a friendly and helpful tone
+        6. Transfer calls to appropriate departments when needed
+        7. Schedule appointments with teachers, ensuring to collect the parent's name, student's name, teacher's name, preferred date and time, purpose of the meeting, contact number, and email address.
+        8. Log the caller's name using the 'log_caller_information' tool when identified.
+        9. Support multiple languages (English and Hindi)
+        10. Track and analyze call patterns
+
+        You have access to the following information:
+        - School Name: {school_info['name']}
+        - School Address: {school_info['address']}
+        - School Hours: {school_info['office_hours']}
+        - Main Phone: {school_info['phone']}
+        - Email: {school_info['email']}
+        - Website: {school_info['website']}
+
+{knowledge}
+
+        Always be polite, patient, and professional in your responses.
+        {knowledge_usage}
+        If you don't know something, offer to transfer the call to the appropriate department.
+        {language_note}
+        IMPORTANT: Your initial greeting should always be: "Hello, this is Delhi Public School reception. How may I help you?" """
+
+    if compact:
+        prompt = _compact_whitespace(prompt)
+    return prompt
+
+
+class CompiledPrompt:
+    """A rendered system prompt together with the cache key it was built for"""
+
+    def __init__(self, key, text):
+        self.key = key
+        self.text = text
+        self.tokens = estimate_tokens(text)
+
+
+def compile_system_prompt(school_info, knowledge_base, language='en', mode=PROMPT_MODE, compact=PROMPT_COMPACT):
+    """Return the rendered prompt for this content, rendering it only the first time.
+    The process-wide cache is keyed by the hash of the sections the variant uses, the school_info
+    version, language and variant, so every Assistant in a worker shares one string and edited
+    content is picked up automatically.
+    """
+    key = (content_hash(prompt_sections(knowledge_base, mode)), content_hash(school_info), language, mode, compact)
+    with _cache_lock:
+        compiled = _cache.get(key)
+    if compiled is None:
+        compiled = CompiledPrompt(key, build_system_prompt(school_info, knowledge_base, language, mode, compact))
+        with _cache_lock:
+            compiled = _cache.setdefault(key, compiled)
+    return compiled
+
+
+def prompt_variant_report(school_info, knowledge_base, language='en'):
+    """Size of each prompt variant, for comparing what a variant costs per session"""
+    report = {}
+    for mode in ('lookup', 'inline'):
+        for compact in (False, True):
+            text = build_system_prompt(school_info, knowledge_base, language, mode, compact)
+            report[f"{mode}{'-compact' if compact else ''}"] = {
+                'characters': len(text),
+                'estimated_tokens': estimate_tokens(text),
+            }
+    return report
+
+
+if __name__ == "__main__":
+    from knowledge_base import load_knowledge_base, school_info_from_knowledge_base
+
+    kb = load_knowledge_base()
+    for variant, size in prompt_variant_report(school_info_from_knowledge_base(kb), kb).items():
+        print(f"{variant:<16} {size['characters']:>6} chars  ~{size['estimated_tokens']:>5} tokens")
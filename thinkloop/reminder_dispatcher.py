@@ -0,0 +1,233 @@
+"""Batch appointment reminders for the next day's appointments.
+
+Reads the day's appointments in one range scan over appointments.date_time, renders the
+reminder template once per language, and sends over a single SMTP connection with
+throttling. Sent reminders are recorded in appointment_reminders in batches, written off the
+send loop every REMINDER_RECORD_EVERY sends or REMINDER_RECORD_INTERVAL seconds and at the end of
+the run, so a re-run (or a second dispatcher) only sends what is still missing. Run it once a day,
+e.g. from cron:
+
+    0 17 * * *  cd /path/to/thinkloop && python reminder_dispatcher.py
+    python reminder_dispatcher.py --date 2026-11-02 --dry-run
+"""
+import argparse
+import os
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import pytz
+from dateutil.parser import isoparse
+from dotenv import load_dotenv
+
+from translations import TRANSLATIONS
+
+load_dotenv()
+
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', 100))  # appointments per sent-state lookup
+REMINDER_MAX_PER_SECOND = float(os.getenv('REMINDER_MAX_PER_SECOND', 20))  # 0 sends as fast as the server accepts
+REMINDER_RECORD_EVERY = int(os.getenv('REMINDER_RECORD_EVERY', 20))  # sent reminders per appointment_reminders write
+REMINDER_RECORD_INTERVAL = float(os.getenv('REMINDER_RECORD_INTERVAL', 2.0))  # seconds a sent reminder may wait to be recorded
+REMINDER_MAX_FAILURES = 10  # consecutive send failures before the run gives up
+
+REMINDER_COLUMNS = ['id', 'parent_name', 'student_name', 'teacher_name', 'date_time', 'email', 'language', 'status']
+
+
+class ReminderTemplate:
+    """A language's reminder subject and body, parsed once and filled in per appointment"""
+
+    def __init__(self, language):
+        if language not in TRANSLATIONS:
+            language = 'en'
+        self.language = language
+        formatter = string.Formatter()
+        self._parts = {
+            key: list(formatter.parse(TRANSLATIONS[language].get(key, TRANSLATIONS['en'][key])))
+            for key in ('appointment_reminder_subject', 'appointment_reminder')
+        }
+
+    def _render(self, key, values):
+        return ''.join(literal + (str(values[field]) if field is not None else '')
+                       for literal, field, _, _ in self._parts[key])
+
+    def render(self, appointment):
+        """(subject, body) for one appointment row"""
+        when = isoparse(appointment['date_time']) if isinstance(appointment['date_time'], str) else appointment['date_time']
+        if when.tzinfo is not None:
+            # Appointment times are UTC throughout (see CalendarManager.create_appointment)
+            when = when.astimezone(pytz.utc).replace(tzinfo=None)
+        values = {
+            'teacher': appointment['teacher_name'],
+            'date': when.strftime('%A, %B %d'),
+            'time': when.strftime('%I:%M %p').lstrip('0'),
+        }
+        body = (f"Dear {appointment['parent_name']},\n\n"
+                f"{self._render('appointment_reminder', values)}\n"
+                f"Student: {appointment['student_name']}\n\n"
+                "Delhi Public School Reception\n")
+        return self._render('appointment_reminder_subject', values), body
+
+
+class SentRecorder:
+    """Records sent reminders in batches on a background thread, so sends never wait on the database.
+
+    A crash loses at most the unwritten batch, and a re-run sends those reminders again.
+    """
+
+    def __init__(self, record_sent, every=REMINDER_RECORD_EVERY, interval=REMINDER_RECORD_INTERVAL):
+        self.record_sent = record_sent
+        self.every = every
+        self.interval = interval
+        self.failed = False
+        self.recorded = 0
+        self._ids = []
+        self._last_flush = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='reminder-record')
+
+    def add(self, appointment_id):
+        """Note one sent reminder; hands a batch to the writer when it is full or old enough"""
+        self._ids.append(appointment_id)
+        if len(self._ids) >= self.every or time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """Queue the buffered ids for writing without waiting for the write"""
+        if self._ids:
+            ids, self._ids = self._ids, []
+            self._executor.submit(self._write, ids)
+        self._last_flush = time.monotonic()
+
+    def _write(self, ids):
+        try:
+            recorded = self.record_sent(ids)
+        except Exception as e:
+            print(f"[SentRecorder] Error recording {len(ids)} sent reminders: {e}")
+            recorded = False
+        if recorded:
+            self.recorded += len(ids)
+        else:
+            self.failed = True
+
+    def close(self):
+        """Write whatever is still buffered and wait for every write; True if all of them succeeded"""
+        self.flush()
+        self._executor.shutdown(wait=True)
+        return not self.failed
+
+
+class ReminderDispatcher:
+    """Sends one reminder per scheduled appointment on a day, at most once each"""
+
+    def __init__(self, db, email_manager, batch_size=REMINDER_BATCH_SIZE, max_per_second=REMINDER_MAX_PER_SECOND,
+                 record_every=REMINDER_RECORD_EVERY):
+        self.db = db
+        self.email_manager = email_manager
+        self.batch_size = batch_size
+        self.max_per_second = max_per_second
+        self.record_every = record_every
+
+    def due(self, day):
+        """Yield the day's scheduled appointments with an email address, in date_time order"""
+        start = datetime.combine(day, datetime.min.time())
+        end = datetime.combine(day, datetime.max.time())
+        for appointment in self.db.iter_appointments(start_date=start, end_date=end, columns=REMINDER_COLUMNS):
+            if appointment['status'] == 'scheduled' and appointment['email']:
+                yield appointment
+
+    def _pending_by_language(self, day):
+        """Appointments still owed a reminder, grouped by language; sent state is checked a page at a time"""
+        groups, page = {}, []
+
+        def check(page):
+            reminded = self.db.get_reminded_appointments([appointment['id'] for appointment in page])
+            if reminded is None:
+                raise RuntimeError("could not read which reminders were already sent")
+            for appointment in page:
+                if appointment['id'] not in reminded:
+                    groups.setdefault(appointment['language'] or 'en', []).append(appointment)
+
+        for appointment in self.due(day):
+            page.append(appointment)
+            if len(page) >= self.batch_size:
+                check(page)
+                page = []
+        if page:
+            check(page)
+        return groups
+
+    def run(self, day=None, dry_run=False):
+        """Send the reminders owed for day (default tomorrow); returns counts of what happened"""
+        day = day or date.today() + timedelta(days=1)
+        stats = {'date': day.isoformat(), 'pending': 0, 'sent': 0, 'failed': 0}
+        groups = self._pending_by_language(day)
+        stats['pending'] = sum(len(group) for group in groups.values())
+        print(f"[ReminderDispatcher] {stats['pending']} reminders due for {day}")
+        if dry_run or not stats['pending']:
+            return stats
+        if not self.email_manager.configured:
+            print("[ReminderDispatcher] Skipping reminders due to missing email credentials.")
+            return stats
+
+        session = self.email_manager.create_smtp_session()
+        sender = self.email_manager.sender_email
+        recorder = SentRecorder(self.db.record_reminders_sent, every=self.record_every)
+        started, failures_in_a_row = time.monotonic(), 0
+        try:
+            for language, appointments in groups.items():
+                template = ReminderTemplate(language)
+                for appointment in appointments:
+                    if recorder.failed:
+                        print("[ReminderDispatcher] Could not record sent reminders, stopping to avoid duplicates")
+                        return stats
+                    subject, body = template.render(appointment)
+                    msg = self.email_manager.build_reminder_email(appointment['email'], subject, body)
+                    try:
+                        session.send(sender, appointment['email'], msg.as_string())
+                    except Exception as e:
+                        print(f"[ReminderDispatcher] Failed to send reminder to {appointment['email']}: {e}")
+                        stats['failed'] += 1
+                        failures_in_a_row += 1
+                        session.close()
+                        if failures_in_a_row >= REMINDER_MAX_FAILURES:
+                            print("[ReminderDispatcher] Too many failures in a row, stopping; re-run to resume")
+                            return stats
+                        continue
+                    failures_in_a_row = 0
+                    stats['sent'] += 1
+                    recorder.add(appointment['id'])
+                    if self.max_per_second:
+                        # Stay under the server's rate limit over the run as a whole
+                        ahead = stats['sent'] / self.max_per_second - (time.monotonic() - started)
+                        if ahead > 0:
+                            time.sleep(ahead)
+        finally:
+            session.close()
+            if not recorder.close():
+                print("[ReminderDispatcher] Some sent reminders were not recorded; a re-run will send them again")
+        elapsed = time.monotonic() - started
+        print(f"[ReminderDispatcher] Sent {stats['sent']} reminders in {elapsed:.1f}s ({stats['failed']} failed)")
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--date', type=date.fromisoformat, help='day whose appointments get reminders (default tomorrow)')
+    parser.add_argument('--dry-run', action='store_true', help='only count the reminders that are due')
+    parser.add_argument('--max-per-second', type=float, default=REMINDER_MAX_PER_SECOND)
+    args = parser.parse_args()
+
+    from database import Database
+    from email_manager import EmailManager
+
+    db, email_manager = Database(), EmailManager(use_outbox=False)
+    try:
+        stats = ReminderDispatcher(db, email_manager, max_per_second=args.max_per_second).run(args.date, args.dry_run)
+        print(stats)
+    finally:
+        email_manager.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Deadlines, retries and circuit breakers for calls to Supabase, Google Calendar and SMTP.
+
+Every remote call goes through call(dependency, operation, func). It fails fast while the
+dependency's circuit breaker is open, retries transient failures with jittered backoff when
+the operation is idempotent, and never starts an attempt or a backoff that would outlive the
+current deadline. Agent tools get their deadline from @with_deadline(); it follows the work
+into threads started with asyncio.to_thread or run_in_thread, and CalendarManager's pool.
+"""
+import asyncio
+from contextlib import contextmanager
+import contextvars
+import functools
+import os
+import random
+import threading
+import time
+
+from metrics import Counter, Gauge
+
+RESILIENCE_MAX_RETRIES = int(os.getenv('RESILIENCE_MAX_RETRIES', 2))  # extra attempts for idempotent calls
+RESILIENCE_BACKOFF_BASE = float(os.getenv('RESILIENCE_BACKOFF_BASE', 0.1))  # seconds
+RESILIENCE_BACKOFF_MAX = float(os.getenv('RESILIENCE_BACKOFF_MAX', 2.0))  # seconds
+# Consecutive transient failures that open a dependency's breaker, and how long it stays open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', 30))  # seconds
+# Time budget for one agent tool call, from the caller's request to the spoken answer
+TOOL_DEADLINE = float(os.getenv('TOOL_DEADLINE', 8))  # seconds
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+circuit_state = Gauge('thinkloop_circuit_state', 'Circuit breaker state: 0 closed, 1 half-open, 2 open', ('dependency',))
+circuit_trips = Counter('thinkloop_circuit_trips_total', 'Times a circuit breaker opened', ('dependency',))
+circuit_rejections = Counter(
+    'thinkloop_circuit_rejections_total', 'Calls refused because the circuit was open', ('dependency', 'operation')
+)
+dependency_retries = Counter('thinkloop_dependency_retries_total', 'Retried calls to external dependencies',
+                             ('dependency', 'operation'))
+
+
+class ResilienceError(Exception):
+    """A call was not made, or given up on, to protect the caller's latency"""
+
+
+class CircuitOpenError(ResilienceError):
+    def __init__(self, dependency, retry_in):
+        super().__init__(f"{dependency} is unavailable (circuit open, retrying in {retry_in:.0f}s)")
+        self.dependency = dependency
+        self.retry_in = retry_in
+
+
+class DeadlineExceeded(ResilienceError, TimeoutError):
+    def __init__(self, operation):
+        super().__init__(f"deadline exceeded before {operation} could complete")
+        self.operation = operation
+
+
+def is_transient(error):
+    """Whether a failure says the dependency is unhealthy (worth retrying and counting against the
+    breaker) rather than that the request itself was wrong, like a unique violation or a 404
+    """
+    smtp_code = getattr(error, 'smtp_code', None)
+    if smtp_code is not None:
+        return 400 <= smtp_code < 500
+    if hasattr(error, 'recipients'):
+        return False  # smtplib.SMTPRecipientsRefused
+    # googleapiclient HttpError carries resp.status, httpx.HTTPStatusError response.status_code
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status is not None:
+        return int(status) >= 500 or int(status) in (408, 429)
+    # postgrest APIError: a PostgreSQL SQLSTATE, or the HTTP status when the body was not JSON
+    code = getattr(error, 'code', None)
+    if isinstance(code, str) and code:
+        if len(code) == 3 and code.isdigit():
+            return code[0] == '5' or code in ('408', '429')
+        # Connection exceptions, serialization failures, insufficient resources, operator intervention
+        return code[:2] in ('08', '40', '53', '57')
+    if isinstance(error, (OSError, TimeoutError)):
+        return True
+    return type(error).__module__.split('.')[0] in ('httpx', 'httpcore', 'httplib2')
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    Closed: calls pass and transient failures are counted. After failure_threshold of them in a
+    row it opens and refuses calls for reset_timeout seconds. Then it lets one probe call through
+    (half-open): a success closes it again, a failure reopens it.
+    """
+
+    def __init__(self, dependency, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.dependency = dependency
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.rejections = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+        circuit_state.set(0, dependency)
+
+    def _set_state(self, state):
+        self.state = state
+        circuit_state.set(_STATE_VALUES[state], self.dependency)
+
+    def retry_in(self):
+        """Seconds until an open breaker lets a probe through"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self):
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set_state(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejections += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+                print(f"[CircuitBreaker] {self.dependency} recovered, circuit closed")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self._set_state(OPEN)
+                self.opened_at = time.monotonic()
+                self.trips += 1
+                circuit_trips.inc(self.dependency)
+                print(f"[CircuitBreaker] {self.dependency} circuit opened after {self.failures} failures")
+
+    def release(self):
+        """End a probe that finished without telling anything about the dependency's health"""
+        with self._lock:
+            self._probing = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'trips': self.trips,
+                'rejections': self.rejections,
+                'retry_in': round(self.retry_in(), 1),
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(dependency):
+    """The process-wide breaker for a dependency"""
+    with _breakers_lock:
+        if dependency not in _breakers:
+            _breakers[dependency] = CircuitBreaker(dependency)
+        return _breakers[dependency]
+
+
+def stats():
+    """Breaker state, trips and rejections per dependency"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.dependency: b.stats() for b in breakers}
+
+
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+
+@contextmanager
+def deadline(seconds):
+    """Bound everything inside to `seconds` from now; a nested deadline can only shorten it"""
+    end = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(end if current is None else min(current, end))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def without_deadline():
+    """Lift the current deadline, for bookkeeping that must finish even after the caller gave up"""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def with_deadline(seconds=TOOL_DEADLINE):
+    """Decorate an async tool so every dependency call it makes shares one deadline"""
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with deadline(seconds):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def remaining():
+    """Seconds left before the current deadline, or None without one"""
+    end = _deadline.get()
+    return None if end is None else end - time.monotonic()
+
+
+def timeout_for(default):
+    """A timeout for one blocking step: the default, cut short by the current deadline"""
+    left = remaining()
+    return default if left is None else max(0.0, min(default, left))
+
+
+def call(dependency, operation, func, *args, idempotent=False, retries=RESILIENCE_MAX_RETRIES, **kwargs):
+    """Call func through the dependency's circuit breaker, retrying transient failures of
+    idempotent operations with full-jitter exponential backoff within the current deadline
+    """
+    circuit = breaker(dependency)
+    attempts = 1 + (retries if idempotent else 0)
+    for attempt in range(attempts):
+        left = remaining()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded(f'{dependency} {operation}')
+        if not circuit.allow():
+            circuit_rejections.inc(dependency, operation)
+            raise CircuitOpenError(dependency, circuit.retry_in())
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if not is_transient(e):
+                # The dependency answered; the request itself was refused
+                circuit.record_success()
+                raise
+            circuit.record_failure()
+            if attempt + 1 >= attempts:
+                raise
+            backoff = random.uniform(0, min(RESILIENCE_BACKOFF_MAX, RESILIENCE_BACKOFF_BASE * 2 ** attempt))
+            left = remaining()
+            if left is not None and backoff >= left:
+                raise
+            dependency_retries.inc(dependency, operation)
+            print(f"[resilience] {dependency} {operation} failed ({e}), retry {attempt + 1} in {backoff:.2f}s")
+            time.sleep(backoff)
+        except BaseException:
+            circuit.release()
+            raise
+        else:
+            circuit.record_success()
+            return result
+
+
+async def run_in_thread(func, *args, **kwargs):
+    """Run a blocking call in a thread, giving up on it when the current deadline passes.
+    The thread finishes on its own; its result is discarded.
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(getattr(func, '__name__', 'call'))
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(getattr(func, '__name__', 'call'))
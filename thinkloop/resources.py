@@ -0,0 +1,150 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from startup import startup_report
+
+with startup_report.measure('import:database'):
+    from database import Database
+with startup_report.measure('import:calendar_manager'):
+    from calendar_manager import CalendarManager
+with startup_report.measure('import:email_manager'):
+    from email_manager import EmailManager
+from knowledge_base import KnowledgeStore, school_info_from_knowledge_base
+from metrics import start_metrics_server
+from phrase_cache import PhraseAudioCache
+from slot_table import OpenSlotTable
+with startup_report.measure('import:session_factory'):
+    from session_factory import SessionFactory
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class ResourcePool:
+    """Per-process resources shared by every session a worker handles.
+
+    Holds the authenticated calendar service, the email sender, the database client and
+    the hot-reloadable knowledge base with its compiled prompts and lookup index, so bringing
+    a call online needs no disk, auth or discovery I/O.
+    """
+
+    def __init__(self, db, calendar, email_manager, knowledge, phrases, sessions):
+        self.db = db
+        self.calendar = calendar
+        self.email_manager = email_manager
+        self.knowledge = knowledge
+        self.phrases = phrases
+        self.sessions = sessions
+        self._school_info = None
+
+    @property
+    def school_info(self):
+        """School info through the database's TTL cache, so edits reach new sessions without a restart.
+        If the database cannot be read, the last school info that was read is used.
+        """
+        school_info = self.db.get_school_info()
+        if school_info:
+            self._school_info = school_info
+        return self._school_info
+
+    def knowledge_snapshot(self):
+        """The current knowledge base snapshot; a session should hold on to the one it starts with"""
+        return self.knowledge.snapshot
+
+    def system_prompt_for(self, language, snapshot=None):
+        """Compiled system prompt for a language, shared with every other session in the process"""
+        return (snapshot or self.knowledge_snapshot()).system_prompt(self.school_info, language)
+
+    @classmethod
+    def create(cls):
+        """Initialize every component, running the independent ones in parallel"""
+        started = time.perf_counter()
+        start_metrics_server()
+
+        with startup_report.measure('init:knowledge_base'):
+            knowledge = KnowledgeStore().start_watching()
+        knowledge_base = knowledge.snapshot.data
+
+        def init_database():
+            with startup_report.measure('init:database'):
+                db = Database()
+            with startup_report.measure('init:school_info'):
+                db.initialize_school_info(school_info_from_knowledge_base(knowledge_base))
+            return db
+
+        def init_calendar():
+            with startup_report.measure('init:calendar'):
+                calendar = CalendarManager()
+                calendar.start_credential_refresher()
+            return calendar
+
+        def init_sessions():
+            with startup_report.measure('init:session_factory'):
+                return SessionFactory()
+
+        def init_email():
+            with startup_report.measure('init:email'):
+                return EmailManager()
+
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix='startup') as executor:
+            db_future = executor.submit(init_database)
+            calendar_future = executor.submit(init_calendar)
+            email_future = executor.submit(init_email)
+            sessions_future = executor.submit(init_sessions)
+            db = db_future.result()
+            calendar = calendar_future.result()
+            email_manager = email_future.result()
+            sessions = sessions_future.result()
+        # Teachers are mapped to their own calendars through the teachers table
+        calendar.db = db
+        calendar.slots = OpenSlotTable(calendar, db, knowledge).start()
+
+        with startup_report.measure('init:system_prompt'):
+            pool = cls(db, calendar, email_manager, knowledge, PhraseAudioCache(), sessions)
+            pool.system_prompt_for('en')
+
+        startup_report.record('init:total', time.perf_counter() - started)
+        print(f"[ResourcePool] Worker resources ready. Startup report:\n{startup_report.summary()}")
+        return pool
+
+    def flush(self):
+        """Write what the database is still buffering, without stopping anything"""
+        self.db.flush()
+        if self.db.call_patterns is not None:
+            self.db.call_patterns.flush()
+
+    def close(self):
+        """Stop every background thread, flushing buffered writes; the pool cannot be used afterwards"""
+        global _pool
+        with _pool_lock:
+            if _pool is self:
+                _pool = None
+        self.knowledge.stop_watching()
+        if self.calendar.slots is not None:
+            self.calendar.slots.stop()
+        self.calendar.close()
+        self.email_manager.close()
+        self.db.close()
+
+
+async def close_on_shutdown(ctx, pool):
+    """Job shutdown callback. A process job executor runs one job per process, so the end of the
+    job is the end of the worker process and the pool is closed; threads share the pool, so only flush.
+    """
+    from livekit.agents import JobExecutorType
+
+    if ctx.proc.executor_type == JobExecutorType.PROCESS:
+        await asyncio.to_thread(pool.close)
+    else:
+        await asyncio.to_thread(pool.flush)
+
+
+def get_resource_pool():
+    """Return the process-wide resource pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ResourcePool.create()
+        return _pool
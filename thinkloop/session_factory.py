@@ -0,0 +1,72 @@
+from collections import deque
+import os
+import time
+
+from livekit.agents import AgentSession, RoomInputOptions
+from livekit.plugins import google, noise_cancellation
+
+from metrics import dependency_latency
+
+REALTIME_MODEL = os.getenv('REALTIME_MODEL', 'gemini-2.0-flash-exp')
+REALTIME_VOICE = os.getenv('REALTIME_VOICE', 'Puck')
+REALTIME_TEMPERATURE = float(os.getenv('REALTIME_TEMPERATURE', 0.8))
+# Session setups slower than this are reported, so the cost of bringing a call online stays visible
+SESSION_SETUP_BUDGET = float(os.getenv('SESSION_SETUP_BUDGET', 1.5))  # seconds
+
+
+class SessionFactory:
+    """Builds every AgentSession in a worker from one model and TTS configuration.
+
+    The realtime model and the TTS client are created once and shared by all sessions, so
+    the TTS keeps its channel to Google alive between calls instead of reconnecting per call.
+    """
+
+    def __init__(self):
+        api_key = os.getenv('GOOGLE_API_KEY')
+        if api_key:
+            print(f"[DEBUG] GOOGLE_API_KEY loaded: {'*' * (len(api_key) - 5)}{api_key[-5:]}") # Only show last 5 chars for security
+        else:
+            print("[DEBUG] GOOGLE_API_KEY not loaded or is empty.")
+
+        self.llm = google.beta.realtime.RealtimeModel(
+            model=REALTIME_MODEL,
+            voice=REALTIME_VOICE,
+            temperature=REALTIME_TEMPERATURE,
+            api_key=api_key
+        )
+        self.tts = google.TTS()
+        self.setup_times = deque(maxlen=500)
+
+    def create_session(self):
+        return AgentSession(llm=self.llm, tts=self.tts)
+
+    async def start_session(self, room, agent):
+        """Create and start a session for an agent, recording how long setup took"""
+        started = time.perf_counter()
+        session = self.create_session()
+        await session.start(
+            room=room,
+            agent=agent,
+            room_input_options=RoomInputOptions(
+                noise_cancellation=noise_cancellation.BVC(),
+            ),
+        )
+        elapsed = time.perf_counter() - started
+        self.setup_times.append(elapsed)
+        dependency_latency.observe(elapsed, 'livekit', 'session_start')
+        if elapsed > SESSION_SETUP_BUDGET:
+            print(f"[SessionFactory] Session setup took {elapsed * 1000:.0f} ms, over the {SESSION_SETUP_BUDGET * 1000:.0f} ms budget")
+        else:
+            print(f"[SessionFactory] Session setup took {elapsed * 1000:.0f} ms")
+        return session
+
+    def setup_stats(self):
+        """Count, median and worst setup time in milliseconds over recent sessions"""
+        times = sorted(self.setup_times)
+        if not times:
+            return {'count': 0}
+        return {
+            'count': len(times),
+            'p50_ms': round(times[len(times) // 2] * 1000, 1),
+            'max_ms': round(times[-1] * 1000, 1),
+        }
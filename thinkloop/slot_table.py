@@ -0,0 +1,234 @@
+from bisect import bisect_left, insort
+from datetime import date, datetime, timedelta
+import os
+import re
+import threading
+import time
+
+from dateutil.parser import isoparse
+
+from availability_index import merge_intervals, to_utc
+
+# School days ahead that open slots are precomputed for
+SLOT_TABLE_DAYS = int(os.getenv('SLOT_TABLE_DAYS', 10))
+# Seconds between full rebuilds, which pick up edits made outside the agent
+SLOT_TABLE_REFRESH_INTERVAL = float(os.getenv('SLOT_TABLE_REFRESH_INTERVAL', 300))
+SLOT_DURATION_MINUTES = 30
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+HOURS_PATTERN = re.compile(r'(\d{1,2}:\d{2}\s*[AP]M)\s*-\s*(\d{1,2}:\d{2}\s*[AP]M)', re.IGNORECASE)
+
+
+def parse_hours(text):
+    """'9:00 AM - 3:00 PM, Monday to Friday' -> (time(9, 0), time(15, 0)), or None"""
+    match = HOURS_PATTERN.search(text or '')
+    if not match:
+        return None
+    start, end = (datetime.strptime(value.upper().replace(' ', ''), '%I:%M%p').time() for value in match.groups())
+    return start, end
+
+
+def parse_days(text):
+    """'8:30 AM - 3:30 PM, Monday to Friday' -> {0, 1, 2, 3, 4}; defaults to weekdays"""
+    days = [WEEKDAYS.index(word) for word in re.findall(r'[a-z]+', (text or '').lower()) if word in WEEKDAYS]
+    if len(days) == 2 and ' to ' in text.lower():
+        return set(range(days[0], days[1] + 1))
+    return set(days) or set(range(5))
+
+
+def parse_holidays(holidays):
+    """Dates covered by the knowledge base holidays.
+    Entries can be '2026-12-25' or '2026-12-20 to 2027-01-02'; named holidays without
+    dates (e.g. 'Winter Break') cannot be placed on the calendar and are skipped.
+    """
+    closed = set()
+    for entry in holidays:
+        found = re.findall(r'\d{4}-\d{2}-\d{2}', entry)
+        if not found:
+            continue
+        first = date.fromisoformat(found[0])
+        last = date.fromisoformat(found[-1])
+        while first <= last:
+            closed.add(first)
+            first += timedelta(days=1)
+    return closed
+
+
+def naive_utc(dt):
+    """Slots are stored as naive UTC datetimes, the way appointments are inserted"""
+    return to_utc(dt).replace(tzinfo=None) if dt.tzinfo is not None else dt
+
+
+class OpenSlotTable:
+    """Precomputed open appointment slots per teacher for the next SLOT_TABLE_DAYS school days.
+
+    Slots come from each teacher's office_hours on school days (the class-hours days minus dated
+    holidays), minus busy time from one batched freebusy over every teacher's calendar and the
+    appointments table. Bookings and cancellations update the table in place, so conflict checks
+    and suggestions are sorted-list lookups. Lookups outside the table return None so callers can
+    fall back to the calendar.
+    """
+
+    def __init__(self, calendar, db, knowledge, days=SLOT_TABLE_DAYS, refresh_interval=SLOT_TABLE_REFRESH_INTERVAL,
+                 duration_minutes=SLOT_DURATION_MINUTES):
+        self.calendar = calendar
+        self.db = db
+        self.knowledge = knowledge
+        self.days = days
+        self.refresh_interval = refresh_interval
+        self.duration = timedelta(minutes=duration_minutes)
+        self.horizon = None
+        self.last_rebuild = {}
+        self._slots = {}
+        self._working = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def school_days(self, start):
+        """The next `days` school days from start's date, skipping weekends and dated holidays"""
+        data = self.knowledge.snapshot.data
+        open_days = parse_days(data['hours']['classes'])
+        holidays = parse_holidays(data['holidays'])
+        days, day = [], start.date()
+        # Bounded so a knowledge base with no school days cannot loop forever
+        for _ in range(self.days * 7):
+            if len(days) == self.days:
+                break
+            if day.weekday() in open_days and day not in holidays:
+                days.append(day)
+            day += timedelta(days=1)
+        return days
+
+    def working_slots(self, teacher, days):
+        """Every slot start inside the teacher's office hours on the given days"""
+        hours = parse_hours(teacher.get('office_hours')) or parse_hours(self.knowledge.snapshot.data['hours']['classes'])
+        if hours is None:
+            return []
+        slots = []
+        for day in days:
+            slot, end = datetime.combine(day, hours[0]), datetime.combine(day, hours[1])
+            while slot + self.duration <= end:
+                slots.append(slot)
+                slot += self.duration
+        return slots
+
+    def rebuild(self, now=None):
+        """Recompute the whole table from teachers, the knowledge base, calendars and appointments"""
+        started = time.perf_counter()
+        now = now or datetime.utcnow()
+        days = self.school_days(now)
+        teachers = self.db.get_all_teachers()
+        if not days or not teachers:
+            with self._lock:
+                self._slots, self._working, self.horizon = {}, {}, None
+            return
+
+        window_start = datetime.combine(days[0], datetime.min.time())
+        window_end = datetime.combine(days[-1] + timedelta(days=1), datetime.min.time())
+        calendars = {teacher['name']: self.calendar.calendar_for_teacher(teacher['name']) for teacher in teachers}
+        busy_by_calendar = self.calendar.get_busy_by_calendar(calendars.values(), window_start, window_end)
+
+        booked = {}
+        for appointment in self.db.iter_appointments(
+                start_date=window_start, end_date=window_end, columns=['teacher_name', 'date_time', 'status']
+        ):
+            if appointment.get('status', 'scheduled') != 'scheduled':
+                continue
+            start = to_utc(isoparse(appointment['date_time']))
+            booked.setdefault(appointment['teacher_name'], []).append((start, start + self.duration))
+
+        slots, working = {}, {}
+        for teacher in teachers:
+            name = teacher['name']
+            candidates = [slot for slot in self.working_slots(teacher, days) if slot >= now]
+            busy = merge_intervals(busy_by_calendar[calendars[name]] + booked.get(name, []))
+            working[name] = set(candidates)
+            slots[name] = self.calendar.open_slots(candidates, busy, self.duration)
+
+        with self._lock:
+            self._slots, self._working, self.horizon = slots, working, (now, window_end)
+        self.last_rebuild = {
+            'teachers': len(slots),
+            'open_slots': sum(len(open_times) for open_times in slots.values()),
+            'ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+        print(f"[OpenSlotTable] Rebuilt: {self.last_rebuild}")
+
+    def _covers(self, teacher_name, start_time):
+        return (self.horizon is not None and teacher_name in self._slots
+                and self.horizon[0] <= start_time < self.horizon[1])
+
+    def is_open(self, teacher_name, start_time, duration_minutes=SLOT_DURATION_MINUTES):
+        """True or False if the table covers this teacher and slot, otherwise None.
+        Times off the slot grid or outside office hours are left to the calendar check.
+        """
+        start_time = naive_utc(start_time)
+        with self._lock:
+            if not self._covers(teacher_name, start_time) or start_time not in self._working[teacher_name]:
+                return None
+            open_times = self._slots[teacher_name]
+            slot, end = start_time, start_time + timedelta(minutes=duration_minutes)
+            while slot < end:
+                i = bisect_left(open_times, slot)
+                if i == len(open_times) or open_times[i] != slot:
+                    return False
+                slot += self.duration
+            return True
+
+    def suggest(self, teacher_name, desired_time, max_suggestions=3):
+        """The next open slots at or after desired_time, or None if the table does not cover it"""
+        desired_time = naive_utc(desired_time)
+        with self._lock:
+            if not self._covers(teacher_name, desired_time):
+                return None
+            open_times = self._slots[teacher_name]
+            i = bisect_left(open_times, desired_time)
+            return open_times[i:i + max_suggestions]
+
+    def book(self, teacher_name, start_time, duration_minutes=SLOT_DURATION_MINUTES):
+        """Remove the slots an appointment overlaps"""
+        start_time = naive_utc(start_time)
+        end_time = start_time + timedelta(minutes=duration_minutes)
+        with self._lock:
+            open_times = self._slots.get(teacher_name)
+            if open_times is None:
+                return
+            # Slots starting up to one slot length before the appointment overlap it too
+            i = bisect_left(open_times, start_time - self.duration + timedelta(microseconds=1))
+            while i < len(open_times) and open_times[i] < end_time:
+                del open_times[i]
+
+    def release(self, teacher_name, start_time, duration_minutes=SLOT_DURATION_MINUTES):
+        """Reopen the working-hour slots a cancelled appointment held"""
+        start_time = naive_utc(start_time)
+        end_time = start_time + timedelta(minutes=duration_minutes)
+        with self._lock:
+            open_times = self._slots.get(teacher_name)
+            if open_times is None:
+                return
+            for slot in sorted(self._working[teacher_name]):
+                if start_time <= slot < end_time:
+                    i = bisect_left(open_times, slot)
+                    if i == len(open_times) or open_times[i] != slot:
+                        insort(open_times, slot)
+
+    def _refresh(self):
+        while True:
+            try:
+                self.rebuild()
+            except Exception as e:
+                print(f"[OpenSlotTable] Rebuild failed, keeping previous table: {e}")
+            if self._stop.wait(self.refresh_interval):
+                break
+
+    def start(self):
+        """Build the table in the background and rebuild it every refresh_interval seconds"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._refresh, name='open-slot-table', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+import threading
+import time
+
+
+class StartupReport:
+    """Wall-clock cost of each import and initialization step, to track cold-start regressions"""
+
+    def __init__(self):
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def record(self, component, seconds):
+        with self._lock:
+            self.timings[component] = self.timings.get(component, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, component):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(component, time.perf_counter() - started)
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self.timings)
+
+    def summary(self):
+        """One line per component, most expensive first"""
+        timings = self.as_dict()
+        return "\n".join(
+            f"  {component:<28} {seconds * 1000:8.1f} ms"
+            for component, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True)
+        )
+
+
+startup_report = StartupReport()
@@ -0,0 +1,610 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+
+from dateutil.parser import isoparse
+
+from availability_index import to_utc
+from metrics import timed
+import resilience
+
+# 'supabase' (default) or 'sqlite' for single-site deployments, benchmarks and offline development
+DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', 'supabase').lower()
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'thinkloop.db')
+SUPABASE_TIMEOUT = float(os.getenv('SUPABASE_TIMEOUT', 10))  # seconds per PostgREST request
+
+# Supabase operations that must not be repeated after a failure that may have reached the server
+NON_IDEMPOTENT_OPERATIONS = ('insert', 'claim')
+
+TIMESTAMP_COLUMNS = ('date_time', 'start_time', 'end_time')
+
+
+class StorageBackend:
+    """The queries Database needs, independent of where the rows live.
+    Every method returns plain dicts (or lists of them) with the columns of the table.
+    """
+
+    name = None
+
+    def check_tables(self):
+        raise NotImplementedError
+
+    def insert_appointment(self, row):
+        raise NotImplementedError
+
+    def delete_appointment(self, appointment_id):
+        raise NotImplementedError
+
+    def page_appointments(self, columns, teacher_name=None, start=None, end=None, after=None, limit=500):
+        """Up to limit appointments ordered by (date_time, id), starting after the (date_time, id) cursor"""
+        raise NotImplementedError
+
+    def count_appointments(self, teacher_name=None, start=None, end=None):
+        raise NotImplementedError
+
+    def page_rows(self, table, columns, order_by, range_column=None, start=None, end=None, after=None, limit=500):
+        """Up to limit rows of any table ordered by (order_by, id), starting after the (order_by, id)
+        cursor, with an optional start..end range on range_column; used for bulk exports.
+        Rows with a NULL order_by are left out, since they cannot be resumed after.
+        """
+        raise NotImplementedError
+
+    def insert_call(self, row):
+        raise NotImplementedError
+
+    def update_call(self, call_id, values):
+        """Update one call_analytics row; returns the updated rows"""
+        raise NotImplementedError
+
+    def upsert_calls(self, rows):
+        """Insert or update call_analytics rows keyed on call_id; rows in one batch share their columns"""
+        raise NotImplementedError
+
+    def upsert_call_rollups(self, rows):
+        """Insert or update call_pattern_rollups rows keyed on (period, source)"""
+        raise NotImplementedError
+
+    def get_call_rollups(self, start_period, end_period):
+        """call_pattern_rollups rows for ISO dates start_period..end_period inclusive"""
+        raise NotImplementedError
+
+    def claim_slots(self, teacher_key, slot_starts, holder, expires_at, now):
+        """Atomically hold every (teacher_key, slot_start) for holder until expires_at, or none of them.
+        Succeeds when each slot is free or its previous hold expired before now; returns True if held.
+        """
+        raise NotImplementedError
+
+    def extend_slots(self, teacher_key, slot_starts, holder, expires_at):
+        """Move the expiry of holds this holder owns"""
+        raise NotImplementedError
+
+    def release_slots(self, teacher_key, slot_starts, holder):
+        """Drop holds this holder owns"""
+        raise NotImplementedError
+
+    def get_reminded(self, appointment_ids):
+        """The subset of appointment_ids that already had a reminder sent"""
+        raise NotImplementedError
+
+    def record_reminders(self, rows):
+        """Record sent reminders as {'appointment_id', 'sent_at'} rows; ids already recorded are kept"""
+        raise NotImplementedError
+
+    def get_teachers(self, name=None):
+        raise NotImplementedError
+
+    def page_teachers(self, columns, after=None, limit=500):
+        """Up to limit teachers ordered by (name, id), starting after the (name, id) cursor"""
+        raise NotImplementedError
+
+    def insert_teachers(self, rows):
+        raise NotImplementedError
+
+    def get_school_info(self):
+        raise NotImplementedError
+
+    def insert_school_info(self, row):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SupabaseBackend(StorageBackend):
+    """Rows in Supabase, reached through the PostgREST client"""
+
+    name = 'supabase'
+
+    def __init__(self, client=None):
+        if client is None:
+            from supabase import ClientOptions, create_client
+
+            url, key = os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY')
+            if not url or not key:
+                raise ValueError("Missing Supabase credentials in .env file")
+            client = create_client(url, key, options=ClientOptions(postgrest_client_timeout=SUPABASE_TIMEOUT))
+            print("Successfully connected to Supabase")
+        self.client = client
+
+    def _execute(self, operation, query, count=False):
+        """Run a PostgREST query through the Supabase circuit breaker, recording its latency under
+        the given table.operation label. Reads, updates and upserts are retried on transient errors.
+        """
+        def attempt():
+            with timed('supabase', operation):
+                response = query.execute()
+            return response.count if count else response.data
+
+        idempotent = operation.rsplit('.', 1)[-1] not in NON_IDEMPOTENT_OPERATIONS
+        return resilience.call('supabase', operation, attempt, idempotent=idempotent)
+
+    def check_tables(self):
+        for table in ('school_info', 'teachers', 'appointments', 'call_analytics'):
+            self._execute(f'{table}.select', self.client.table(table).select('*').limit(1))
+            print(f"{table} table exists")
+
+    def insert_appointment(self, row):
+        data = self._execute('appointments.insert', self.client.table('appointments').insert(row))
+        return data[0] if data else None
+
+    def delete_appointment(self, appointment_id):
+        self._execute('appointments.delete', self.client.table('appointments').delete().eq('id', appointment_id))
+
+    @staticmethod
+    def _appointment_filters(query, teacher_name, start, end):
+        if teacher_name:
+            query = query.eq('teacher_name', teacher_name)
+        if start:
+            query = query.gte('date_time', start)
+        if end:
+            query = query.lte('date_time', end)
+        return query
+
+    @staticmethod
+    def _after(query, column, after):
+        """Keyset condition (column, id) > after; values are quoted because timestamps contain ':' and '+'"""
+        if after is None:
+            return query
+        value, row_id = after
+        return query.or_(f'{column}.gt."{value}",and({column}.eq."{value}",id.gt."{row_id}")')
+
+    def page_appointments(self, columns, teacher_name=None, start=None, end=None, after=None, limit=500):
+        query = self._appointment_filters(self.client.table('appointments').select(*columns), teacher_name, start, end)
+        query = self._after(query, 'date_time', after).order('date_time').order('id').limit(limit)
+        return self._execute('appointments.page', query)
+
+    def count_appointments(self, teacher_name=None, start=None, end=None):
+        query = self.client.table('appointments').select('id', count='exact', head=True)
+        query = self._appointment_filters(query, teacher_name, start, end)
+        return self._execute('appointments.count', query, count=True)
+
+    def page_rows(self, table, columns, order_by, range_column=None, start=None, end=None, after=None, limit=500):
+        query = self.client.table(table).select(*columns).filter(order_by, 'not.is', 'null')
+        if range_column and start:
+            query = query.gte(range_column, start)
+        if range_column and end:
+            query = query.lte(range_column, end)
+        query = self._after(query, order_by, after).order(order_by).order('id').limit(limit)
+        return self._execute(f'{table}.page', query)
+
+    def insert_call(self, row):
+        data = self._execute('call_analytics.insert', self.client.table('call_analytics').insert(row))
+        return data[0] if data else None
+
+    def update_call(self, call_id, values):
+        return self._execute(
+            'call_analytics.update', self.client.table('call_analytics').update(values).eq('call_id', call_id)
+        )
+
+    def upsert_calls(self, rows):
+        self._execute('call_analytics.upsert', self.client.table('call_analytics').upsert(rows, on_conflict='call_id'))
+
+    def upsert_call_rollups(self, rows):
+        self._execute(
+            'call_pattern_rollups.upsert',
+            self.client.table('call_pattern_rollups').upsert(rows, on_conflict='period,source')
+        )
+
+    def get_call_rollups(self, start_period, end_period):
+        query = self.client.table('call_pattern_rollups').select('*').gte('period', start_period).lte('period', end_period)
+        return self._execute('call_pattern_rollups.select', query.order('period'))
+
+    def claim_slots(self, teacher_key, slot_starts, holder, expires_at, now):
+        table = self.client.table('slot_reservations')
+        # PostgREST has no conditional upsert: clear expired holds, then let the primary key pick one winner.
+        # A multi-row insert is one statement, so a conflict on any slot inserts none of them.
+        self._execute('slot_reservations.expire', table.delete().eq('teacher_key', teacher_key)
+                      .in_('slot_start', slot_starts).lte('expires_at', now))
+        try:
+            self._execute('slot_reservations.claim', self.client.table('slot_reservations').insert([
+                {'teacher_key': teacher_key, 'slot_start': slot_start, 'holder': holder, 'expires_at': expires_at}
+                for slot_start in slot_starts
+            ]))
+        except Exception as e:
+            if getattr(e, 'code', None) == '23505':
+                return False
+            raise
+        return True
+
+    def extend_slots(self, teacher_key, slot_starts, holder, expires_at):
+        self._execute('slot_reservations.extend', self.client.table('slot_reservations').update(
+            {'expires_at': expires_at}
+        ).eq('teacher_key', teacher_key).in_('slot_start', slot_starts).eq('holder', holder))
+
+    def release_slots(self, teacher_key, slot_starts, holder):
+        self._execute('slot_reservations.release', self.client.table('slot_reservations').delete()
+                      .eq('teacher_key', teacher_key).in_('slot_start', slot_starts).eq('holder', holder))
+
+    def get_reminded(self, appointment_ids):
+        if not appointment_ids:
+            return set()
+        rows = self._execute('appointment_reminders.select', self.client.table('appointment_reminders')
+                             .select('appointment_id').in_('appointment_id', list(appointment_ids)))
+        return {row['appointment_id'] for row in rows}
+
+    def record_reminders(self, rows):
+        if rows:
+            self._execute('appointment_reminders.upsert', self.client.table('appointment_reminders')
+                          .upsert(rows, on_conflict='appointment_id'))
+
+    def get_teachers(self, name=None):
+        query = self.client.table('teachers').select('*')
+        if name is not None:
+            query = query.eq('name', name)
+        return self._execute('teachers.select', query)
+
+    def page_teachers(self, columns, after=None, limit=500):
+        query = self._after(self.client.table('teachers').select(*columns), 'name', after)
+        return self._execute('teachers.page', query.order('name').order('id').limit(limit))
+
+    def insert_teachers(self, rows):
+        self._execute('teachers.insert', self.client.table('teachers').insert(rows))
+
+    def get_school_info(self):
+        return self._execute('school_info.select', self.client.table('school_info').select('*'))
+
+    def insert_school_info(self, row):
+        self._execute('school_info.insert', self.client.table('school_info').insert(row))
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS school_info (
+    id TEXT PRIMARY KEY,
+    name TEXT, address TEXT, phone TEXT, email TEXT, website TEXT,
+    office_hours TEXT, class_hours TEXT, summer_hours TEXT
+);
+CREATE TABLE IF NOT EXISTS teachers (
+    id TEXT PRIMARY KEY,
+    name TEXT, subject TEXT, email TEXT, phone TEXT, office_hours TEXT, calendar_id TEXT
+);
+CREATE TABLE IF NOT EXISTS appointments (
+    id TEXT PRIMARY KEY,
+    parent_name TEXT, student_name TEXT, teacher_name TEXT,
+    date_time TEXT,
+    purpose TEXT, contact_number TEXT, email TEXT, language TEXT,
+    status TEXT DEFAULT 'scheduled',
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS call_analytics (
+    id TEXT PRIMARY KEY,
+    call_id TEXT UNIQUE,
+    start_time TEXT, end_time TEXT,
+    duration INTEGER,
+    language TEXT, status TEXT, caller_name TEXT
+);
+CREATE TABLE IF NOT EXISTS call_pattern_rollups (
+    period TEXT NOT NULL,
+    source TEXT NOT NULL,
+    hourly TEXT,
+    calls_started INTEGER, calls_completed INTEGER, calls_failed INTEGER, callers_identified INTEGER,
+    languages TEXT, duration_sketch TEXT, concurrency TEXT,
+    updated_at TEXT,
+    PRIMARY KEY (period, source)
+);
+CREATE TABLE IF NOT EXISTS slot_reservations (
+    teacher_key TEXT NOT NULL,
+    slot_start TEXT NOT NULL,
+    holder TEXT NOT NULL,
+    expires_at TEXT NOT NULL,
+    PRIMARY KEY (teacher_key, slot_start)
+);
+CREATE TABLE IF NOT EXISTS appointment_reminders (
+    appointment_id TEXT PRIMARY KEY,
+    sent_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_teachers_name_id ON teachers (name, id);
+CREATE INDEX IF NOT EXISTS idx_appointments_teacher_time ON appointments (teacher_name, date_time);
+CREATE INDEX IF NOT EXISTS idx_appointments_time_id ON appointments (date_time, id);
+CREATE INDEX IF NOT EXISTS idx_appointments_created_id ON appointments (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_call_analytics_start_id ON call_analytics (start_time, id);
+"""
+
+
+def _timestamp(value):
+    """Store timestamps as UTC ISO strings so they sort and compare correctly as text"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = isoparse(value)
+    return to_utc(value).isoformat()
+
+
+def _normalize(row):
+    return {key: _timestamp(value) if key in TIMESTAMP_COLUMNS else value for key, value in row.items()}
+
+
+class SQLiteBackend(StorageBackend):
+    """Rows in a local SQLite file in WAL mode, for low-latency single-site deployments.
+
+    One connection is shared by the process and serialized with a lock; WAL lets readers in
+    other processes proceed while a write is in progress.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SQLITE_SCHEMA)
+        self._table_columns = {}
+
+    def _query(self, operation, sql, params=()):
+        with timed('sqlite', operation), self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def _insert(self, operation, table, rows):
+        rows = [dict(_normalize(row), id=row.get('id') or str(uuid.uuid4())) for row in rows]
+        if not rows:
+            return []
+        columns = list(rows[0])
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        with timed('sqlite', operation), self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(sql, [[row.get(column) for column in columns] for row in rows])
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return rows
+
+    def check_tables(self):
+        for table in ('school_info', 'teachers', 'appointments', 'call_analytics'):
+            self._query(f'{table}.select', f'SELECT * FROM {table} LIMIT 1')
+            print(f"{table} table exists")
+
+    def insert_appointment(self, row):
+        return self._insert('appointments.insert', 'appointments',
+                            [dict(row, created_at=datetime.utcnow().isoformat())])[0]
+
+    def delete_appointment(self, appointment_id):
+        with timed('sqlite', 'appointments.delete'), self._lock:
+            self._conn.execute('DELETE FROM appointments WHERE id = ?', (appointment_id,))
+
+    @staticmethod
+    def _appointment_filters(teacher_name, start, end, after=None):
+        conditions, params = [], []
+        if teacher_name:
+            conditions.append('teacher_name = ?')
+            params.append(teacher_name)
+        if start:
+            conditions.append('date_time >= ?')
+            params.append(_timestamp(start))
+        if end:
+            conditions.append('date_time <= ?')
+            params.append(_timestamp(end))
+        if after is not None:
+            conditions.append('(date_time, id) > (?, ?)')
+            params.extend((_timestamp(after[0]), after[1]))
+        return (f" WHERE {' AND '.join(conditions)}" if conditions else ''), params
+
+    def _columns(self, table, columns):
+        """Column list for a SELECT, checked against the table so names are never interpolated blindly"""
+        if list(columns) == ['*']:
+            return '*'
+        if table not in self._table_columns:
+            self._table_columns[table] = {row['name'] for row in self._query('schema', f'PRAGMA table_info({table})')}
+        unknown = set(columns) - self._table_columns[table]
+        if unknown:
+            raise ValueError(f"Unknown {table} columns: {', '.join(sorted(unknown))}")
+        return ', '.join(columns)
+
+    def page_appointments(self, columns, teacher_name=None, start=None, end=None, after=None, limit=500):
+        where, params = self._appointment_filters(teacher_name, start, end, after)
+        return self._query(
+            'appointments.page',
+            f'SELECT {self._columns("appointments", columns)} FROM appointments{where} ORDER BY date_time, id LIMIT ?',
+            [*params, limit]
+        )
+
+    def count_appointments(self, teacher_name=None, start=None, end=None):
+        where, params = self._appointment_filters(teacher_name, start, end)
+        return self._query('appointments.count', f'SELECT COUNT(*) AS count FROM appointments{where}', params)[0]['count']
+
+    def page_rows(self, table, columns, order_by, range_column=None, start=None, end=None, after=None, limit=500):
+        selected = self._columns(table, columns)
+        self._columns(table, [column for column in (order_by, range_column) if column])
+        conditions, params = [f'{order_by} IS NOT NULL'], []
+        if range_column and start:
+            conditions.append(f'{range_column} >= ?')
+            params.append(_timestamp(start))
+        if range_column and end:
+            conditions.append(f'{range_column} <= ?')
+            params.append(_timestamp(end))
+        if after is not None:
+            # The cursor came from this column, so it is compared exactly as stored
+            conditions.append(f'({order_by}, id) > (?, ?)')
+            params.extend(after)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        return self._query(
+            f'{table}.page',
+            f'SELECT {selected} FROM {table}{where} ORDER BY {order_by}, id LIMIT ?',
+            [*params, limit]
+        )
+
+    def insert_call(self, row):
+        return self._insert('call_analytics.insert', 'call_analytics', [row])[0]
+
+    def update_call(self, call_id, values):
+        values = _normalize(values)
+        assignments = ', '.join(f'{column} = ?' for column in values)
+        with timed('sqlite', 'call_analytics.update'), self._lock:
+            rows = self._conn.execute(
+                f'UPDATE call_analytics SET {assignments} WHERE call_id = ? RETURNING *',
+                [*values.values(), call_id]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def upsert_calls(self, rows):
+        if not rows:
+            return
+        rows = [_normalize(row) for row in rows]
+        columns = list(rows[0])
+        updates = ', '.join(f'{column} = excluded.{column}' for column in columns if column != 'call_id')
+        sql = (
+            f"INSERT INTO call_analytics (id, {', '.join(columns)}) VALUES (?, {', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT (call_id) DO " + (f"UPDATE SET {updates}" if updates else "NOTHING")
+        )
+        with timed('sqlite', 'call_analytics.upsert'), self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(sql, [[str(uuid.uuid4()), *(row[c] for c in columns)] for row in rows])
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def upsert_call_rollups(self, rows):
+        if not rows:
+            return
+        # JSON columns are stored as text; summarize_rollups accepts either form
+        rows = [{key: json.dumps(value) if isinstance(value, (dict, list)) else value for key, value in row.items()}
+                for row in rows]
+        columns = list(rows[0])
+        updates = ', '.join(f'{column} = excluded.{column}' for column in columns if column not in ('period', 'source'))
+        sql = (
+            f"INSERT INTO call_pattern_rollups ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT (period, source) DO UPDATE SET {updates}"
+        )
+        with timed('sqlite', 'call_pattern_rollups.upsert'), self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(sql, [[row[column] for column in columns] for row in rows])
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def get_call_rollups(self, start_period, end_period):
+        return self._query(
+            'call_pattern_rollups.select',
+            'SELECT * FROM call_pattern_rollups WHERE period >= ? AND period <= ? ORDER BY period',
+            (start_period, end_period)
+        )
+
+    def claim_slots(self, teacher_key, slot_starts, holder, expires_at, now):
+        # Per slot: insert, or take over a hold that has expired; nothing is returned if it is held.
+        # One transaction, rolled back if any slot is held, so the claim is all or nothing.
+        with timed('sqlite', 'slot_reservations.claim'), self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for slot_start in slot_starts:
+                    rows = self._conn.execute(
+                        "INSERT INTO slot_reservations (teacher_key, slot_start, holder, expires_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (teacher_key, slot_start) DO UPDATE SET holder = excluded.holder, "
+                        "expires_at = excluded.expires_at WHERE slot_reservations.expires_at <= ? RETURNING holder",
+                        (teacher_key, _timestamp(slot_start), holder, _timestamp(expires_at), _timestamp(now))
+                    ).fetchall()
+                    if not rows:
+                        self._conn.execute('ROLLBACK')
+                        return False
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+        return True
+
+    def extend_slots(self, teacher_key, slot_starts, holder, expires_at):
+        with timed('sqlite', 'slot_reservations.extend'), self._lock:
+            self._conn.executemany(
+                'UPDATE slot_reservations SET expires_at = ? WHERE teacher_key = ? AND slot_start = ? AND holder = ?',
+                [(_timestamp(expires_at), teacher_key, _timestamp(slot_start), holder) for slot_start in slot_starts]
+            )
+
+    def release_slots(self, teacher_key, slot_starts, holder):
+        with timed('sqlite', 'slot_reservations.release'), self._lock:
+            self._conn.executemany(
+                'DELETE FROM slot_reservations WHERE teacher_key = ? AND slot_start = ? AND holder = ?',
+                [(teacher_key, _timestamp(slot_start), holder) for slot_start in slot_starts]
+            )
+
+    def get_reminded(self, appointment_ids):
+        appointment_ids = list(appointment_ids)
+        if not appointment_ids:
+            return set()
+        rows = self._query(
+            'appointment_reminders.select',
+            f"SELECT appointment_id FROM appointment_reminders WHERE appointment_id IN ({', '.join('?' for _ in appointment_ids)})",
+            appointment_ids
+        )
+        return {row['appointment_id'] for row in rows}
+
+    def record_reminders(self, rows):
+        if not rows:
+            return
+        with timed('sqlite', 'appointment_reminders.insert'), self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(
+                    'INSERT INTO appointment_reminders (appointment_id, sent_at) VALUES (?, ?) '
+                    'ON CONFLICT (appointment_id) DO NOTHING',
+                    [(row['appointment_id'], row['sent_at']) for row in rows]
+                )
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def get_teachers(self, name=None):
+        if name is not None:
+            return self._query('teachers.select', 'SELECT * FROM teachers WHERE name = ?', (name,))
+        return self._query('teachers.select', 'SELECT * FROM teachers')
+
+    def page_teachers(self, columns, after=None, limit=500):
+        where, params = '', []
+        if after is not None:
+            where, params = ' WHERE (name, id) > (?, ?)', list(after)
+        return self._query(
+            'teachers.page',
+            f'SELECT {self._columns("teachers", columns)} FROM teachers{where} ORDER BY name, id LIMIT ?',
+            [*params, limit]
+        )
+
+    def insert_teachers(self, rows):
+        self._insert('teachers.insert', 'teachers', rows)
+
+    def get_school_info(self):
+        return self._query('school_info.select', 'SELECT * FROM school_info')
+
+    def insert_school_info(self, row):
+        self._insert('school_info.insert', 'school_info', [row])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_backend(name=DATABASE_BACKEND):
+    """Build the storage backend named by DATABASE_BACKEND"""
+    if name == 'sqlite':
+        return SQLiteBackend()
+    if name == 'supabase':
+        return SupabaseBackend()
+    raise ValueError(f"Unknown DATABASE_BACKEND '{name}', expected 'supabase' or 'sqlite'")
@@ -0,0 +1,87 @@
+"""TTLCache read-through behaviour: expiry, cached misses, LRU eviction and uncached errors."""
+import time
+
+import pytest
+
+from cache import TTLCache
+from database import Database
+from fakes import FakeSupabase
+
+
+class Loader:
+    """Returns the next value on each call and counts the calls"""
+
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.values.pop(0)
+
+
+def test_hits_are_served_without_loading():
+    cache, load = TTLCache(ttl=60), Loader('school')
+    assert cache.get_or_load('info', load) == 'school'
+    assert cache.get_or_load('info', load) == 'school'
+    assert load.calls == 1 and cache.stats() == {'hits': 1, 'misses': 1, 'size': 1}
+
+
+def test_entries_expire_after_ttl():
+    cache, load = TTLCache(ttl=0.05), Loader('old', 'new')
+    assert cache.get_or_load('info', load) == 'old'
+    time.sleep(0.07)
+    assert cache.get_or_load('info', load) == 'new' and load.calls == 2
+
+
+def test_missing_values_are_cached_for_negative_ttl():
+    cache, load = TTLCache(ttl=60, negative_ttl=0.05), Loader(None, 'found')
+    assert cache.get_or_load('teacher', load) is None
+    assert cache.get_or_load('teacher', load) is None and load.calls == 1
+    time.sleep(0.07)
+    assert cache.get_or_load('teacher', load) == 'found'
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(ttl=60, maxsize=2)
+    cache.get_or_load('a', Loader(1))
+    cache.get_or_load('b', Loader(2))
+    cache.get_or_load('a', Loader())
+    cache.get_or_load('c', Loader(3))
+    load = Loader(20)
+    assert cache.get_or_load('b', load) == 20 and load.calls == 1
+    assert cache.stats()['size'] == 2
+
+
+def test_loader_errors_are_not_cached():
+    cache = TTLCache(ttl=60)
+
+    def unavailable():
+        raise ConnectionError('supabase unavailable')
+
+    with pytest.raises(ConnectionError):
+        cache.get_or_load('info', unavailable)
+    assert cache.get_or_load('info', Loader('school')) == 'school'
+
+
+def test_invalidate_one_key_or_everything():
+    cache = TTLCache(ttl=60)
+    cache.get_or_load('a', Loader(1))
+    cache.get_or_load('b', Loader(2))
+    cache.invalidate('a')
+    assert cache.get_or_load('a', Loader(10)) == 10 and cache.get_or_load('b', Loader()) == 2
+    cache.invalidate()
+    assert cache.stats()['size'] == 0
+
+
+def test_database_serves_repeated_teacher_lookups_from_cache():
+    client = FakeSupabase()
+    db = Database(client=client)
+    try:
+        db.initialize_default_teachers()
+        db.get_teacher_by_name('Dr. Sarah Johnson')
+        requests = client.requests
+        assert db.get_teacher_by_name('Dr. Sarah Johnson')['name'] == 'Dr. Sarah Johnson'
+        assert client.requests == requests
+    finally:
+        db.close()
@@ -0,0 +1,79 @@
+"""Lookups over the shipped knowledge_base.json: query -> the entry a caller expects to hear about."""
+import json
+import os
+
+import pytest
+
+from knowledge_index import KnowledgeIndex, expand_query, stem, tokenize
+
+KNOWLEDGE_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knowledge_base.json')
+
+
+@pytest.fixture(scope='module')
+def index():
+    with open(KNOWLEDGE_BASE) as f:
+        return KnowledgeIndex.from_knowledge_base(json.load(f))
+
+
+def titles(index, query, top_k=3):
+    return [document['title'] for _, document in index.search(query, top_k)]
+
+
+@pytest.mark.parametrize('singular, plural', [
+    ('course', 'courses'), ('bus', 'buses'), ('nurse', 'nurses'), ('holiday', 'holidays'),
+    ('class', 'classes'), ('lunch', 'lunches'), ('activity', 'activities'), ('fee', 'fees'),
+])
+def test_singular_and_plural_share_a_stem(singular, plural):
+    assert stem(singular) == stem(plural)
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('what courses do you offer', 'science course'),
+    ('buses', 'transportation'),
+    ('is there a school bus', 'transportation'),
+    ('nurses', 'nurse emergency contact'),
+    ('uniform policy', 'uniform policy'),
+    ('computer science classes', 'computer science course'),
+])
+def test_english_queries(index, query, expected):
+    assert titles(index, query)[0] == expected
+
+
+def test_plural_query_finds_every_course(index):
+    sections = [document['section'] for _, document in index.search('what courses do you offer', top_k=2)]
+    assert sections == ['courses_offered', 'courses_offered']
+
+
+def test_holidays_come_back_as_one_list(index):
+    results = index.search('when are the holidays')
+    assert results[0][1]['section'] == 'holidays'
+    for holiday in ('Labor Day', 'Thanksgiving Break', 'Winter Break', 'Spring Break', 'Memorial Day'):
+        assert holiday in results[0][1]['text']
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('फीस कितनी है', 'tuition fees'),
+    ('छुट्टियाँ कब हैं', 'School holidays'),
+    ('वर्दी के नियम', 'uniform policy'),
+])
+def test_hindi_queries_expand_to_english(index, query, expected):
+    assert titles(index, query)[0] == expected
+
+
+def test_devanagari_tokens_are_kept_whole_and_stopwords_dropped():
+    assert tokenize('मुझे फीस बताइए') == ['फीस']
+    assert set(expand_query(['फीस'])) == {'फीस', stem('tuition'), stem('fees')}
+
+
+def test_rarer_terms_rank_higher():
+    index = KnowledgeIndex([
+        {'title': 'a', 'text': 'school bus route'},
+        {'title': 'b', 'text': 'school lunch menu'},
+        {'title': 'c', 'text': 'school library'},
+    ])
+    assert index.idf[stem('bus')] > index.idf[stem('school')]
+    assert [document['title'] for _, document in index.search('school bus')][0] == 'a'
+
+
+def test_no_match_returns_nothing(index):
+    assert index.search('zzzz qqqq') == []
@@ -0,0 +1,56 @@
+"""Keyset-paged reads return every row exactly once, even when many rows share a date_time."""
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import Database
+from fakes import FakeSupabase
+from storage import SQLiteBackend
+
+START = datetime(2026, 11, 2, 9, 0)
+# Few distinct times, so page boundaries fall inside runs of equal date_time values
+TIMES = [START + timedelta(hours=hour) for hour in range(3)]
+APPOINTMENTS = 23
+
+
+@pytest.fixture(params=['supabase', 'sqlite'])
+def db(request):
+    with tempfile.TemporaryDirectory() as workdir:
+        if request.param == 'sqlite':
+            db = Database(backend=SQLiteBackend(os.path.join(workdir, 'thinkloop.db')))
+        else:
+            db = Database(client=FakeSupabase())
+        for index in range(APPOINTMENTS):
+            db.add_appointment(f'Parent {index}', f'Student {index}', 'Dr. Sarah Johnson', TIMES[index % len(TIMES)],
+                               'Review', '555-0100', f'parent{index}@example.com', 'en')
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+@pytest.mark.parametrize('page_size', [1, 2, 5, 7, APPOINTMENTS, 100])
+def test_pages_split_across_equal_times(db, page_size):
+    rows = list(db.iter_appointments(page_size=page_size))
+    ids = [row['id'] for row in rows]
+    assert len(ids) == len(set(ids)) == APPOINTMENTS
+    assert [(row['date_time'], row['id']) for row in rows] == sorted((row['date_time'], row['id']) for row in rows)
+
+
+def test_projection_drops_cursor_columns(db):
+    rows = list(db.iter_appointments(columns=['parent_name'], page_size=4))
+    assert len(rows) == APPOINTMENTS and all(set(row) == {'parent_name'} for row in rows)
+
+
+def test_range_filter_pages_within_the_range(db):
+    rows = list(db.iter_appointments(start_date=TIMES[1], end_date=TIMES[1] + timedelta(minutes=30), page_size=3))
+    assert len(rows) == len(range(1, APPOINTMENTS, len(TIMES)))
+
+
+def test_resume_from_a_cursor_inside_a_run_of_equal_times(db):
+    rows = list(db.iter_rows('appointments', 'date_time', page_size=4))
+    cursor = (rows[9]['date_time'], rows[9]['id'])
+    resumed = list(db.iter_rows('appointments', 'date_time', after=cursor, page_size=4))
+    assert [row['id'] for row in resumed] == [row['id'] for row in rows[10:]]
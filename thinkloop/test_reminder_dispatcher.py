@@ -0,0 +1,120 @@
+"""Reminder runs send each appointment's reminder once, even across a run that stopped part way.
+
+Sends go to a local SMTP sink; appointments live in the in-memory Supabase stand-in and a SQLite file.
+"""
+import os
+import smtplib
+import tempfile
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from database import Database
+from email_manager import EmailManager
+from fakes import FakeSupabase, SMTPSink
+from reminder_dispatcher import ReminderDispatcher, SentRecorder
+from storage import SQLiteBackend
+
+DAY = date.today() + timedelta(days=1)
+APPOINTMENTS = 25
+
+
+@pytest.fixture(params=['supabase', 'sqlite'])
+def db(request):
+    with tempfile.TemporaryDirectory() as workdir:
+        if request.param == 'sqlite':
+            db = Database(backend=SQLiteBackend(os.path.join(workdir, 'thinkloop.db')))
+        else:
+            db = Database(client=FakeSupabase())
+        start = datetime.combine(DAY, datetime.min.time()).replace(hour=9)
+        for index in range(APPOINTMENTS):
+            db.add_appointment(f'Parent {index}', f'Student {index}', 'Dr. Sarah Johnson',
+                               start + timedelta(minutes=15 * index), 'Review', '555-0100',
+                               f'parent{index}@example.com', 'hi' if index % 3 == 0 else 'en')
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    sink = SMTPSink().start()
+    monkeypatch.setenv('EMAIL_USER', 'reception@example.com')
+    monkeypatch.setenv('EMAIL_PASS', 'unused')
+    monkeypatch.setenv('EMAIL_HOST', sink.host)
+    monkeypatch.setenv('EMAIL_PORT', str(sink.port))
+    monkeypatch.setenv('EMAIL_USE_TLS', 'false')
+    try:
+        yield sink
+    finally:
+        sink.stop()
+
+
+class FailingAfter:
+    """SMTP session that delivers the first sends and then fails every one after them"""
+
+    def __init__(self, session, sends):
+        self.session = session
+        self.sends = sends
+
+    def send(self, *args):
+        if self.sends <= 0:
+            raise smtplib.SMTPServerDisconnected('mail server went away')
+        self.sends -= 1
+        return self.session.send(*args)
+
+    def close(self):
+        self.session.close()
+
+
+def recipients(sink):
+    return [recipient for message in sink.messages for recipient in message['to']]
+
+
+def test_rerun_after_partial_run_sends_only_the_rest(db, sink, monkeypatch):
+    email_manager = EmailManager(use_outbox=False)
+    create_smtp_session = email_manager.create_smtp_session
+    monkeypatch.setattr(email_manager, 'create_smtp_session', lambda: FailingAfter(create_smtp_session(), 10))
+    dispatcher = ReminderDispatcher(db, email_manager, batch_size=7, max_per_second=0, record_every=4)
+
+    first = dispatcher.run(DAY)
+    assert (first['pending'], first['sent']) == (APPOINTMENTS, 10)
+
+    monkeypatch.setattr(email_manager, 'create_smtp_session', create_smtp_session)
+    second = dispatcher.run(DAY)
+    assert (second['pending'], second['sent'], second['failed']) == (APPOINTMENTS - 10, APPOINTMENTS - 10, 0)
+    assert len(recipients(sink)) == len(set(recipients(sink))) == APPOINTMENTS
+    assert dispatcher.run(DAY)['pending'] == 0
+
+
+def test_sent_reminders_are_recorded_in_batches(db, sink, monkeypatch):
+    batches = []
+    record_reminders_sent = db.record_reminders_sent
+
+    def record(ids):
+        batches.append(len(ids))
+        return record_reminders_sent(ids)
+
+    monkeypatch.setattr(db, 'record_reminders_sent', record)
+    stats = ReminderDispatcher(db, EmailManager(use_outbox=False), max_per_second=0, record_every=10).run(DAY)
+    assert stats['sent'] == APPOINTMENTS
+    assert sum(batches) == APPOINTMENTS and max(batches) <= 10 and len(batches) < APPOINTMENTS
+
+
+def test_recorder_reports_a_failed_write():
+    recorder = SentRecorder(lambda ids: False, every=2)
+    recorder.add(1)
+    recorder.add(2)
+    recorder.add(3)
+    assert recorder.close() is False
+    assert recorder.failed and recorder.recorded == 0
+
+
+def test_recorder_writes_the_remainder_on_close():
+    written = []
+    recorder = SentRecorder(lambda ids: written.append(ids) or True, every=2, interval=60)
+    for appointment_id in range(5):
+        recorder.add(appointment_id)
+    assert recorder.close() is True
+    assert written == [[0, 1], [2, 3], [4]] and recorder.recorded == 5
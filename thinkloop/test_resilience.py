@@ -0,0 +1,166 @@
+"""Circuit breakers, retries and deadlines, including a calendar call that outlives its deadline."""
+import asyncio
+import itertools
+import threading
+import time
+
+import pytest
+
+import resilience
+from calendar_manager import CalendarManager
+from fakes import FakeCalendarService
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, DeadlineExceeded
+
+RESET = 0.05
+_names = itertools.count()
+
+
+@pytest.fixture
+def dependency():
+    """A fresh dependency name, so each test gets its own process-wide breaker"""
+    return f'test-dependency-{next(_names)}'
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(resilience, 'RESILIENCE_BACKOFF_BASE', 0.001)
+
+
+def flaky(failures, error=ConnectionError('connection reset')):
+    """A call that fails `failures` times and then succeeds; .calls counts the attempts"""
+    def call():
+        call.calls += 1
+        if call.calls <= failures:
+            raise error
+        return 'ok'
+    call.calls = 0
+    return call
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker('test', failure_threshold=3, reset_timeout=RESET)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    assert breaker.stats()['trips'] == 1 and breaker.stats()['rejections'] == 1
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=RESET)
+    breaker.record_failure()
+    time.sleep(RESET * 1.5)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN and not breaker.allow()
+
+
+def test_failed_probe_reopens_and_successful_probe_closes():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=RESET)
+    breaker.record_failure()
+    time.sleep(RESET * 1.5)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    time.sleep(RESET * 1.5)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.allow() and breaker.allow()
+
+
+def test_released_probe_frees_the_half_open_slot():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=RESET)
+    breaker.record_failure()
+    time.sleep(RESET * 1.5)
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == HALF_OPEN and breaker.allow()
+
+
+def test_idempotent_calls_retry_transient_failures(dependency):
+    func = flaky(2)
+    assert resilience.call(dependency, 'read', func, idempotent=True) == 'ok'
+    assert func.calls == 3 and resilience.breaker(dependency).state == CLOSED
+
+
+def test_writes_are_not_retried(dependency):
+    func = flaky(1)
+    with pytest.raises(ConnectionError):
+        resilience.call(dependency, 'write', func)
+    assert func.calls == 1
+
+
+def test_refused_requests_do_not_count_against_the_breaker(dependency):
+    for _ in range(resilience.BREAKER_FAILURE_THRESHOLD + 1):
+        with pytest.raises(ValueError):
+            resilience.call(dependency, 'write', flaky(1, ValueError('duplicate key')), idempotent=True)
+    assert resilience.breaker(dependency).state == CLOSED
+
+
+def test_open_circuit_fails_fast(dependency):
+    for _ in range(resilience.BREAKER_FAILURE_THRESHOLD):
+        with pytest.raises(ConnectionError):
+            resilience.call(dependency, 'write', flaky(1))
+    func = flaky(0)
+    with pytest.raises(CircuitOpenError):
+        resilience.call(dependency, 'write', func)
+    assert func.calls == 0
+
+
+def test_call_after_the_deadline_is_not_made(dependency):
+    func = flaky(0)
+    with resilience.deadline(0.01):
+        time.sleep(0.02)
+        with pytest.raises(DeadlineExceeded):
+            resilience.call(dependency, 'read', func, idempotent=True)
+    assert func.calls == 0
+
+
+def test_nested_deadline_only_shortens():
+    with resilience.deadline(0.05):
+        with resilience.deadline(60):
+            assert resilience.remaining() <= 0.05
+        with resilience.without_deadline():
+            assert resilience.remaining() is None
+    assert resilience.remaining() is None
+
+
+def test_run_in_thread_gives_up_at_the_deadline():
+    async def slow():
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            with resilience.deadline(0.05):
+                await resilience.run_in_thread(time.sleep, 0.3)
+        return time.monotonic() - started
+
+    assert asyncio.run(slow()) < 0.25
+
+
+def test_calendar_call_past_its_deadline_is_abandoned_and_undone():
+    manager = CalendarManager(service=FakeCalendarService())
+    undone = threading.Event()
+    abandoned = []
+
+    def slow_booking():
+        time.sleep(0.2)
+        return 'event-1'
+
+    def undo(result):
+        abandoned.append(result)
+        undone.set()
+
+    async def book():
+        with resilience.deadline(0.05):
+            await manager._run(slow_booking, on_abandon=undo)
+
+    try:
+        started = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(book())
+        assert time.monotonic() - started < 0.15 and not abandoned
+        assert undone.wait(1) and abandoned == ['event-1']
+    finally:
+        manager.close()
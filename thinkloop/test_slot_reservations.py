@@ -0,0 +1,135 @@
+"""Concurrent bookings of one teacher's time must produce exactly one calendar event.
+
+Runs create_appointment from several threads released together by a barrier, against the
+in-memory Supabase stand-in and a SQLite file, with a slow fake calendar so the bookings overlap.
+"""
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import resilience
+from agent import Assistant
+from calendar_manager import CalendarManager
+from database import Database, normalize_teacher_name
+from fakes import FakeCalendarService, FakeSession, FakeSupabase
+from storage import SQLiteBackend
+
+CALLERS = 8
+SLOT = datetime.utcnow().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=3)
+
+
+@pytest.fixture(params=['supabase', 'sqlite'])
+def calendar(request):
+    with tempfile.TemporaryDirectory() as workdir:
+        if request.param == 'sqlite':
+            db = Database(backend=SQLiteBackend(os.path.join(workdir, 'thinkloop.db')))
+        else:
+            db = Database(client=FakeSupabase())
+        db.initialize_default_teachers()
+        manager = CalendarManager(db=db, service=FakeCalendarService(latency=0.02))
+        try:
+            yield manager
+        finally:
+            manager.close()
+            db.close()
+
+
+def book_together(calendar, bookings):
+    """Run (teacher_name, start_time) bookings at the same moment; returns their results"""
+    barrier = threading.Barrier(len(bookings))
+    results = [None] * len(bookings)
+
+    def book(index, teacher_name, start_time):
+        barrier.wait()
+        results[index] = calendar.create_appointment(teacher_name, 'Parent', 'Student', start_time)
+
+    threads = [threading.Thread(target=book, args=(index, *booking)) for index, booking in enumerate(bookings)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def winners(results):
+    return [result for result in results if result['status'] == 'success']
+
+
+def test_one_winner_per_slot(calendar):
+    results = book_together(calendar, [('Dr. Sarah Johnson', SLOT)] * CALLERS)
+    assert len(winners(results)) == 1
+    assert all(result['status'] == 'conflict' for result in results if result['status'] != 'success')
+
+
+def test_overlapping_off_grid_times_contend(calendar):
+    starts = [SLOT + timedelta(minutes=15 * (index % 2)) for index in range(CALLERS)]
+    results = book_together(calendar, [('Dr. Sarah Johnson', start) for start in starts])
+    assert len(winners(results)) == 1
+
+
+def test_name_spellings_contend(calendar):
+    names = ['Dr. Sarah Johnson', 'sarah johnson', 'DR SARAH JOHNSON', 'Sarah  Johnson.']
+    results = book_together(calendar, [(names[index % len(names)], SLOT) for index in range(CALLERS)])
+    assert len(winners(results)) == 1
+    assert winners(results)[0]['teacher_name'] == 'Dr. Sarah Johnson'
+
+
+def test_cancel_releases_slot(calendar):
+    booked = calendar.create_appointment('Dr. Sarah Johnson', 'Parent', 'Student', SLOT)
+    calendar.cancel_appointment(booked['teacher_name'], booked['event_id'], SLOT, hold=booked['hold'])
+    assert calendar.create_appointment('Dr. Sarah Johnson', 'Parent', 'Student', SLOT)['status'] == 'success'
+
+
+def test_normalize_teacher_name():
+    assert normalize_teacher_name("Mrs. O'Brien-Smith") == 'obrien smith'
+    assert normalize_teacher_name('Prof.  Michael Chen') == 'michael chen'
+
+
+def test_bookkeeping_failure_after_insert_still_books(calendar):
+    def unavailable(*args):
+        raise ConnectionError('supabase unavailable')
+
+    calendar.db.backend.extend_slots = unavailable
+    calendar.index.add_event = unavailable
+    booked = calendar.create_appointment('Dr. Sarah Johnson', 'Parent', 'Student', SLOT)
+    assert booked['status'] == 'success' and booked['event_id']
+    # The unconfirmed hold still keeps the slot until it expires
+    assert calendar.create_appointment('Dr. Sarah Johnson', 'Parent', 'Student', SLOT)['status'] == 'conflict'
+
+
+def test_late_appointment_write_is_rolled_back(calendar):
+    def slow_add_appointment(*args):
+        time.sleep(0.3)
+        return add_appointment(*args)
+
+    add_appointment = calendar.db.add_appointment
+    calendar.db.add_appointment = slow_add_appointment
+
+    async def book():
+        agent = Assistant.__new__(Assistant)
+        agent.db, agent.calendar, agent.current_language = calendar.db, calendar, 'en'
+        agent.phrases = _SilentPhrases()
+        with resilience.deadline(0.1):
+            booked = await agent.schedule_appointment('Parent', 'Student', 'Dr. Sarah Johnson', SLOT, 'Review',
+                                                      '555-0100', '', FakeSession())
+        await asyncio.sleep(0.5)
+        return booked
+
+    assert not asyncio.run(book())
+    # The undo runs on the calendar executor once the late write lands
+    calendar._executor.submit(lambda: None).result()
+    assert list(calendar.db.iter_appointments()) == []
+    assert calendar.create_appointment('Dr. Sarah Johnson', 'Parent', 'Student', SLOT)['status'] == 'success'
+
+
+class _SilentPhrases:
+    async def say(self, session, key, language='en', **kwargs):
+        return None
+
+    async def speak(self, session, text):
+        return None
@@ -10,6 +10,7 @@ TRANSLATIONS = {
         'transferring': 'I will transfer your call to {department}.',
         'hold': 'Please hold while I process your request.',
         'appointment_reminder': 'This is a reminder for your appointment with {teacher} on {date} at {time}.',
+        'appointment_reminder_subject': 'Appointment reminder: {teacher} on {date}',
         'appointment_conflict': 'The requested time is not available. Here are some alternative times: {suggestions}',
         'appointment_conflict_no_suggestions': 'The requested time is not available and no alternatives were found.',
     },
@@ -22,6 +23,7 @@ TRANSLATIONS = {
         'transferring': 'मैं आपका कॉल {department} को ट्रांसफर कर रहा/रही हूं।',
         'hold': 'कृपया प्रतीक्षा करें जब तक मैं आपके अनुरोध को संसाधित करता/करती हूं।',
         'appointment_reminder': 'यह {date} को {time} बजे {teacher} के साथ आपकी मुलाकात की याद दिलाने के लिए है।',
+        'appointment_reminder_subject': 'मुलाकात अनुस्मारक: {date} को {teacher}',
         'appointment_conflict': 'अनुरोधित समय उपलब्ध नहीं है। यहाँ कुछ वैकल्पिक समय हैं: {suggestions}',
         'appointment_conflict_no_suggestions': 'अनुरोधित समय उपलब्ध नहीं है और कोई विकल्प नहीं मिला।',
     }
@@ -0,0 +1,123 @@
+import atexit
+import threading
+import time
+
+# Statuses a call_analytics row ends in; its row is not written again after them
+TERMINAL_STATUSES = ('completed', 'failed')
+
+
+class CallAnalyticsBuffer:
+    """Write-behind buffer that coalesces call_analytics changes per call_id.
+
+    Every change is merged into an in-memory row for its call and returns immediately.
+    Dirty rows are written with batched upserts by a background thread once max_batch
+    calls have changed or flush_interval seconds have passed, and on shutdown. The full
+    row state is kept until a call has ended (completed or failed) so every upsert carries all columns, or until
+    it has been written and left unchanged for row_ttl seconds, for calls that never complete.
+    """
+
+    def __init__(self, upsert_rows, max_batch=50, flush_interval=2.0, row_ttl=6 * 3600):
+        self.upsert_rows = upsert_rows
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.row_ttl = row_ttl
+        self._rows = {}
+        self._touched = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self.flushes = 0
+        self.rows_written = 0
+
+    def record(self, call_id, **fields):
+        """Merge changes into the buffered row for a call"""
+        with self._lock:
+            row = self._rows.setdefault(call_id, {'call_id': call_id})
+            row.update(fields)
+            self._touched[call_id] = time.monotonic()
+            self._dirty.add(call_id)
+            full = len(self._dirty) >= self.max_batch
+        if full:
+            with self._wakeup:
+                self._wakeup.notify()
+
+    def flush(self):
+        """Write every dirty row now; returns the number of rows written"""
+        with self._flush_lock:
+            self._evict_idle()
+            with self._lock:
+                if not self._dirty:
+                    return 0
+                batch = {call_id: dict(self._rows[call_id]) for call_id in self._dirty}
+                self._dirty.clear()
+
+            # PostgREST fills missing keys with NULL in a bulk upsert, so only batch rows with the same columns
+            groups = {}
+            for call_id, row in batch.items():
+                groups.setdefault(tuple(sorted(row)), []).append(row)
+
+            written = 0
+            for rows in groups.values():
+                try:
+                    self.upsert_rows(rows)
+                    written += len(rows)
+                except Exception as e:
+                    print(f"[CallAnalyticsBuffer] Error flushing {len(rows)} call rows: {e}")
+                    with self._lock:
+                        self._dirty.update(row['call_id'] for row in rows)
+                    continue
+                with self._lock:
+                    for row in rows:
+                        # Ended calls (completed or failed) will not change again, so stop carrying them
+                        if row.get('status') in TERMINAL_STATUSES and row['call_id'] not in self._dirty:
+                            self._forget(row['call_id'])
+
+            self.flushes += 1
+            self.rows_written += written
+            return written
+
+    def _forget(self, call_id):
+        self._rows.pop(call_id, None)
+        self._touched.pop(call_id, None)
+
+    def _evict_idle(self):
+        """Drop written rows of calls that never completed (e.g. the worker lost the job)"""
+        cutoff = time.monotonic() - self.row_ttl
+        with self._lock:
+            idle = [call_id for call_id, touched in self._touched.items()
+                    if touched < cutoff and call_id not in self._dirty]
+            for call_id in idle:
+                self._forget(call_id)
+        if idle:
+            print(f"[CallAnalyticsBuffer] Evicted {len(idle)} calls idle for over {self.row_ttl:.0f}s")
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._dirty)
+
+    def _run(self):
+        while not self._stopping:
+            with self._wakeup:
+                self._wakeup.wait(timeout=self.flush_interval)
+            self.flush()
+
+    def start(self):
+        """Start the background flusher and make sure buffered rows are written at exit"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='call-analytics-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        """Stop the flusher and write whatever is still buffered"""
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()